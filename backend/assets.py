@@ -0,0 +1,301 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+
+# Asset URLs change whenever their content does, so clients may keep them forever
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Bytes sent per ASGI message
+CHUNK_SIZE = 256 * 1024
+DIGEST_SIZE = 8
+
+
+class Asset(NamedTuple):
+    name: str
+    digest: str
+    size: int
+    media_type: str
+    # The bytes that were hashed, a view into the asset's bundle
+    data: memoryview
+
+    @property
+    def url(self) -> str:
+        return f"/api/assets/{self.digest}/{self.name}"
+
+
+class Bundle(NamedTuple):
+    """One file holding the assets of a difficulty tier back to back"""
+
+    difficulty: int
+    digest: str
+    size: int
+    # asset name -> (offset, length) in the bundle
+    members: Dict[str, Tuple[int, int]]
+    data: bytes
+
+    @property
+    def url(self) -> str:
+        return f"/api/assets/bundle/{self.digest}"
+
+
+def _signature(directory: str, names) -> tuple:
+    signature = []
+    for name in names:
+        try:
+            stat = os.stat(os.path.join(directory, name))
+            signature.append((name, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((name, None, None))
+    return tuple(signature)
+
+
+def _sound_names(catalog) -> List[str]:
+    """Sound file names the catalog refers to, in catalog order, without duplicates"""
+    return list(dict.fromkeys(obj["sound"] for obj in catalog.objects if obj.get("sound")))
+
+
+class AssetManifest:
+    """Content-hashed sounds and vibration patterns of a catalog's objects
+
+    Every sound in directory is hashed and served at a URL containing its
+    digest. Objects are grouped into tiers by difficulty, and each tier's
+    sounds not already in an easier tier are joined into one bundle, named
+    by its own digest, so a client can fetch the easiest tier's sounds in a
+    single request before its first crush and the rest after. Sounds missing
+    from directory are listed rather than failing the manifest; clients fall
+    back to synthesized sounds for those.
+
+    The manifest keeps the bytes it hashed and assets are served from them,
+    never from directory again: a file changed on disk keeps its old URL
+    serving its old content until the manifest is rebuilt under new URLs.
+    """
+
+    def __init__(self, catalog, directory: str):
+        self.catalog = catalog
+        names = _sound_names(catalog)
+        self.signature = _signature(directory, names)
+        self.assets: Dict[str, Asset] = {}
+        self.bundles: Dict[str, Bundle] = {}
+        by_name: Dict[str, Asset] = {}
+        contents: Dict[str, bytes] = {}
+        missing = []
+        for name in names:
+            path = os.path.join(directory, name)
+            # Names come from the catalog file, but must not reach outside directory
+            if os.path.basename(name) != name or not os.path.isfile(path):
+                missing.append(name)
+                continue
+            with open(path, "rb") as source:
+                data = source.read()
+            by_name[name] = Asset(
+                name, hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest(), len(data),
+                mimetypes.guess_type(name)[0] or "application/octet-stream", memoryview(data),
+            )
+            contents[name] = data
+
+        tiers: Dict[int, List[dict]] = {}
+        for obj in catalog.objects:
+            tiers.setdefault(obj.get("difficulty", 0), []).append(obj)
+        bundled = set()
+        tier_payloads = []
+        for difficulty in sorted(tiers):
+            members = []
+            for obj in tiers[difficulty]:
+                name = obj.get("sound")
+                if name in by_name and name not in bundled:
+                    bundled.add(name)
+                    members.append(name)
+            tier = {"difficulty": difficulty, "objects": [obj["id"] for obj in tiers[difficulty]]}
+            if members:
+                bundle = self._bundle(difficulty, members, contents)
+                self.bundles[bundle.digest] = bundle
+                # Assets share their bundle's bytes rather than keeping a copy
+                view = memoryview(bundle.data)
+                for name, (offset, length) in bundle.members.items():
+                    by_name[name] = by_name[name]._replace(data=view[offset:offset + length])
+                tier["bundle"] = {
+                    "url": bundle.url,
+                    "digest": bundle.digest,
+                    "size": bundle.size,
+                    "members": {name: list(span) for name, span in bundle.members.items()},
+                }
+            tier_payloads.append(tier)
+        self.assets.update((asset.digest, asset) for asset in by_name.values())
+
+        self.preload: Optional[Bundle] = next(iter(self.bundles.values()), None)
+        self.payload = {
+            "catalog_version": catalog.version,
+            "sounds": {
+                name: {"url": asset.url, "digest": asset.digest, "size": asset.size, "type": asset.media_type}
+                for name, asset in by_name.items()
+            },
+            "objects": {
+                obj["id"]: {
+                    "sound": obj.get("sound"),
+                    "vibration_pattern": obj.get("vibration_pattern", []),
+                    "difficulty": obj.get("difficulty", 0),
+                }
+                for obj in catalog.objects
+            },
+            "tiers": tier_payloads,
+            "missing": missing,
+        }
+        self.version = hashlib.blake2b(
+            repr((catalog.version, sorted(self.assets))).encode("utf-8"), digest_size=DIGEST_SIZE
+        ).hexdigest()
+        self.payload["version"] = self.version
+
+    @staticmethod
+    def _bundle(difficulty: int, members: List[str], contents: Dict[str, bytes]) -> Bundle:
+        spans = {}
+        offset = 0
+        for name in members:
+            spans[name] = (offset, len(contents[name]))
+            offset += len(contents[name])
+        data = b"".join(contents[name] for name in members)
+        digest = hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+        return Bundle(difficulty, digest, len(data), spans, data)
+
+
+class AssetStore:
+    """The asset manifest of the current catalog
+
+    The manifest is built in the default executor the first time it is
+    asked for a catalog, and again when a reload brings a new catalog or,
+    checked at most every recheck_interval seconds, a sound file changes
+    on disk. Assets and bundles are looked up by digest in the current
+    manifest only.
+    """
+
+    def __init__(self, directory: str, recheck_interval: float = 5.0, clock=time.monotonic):
+        self.directory = directory
+        self.recheck_interval = recheck_interval
+        self._clock = clock
+        self._manifest: Optional[AssetManifest] = None
+        self._checked = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, catalog) -> bool:
+        current = self._manifest
+        if current is None or current.catalog is not catalog:
+            return False
+        if self.recheck_interval <= 0 or self._clock() - self._checked < self.recheck_interval:
+            return True
+        self._checked = self._clock()
+        return _signature(self.directory, _sound_names(catalog)) == current.signature
+
+    async def manifest(self, catalog) -> AssetManifest:
+        if self._fresh(catalog):
+            return self._manifest
+        stale = self._manifest
+        async with self._lock:
+            # Unless another request rebuilt it while this one waited
+            if self._manifest is stale or self._manifest.catalog is not catalog:
+                self._manifest = await asyncio.get_running_loop().run_in_executor(
+                    None, AssetManifest, catalog, self.directory
+                )
+                self._checked = self._clock()
+        return self._manifest
+
+    def asset(self, digest: str) -> Optional[Asset]:
+        return self._manifest.assets.get(digest) if self._manifest is not None else None
+
+    def bundle(self, digest: str) -> Optional[Bundle]:
+        return self._manifest.bundles.get(digest) if self._manifest is not None else None
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """The (start, end) byte span, end exclusive, a Range header asks for, or None for the whole file
+
+    Only single ranges are honoured; anything else is answered with the
+    whole file, which HTTP allows. Raises RangeNotSatisfiable for a range
+    that starts past the end of the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, dash, last = header[6:].strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(size - length, 0), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start >= size or start < 0:
+        raise RangeNotSatisfiable(header)
+    if end <= start:
+        return None
+    return start, min(end, size)
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class RangeResponse(Response):
+    """Bytes sent whole or as one byte range, with conditional request handling
+
+    The span is sent in CHUNK_SIZE messages straight from memory, so serving
+    an asset neither touches the disk nor waits on the executor.
+    """
+
+    def __init__(self, request: Request, data, etag: str, media_type: str, cache_control: str = IMMUTABLE):
+        size = len(data)
+        self.data = data
+        self.media_type = media_type
+        self.background = None
+        self.body = None
+        self.span = (0, size)
+        self.send_body = request.method != "HEAD"
+        headers = {"Accept-Ranges": "bytes", "ETag": etag, "Cache-Control": cache_control}
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.status_code = 304
+            self.span = (0, 0)
+        else:
+            self.status_code = 200
+            if_range = request.headers.get("if-range")
+            if if_range is None or if_range.strip() == etag:
+                try:
+                    span = parse_range(request.headers.get("range"), size)
+                except RangeNotSatisfiable:
+                    self.status_code = 416
+                    self.span = (0, 0)
+                    headers["Content-Range"] = f"bytes */{size}"
+                else:
+                    if span is not None:
+                        self.status_code = 206
+                        self.span = span
+                        headers["Content-Range"] = f"bytes {span[0]}-{span[1] - 1}/{size}"
+            if self.status_code != 304:
+                headers["Content-Length"] = str(self.span[1] - self.span[0])
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        offset, end = self.span
+        if not self.send_body or offset == end:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        view = memoryview(self.data)
+        while offset < end:
+            chunk = bytes(view[offset:min(offset + CHUNK_SIZE, end)])
+            offset += len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": offset < end})
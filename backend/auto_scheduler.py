@@ -0,0 +1,176 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from shared_sessions import LeaseBusy, LeaseLost
+
+logger = logging.getLogger(__name__)
+
+
+class AutoScheduler:
+    """Drives auto-mode crushing for every session from one task on the event loop
+
+    All scheduled sessions share a single min-heap keyed by the time of their
+    next crush, so the loop wakes up exactly when something is due no matter
+    how many sessions are running. Stopping a session bumps its generation;
+    stale heap entries are skipped when they surface instead of being removed.
+
+    Objects are picked with weights favouring easy, quick crushes, multiplied
+    by the session's preferences from weigh when it gives any, and the next
+    crush is scheduled after the chosen object's crush_time has played out.
+    A shared session another worker holds for the moment is tried again
+    after the same delay; any other failure stops the session.
+    """
+
+    # Crushes processed before yielding back to the event loop
+    YIELD_EVERY = 500
+
+    def __init__(
+        self,
+        crush: Callable[[str, dict], Awaitable[Optional[dict]]],
+        get_objects: Callable[[], Tuple[dict, ...]],
+        seed: Optional[int] = None,
+        subscriber_queue_size: int = 100,
+        weigh: Optional[Callable[[str, Tuple[dict, ...]], Optional[Sequence[float]]]] = None,
+    ):
+        self.crush = crush
+        self.get_objects = get_objects
+        self.weigh = weigh
+        self.subscriber_queue_size = subscriber_queue_size
+        self._rng = random.Random(seed)
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._counter = itertools.count()
+        # session_id -> (generation, speed)
+        self._active: Dict[str, Tuple[int, float]] = {}
+        self._generations = itertools.count(1)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._wakeup = asyncio.Event()
+        self._weights_for: Optional[Tuple[dict, ...]] = None
+        self._weights: List[float] = []
+        self._cum_weights: List[float] = []
+        self.crushes = 0
+        self.busy = 0
+        self.lag_total = 0.0
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._active
+
+    def _now(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def start_session(self, session_id: str, speed: float = 1.0, delay: float = 0.0):
+        """Schedule auto crushing for a session, replacing any earlier schedule"""
+        generation = next(self._generations)
+        self._active[session_id] = (generation, speed)
+        self._push(self._now() + delay, session_id, generation)
+
+    def stop_session(self, session_id: str) -> bool:
+        return self._active.pop(session_id, None) is not None
+
+    def _push(self, due: float, session_id: str, generation: int):
+        heapq.heappush(self._heap, (due, next(self._counter), session_id, generation))
+        if self._heap[0][2] == session_id:
+            self._wakeup.set()
+
+    def choose(self, session_id: Optional[str] = None) -> dict:
+        objects = self.get_objects()
+        if objects is not self._weights_for:
+            self._weights = [1.0 / (obj["difficulty"] * obj["crush_time"]) for obj in objects]
+            self._cum_weights = list(itertools.accumulate(self._weights))
+            self._weights_for = objects
+        if self.weigh is not None and session_id is not None:
+            preferences = self.weigh(session_id, objects)
+            if preferences is not None:
+                weights = [weight * preference for weight, preference in zip(self._weights, preferences)]
+                if sum(weights) > 0:
+                    return self._rng.choices(objects, weights=weights)[0]
+        return self._rng.choices(objects, cum_weights=self._cum_weights)[0]
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(session_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[session_id]
+
+    def _publish(self, session_id: str, event: dict):
+        for queue in self._subscribers.get(session_id, ()):
+            if queue.full():
+                # A slow subscriber loses the oldest events, never the session's progress
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - self._now()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run_due()
+
+    async def _run_due(self):
+        now = self._now()
+        processed = 0
+        while self._heap and self._heap[0][0] <= now:
+            processed += 1
+            if processed % self.YIELD_EVERY == 0:
+                # Let requests in between large bursts of due sessions
+                await asyncio.sleep(0)
+            due, _, session_id, generation = heapq.heappop(self._heap)
+            active = self._active.get(session_id)
+            if active is None or active[0] != generation:
+                continue
+            obj = self.choose(session_id)
+            try:
+                result = await self.crush(session_id, obj)
+            except (LeaseBusy, LeaseLost):
+                self.busy += 1
+                step = obj["crush_time"] / active[1]
+                heapq.heappush(self._heap, (now + step, next(self._counter), session_id, generation))
+                continue
+            except Exception:
+                logger.exception("Auto crush failed for session %s", session_id)
+                result = None
+            if result is None:
+                if self._active.get(session_id) == active:
+                    del self._active[session_id]
+                continue
+            self.crushes += 1
+            self.lag_total += now - due
+            self._publish(session_id, {"type": "auto_crush", **result})
+
+            # Pace from the due time so lag does not accumulate, but never try
+            # to catch up on crushes that were missed while the loop was busy
+            step = obj["crush_time"] / active[1]
+            next_due = due + step
+            if next_due <= now:
+                next_due = now + step
+            heapq.heappush(self._heap, (next_due, next(self._counter), session_id, generation))
+
+    def metrics(self) -> dict:
+        return {
+            "sessions": len(self._active),
+            "queued": len(self._heap),
+            "crushes": self.crushes,
+            "busy": self.busy,
+            "mean_lag_ms": (self.lag_total / self.crushes * 1000) if self.crushes else 0.0,
+        }
@@ -0,0 +1,107 @@
+import hashlib
+import json
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class CatalogError(ValueError):
+    """A catalog that is invalid or would break object codes already handed out"""
+
+
+class Catalog:
+    """Immutable, indexed view over the crushable objects
+
+    Objects are identified on the wire and in histories by small integer
+    codes, taken from each object's "code" or from its position when it has
+    none. Objects taken out of service stay in the data marked
+    "retired": true; they are not offered or crushable, but their codes
+    still decode, so histories holding them survive restarts. A catalog
+    built with previous checks that no object changed code, no code was
+    given to another object and no object was dropped instead of retired.
+    Objects equal to their previous version are reused as they are, so
+    caches keyed on them stay valid.
+
+    version is a digest of the objects in service, the same in every
+    process that loads the same data.
+    """
+
+    INDEXED_FIELDS = ("type", "difficulty", "particles")
+
+    def __init__(self, objects: Iterable[dict], previous: Optional["Catalog"] = None):
+        entries = tuple(objects)
+        objects = tuple(obj for obj in entries if not obj.get("retired"))
+        if previous is not None:
+            objects = tuple(
+                previous.by_id[obj["id"]] if previous.by_id.get(obj["id"]) == obj else obj for obj in objects
+            )
+        self.objects: Tuple[dict, ...] = objects
+        self.by_id = MappingProxyType({obj["id"]: obj for obj in self.objects})
+        self.version = hashlib.blake2b(
+            json.dumps(self.objects, sort_keys=True).encode("utf-8"), digest_size=6
+        ).hexdigest()
+
+        by_code: Dict[int, dict] = {}
+        for position, obj in enumerate(entries):
+            code = obj.get("code", position)
+            if code in by_code:
+                raise CatalogError(f"Objects '{by_code[code]['id']}' and '{obj['id']}' share code {code}")
+            by_code[code] = obj
+        if previous is not None:
+            ids = {obj["id"] for obj in entries}
+            for code, old in previous._by_code.items():
+                new = by_code.get(code)
+                if new is None and old["id"] in ids:
+                    raise CatalogError(f"Object '{old['id']}' cannot change code from {code}")
+                if new is not None and new["id"] != old["id"]:
+                    raise CatalogError(f"Code {code} belongs to '{old['id']}' and cannot be reused for '{new['id']}'")
+                if new is None:
+                    raise CatalogError(f"Object '{old['id']}' was removed; mark it retired to keep code {code}")
+        self.retired = MappingProxyType({code: obj for code, obj in by_code.items() if obj.get("retired")})
+        self._by_code = by_code
+        # Small integer codes used for compact per-session history, retired objects included
+        self.codes = MappingProxyType({obj["id"]: code for code, obj in self._by_code.items()})
+        self.indexes = MappingProxyType({
+            field: self._build_index(field) for field in self.INDEXED_FIELDS
+        })
+
+    def _build_index(self, field: str):
+        index: Dict[object, List[dict]] = {}
+        for obj in self.objects:
+            index.setdefault(obj[field], []).append(obj)
+        return MappingProxyType({key: tuple(objs) for key, objs in index.items()})
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, object_id: str):
+        return object_id in self.by_id
+
+    def get(self, object_id: str) -> Optional[dict]:
+        return self.by_id.get(object_id)
+
+    def object_for_code(self, code: int) -> dict:
+        return self._by_code[code]
+
+    def query(self, **filters) -> Tuple[dict, ...]:
+        """Return objects matching every given field filter, in catalog order"""
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if not filters:
+            return self.objects
+
+        # Start from the smallest bucket and check the rest against it
+        buckets = []
+        for field, value in filters.items():
+            if field not in self.indexes:
+                raise KeyError(f"Field '{field}' is not indexed")
+            bucket = self.indexes[field].get(value, ())
+            if not bucket:
+                return ()
+            buckets.append((field, bucket))
+        buckets.sort(key=lambda item: len(item[1]))
+
+        _, smallest = buckets[0]
+        rest = [(field, filters[field]) for field, _ in buckets[1:]]
+        return tuple(
+            obj for obj in smallest
+            if all(obj[field] == value for field, value in rest)
+        )
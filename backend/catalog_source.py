@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from catalog import Catalog, CatalogError
+
+logger = logging.getLogger(__name__)
+
+
+class CrushObjectSpec(BaseModel):
+    """Schema for one object in a catalog file"""
+
+    model_config = ConfigDict(extra="forbid", strict=True)
+
+    code: int = Field(ge=0, le=0xFFFF)
+    id: str = Field(pattern=r"^[A-Za-z0-9_-]+$", max_length=64)
+    name: str = Field(min_length=1)
+    type: str = Field(min_length=1)
+    difficulty: int = Field(ge=1)
+    sound: str
+    particles: str
+    vibration_pattern: List[int] = Field(min_length=1)
+    crush_time: float = Field(gt=0)
+    satisfaction_score: int = Field(ge=0)
+    # Out of service, kept so that histories holding its code still decode
+    retired: bool = False
+
+
+class CatalogFileSpec(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    objects: List[CrushObjectSpec] = Field(min_length=1)
+
+
+def load_objects(path: str) -> List[dict]:
+    """Read and validate the objects in a JSON or YAML catalog file"""
+    with open(path, "rb") as source:
+        data = source.read()
+    if path.endswith((".yaml", ".yml")):
+        # PyYAML is optional and only imported for YAML catalogs, JSON ones are always supported
+        try:
+            import yaml
+        except ImportError:
+            raise CatalogError(f"Reading {path} needs PyYAML") from None
+        try:
+            document = yaml.safe_load(data)
+        except yaml.YAMLError as exc:
+            raise CatalogError(f"Could not parse {path}: {exc}") from exc
+    else:
+        try:
+            document = json.loads(data)
+        except ValueError as exc:
+            raise CatalogError(f"Could not parse {path}: {exc}") from exc
+    try:
+        spec = CatalogFileSpec.model_validate(document)
+    except ValidationError as exc:
+        raise CatalogError(f"Invalid catalog {path}: {exc}") from exc
+
+    # Objects in service carry no retired field at all
+    objects = [obj.model_dump(exclude=None if obj.retired else {"retired"}) for obj in spec.objects]
+    seen = set()
+    for obj in objects:
+        if obj["id"] in seen:
+            raise CatalogError(f"Invalid catalog {path}: object '{obj['id']}' appears more than once")
+        seen.add(obj["id"])
+    if all(obj.get("retired") for obj in objects):
+        raise CatalogError(f"Invalid catalog {path}: every object is retired")
+    return objects
+
+
+def load_catalog(path: str, previous: Optional[Catalog] = None) -> Catalog:
+    return Catalog(load_objects(path), previous)
+
+
+class CatalogWatcher:
+    """Reloads the catalog when its file changes and hands new versions to install
+
+    The file is polled every interval seconds; when its modification time
+    or size changes it is parsed, validated and indexed in the default
+    executor, so requests keep being served from the current catalog
+    meanwhile. A file that fails to load is logged and ignored until it
+    changes again. Writers should replace the file atomically (write a
+    temporary file, then rename it over the catalog).
+    """
+
+    def __init__(self, path: str, get_catalog: Callable[[], Catalog], install: Callable[[Catalog], None],
+                 interval: float = 2.0):
+        self.path = path
+        self.get_catalog = get_catalog
+        self.install = install
+        self.interval = interval
+        self.reloads = 0
+        self.errors = 0
+        self._signature = self._stat()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    async def check(self) -> bool:
+        """Reload the file if it changed; True if a new catalog version was installed"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        current = self.get_catalog()
+        loop = asyncio.get_running_loop()
+        try:
+            catalog = await loop.run_in_executor(None, load_catalog, self.path, current)
+        except (OSError, CatalogError) as exc:
+            self.errors += 1
+            logger.error("Keeping catalog %s: %s", current.version, exc)
+            return False
+        if catalog.version == current.version:
+            return False
+        self.install(catalog)
+        self.reloads += 1
+        logger.info("Catalog %s installed, %d objects", catalog.version, len(catalog))
+        return True
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
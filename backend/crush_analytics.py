@@ -0,0 +1,255 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FORCE_BUCKETS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0)
+
+
+class ObjectAggregate:
+    """Running totals for one object: crush count, force histogram and position grid"""
+
+    __slots__ = ("count", "force_sum", "force_counts", "grid")
+
+    def __init__(self, force_buckets: int, grid_size: int):
+        self.count = 0
+        self.force_sum = 0.0
+        # One count per bucket upper bound, plus one for anything larger
+        self.force_counts = array("I", bytes(4 * (force_buckets + 1)))
+        self.grid = array("I", bytes(4 * grid_size * grid_size))
+
+
+def position_xy(position) -> Optional[Tuple[float, float]]:
+    """x and y from a crush position, or None if they are missing or not finite numbers"""
+    try:
+        x = float(position.get("x", 0))
+        y = float(position.get("y", 0))
+    except (AttributeError, TypeError, ValueError, OverflowError):
+        return None
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return None
+    return x, y
+
+
+class EventLog:
+    """Append-only newline-delimited JSON files, rolled by size and by UTC day"""
+
+    def __init__(self, directory: str, roll_bytes: int = 64 * 1024 * 1024, prefix: str = "crush-events"):
+        self.directory = directory
+        self.roll_bytes = roll_bytes
+        self.prefix = prefix
+        self.path: Optional[str] = None
+        self._file = None
+        self._day = None
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, day: str):
+        if self._file is not None:
+            self._file.close()
+        sequence = 0
+        while True:
+            path = os.path.join(self.directory, f"{self.prefix}-{day}-{sequence:04d}.ndjson")
+            if not os.path.exists(path):
+                break
+            sequence += 1
+        self._file = open(path, "a", encoding="utf-8")
+        self._day = day
+        self._size = 0
+        self.path = path
+
+    def write(self, events: List[tuple]):
+        data = "".join(
+            json.dumps({
+                "ts": ts, "session_id": session_id, "object_id": object_id, "type": obj_type,
+                "force": force, "position": position, "mode": mode,
+            }, separators=(",", ":")) + "\n"
+            for ts, session_id, object_id, obj_type, force, position, mode in events
+        )
+        day = datetime.now(timezone.utc).strftime("%Y%m%d")
+        with self._lock:
+            if self._file is None or day != self._day or self._size >= self.roll_bytes:
+                self._open(day)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class CrushAnalytics:
+    """Rolls crush events up into aggregates off the request path
+
+    Request handlers call emit(), which only appends to a bounded queue and
+    drops the event if the queue is full, so analytics can never slow down a
+    crush. One consumer task drains the queue in batches, updates per-object
+    aggregates and per-minute counts, and hands the raw events to each log
+    (anything with write(events) and close()) in the default executor.
+
+    Events are (ts, session_id, object_id, type, force, position, mode) tuples.
+    """
+
+    # Events taken off the queue per consumer pass
+    BATCH = 1000
+
+    def __init__(
+        self,
+        logs: Sequence = (),
+        queue_size: int = 10_000,
+        grid_size: int = 16,
+        grid_extent: float = 500.0,
+        force_buckets: Sequence[float] = FORCE_BUCKETS,
+        window_minutes: int = 60,
+        clock=time.time,
+    ):
+        self.logs = tuple(logs)
+        self.grid_size = grid_size
+        self.grid_extent = grid_extent
+        self.force_buckets = tuple(force_buckets)
+        self.window_minutes = window_minutes
+        self._clock = clock
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.objects: Dict[str, ObjectAggregate] = {}
+        # [minute, count] for the last window_minutes minutes that had crushes
+        self._minutes: deque = deque()
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.write_errors = 0
+
+    def emit(self, session_id: str, obj: dict, force: float, position: dict, mode: str):
+        try:
+            self.queue.put_nowait((self._clock(), session_id, obj["id"], obj["type"], force, position, mode))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _cell(self, position: dict) -> Optional[int]:
+        xy = position_xy(position)
+        if xy is None:
+            return None
+        x, y = xy
+        scale = self.grid_size / (2 * self.grid_extent)
+        column = min(max(int((x + self.grid_extent) * scale), 0), self.grid_size - 1)
+        row = min(max(int((y + self.grid_extent) * scale), 0), self.grid_size - 1)
+        return row * self.grid_size + column
+
+    def _add(self, ts: float, object_id: str, force: float, position: dict):
+        aggregate = self.objects.get(object_id)
+        if aggregate is None:
+            aggregate = self.objects[object_id] = ObjectAggregate(len(self.force_buckets), self.grid_size)
+        cell = self._cell(position)
+        aggregate.force_counts[bisect_left(self.force_buckets, force)] += 1
+        aggregate.count += 1
+        aggregate.force_sum += force
+        if cell is not None:
+            aggregate.grid[cell] += 1
+
+        minute = int(ts // 60)
+        if self._minutes and self._minutes[-1][0] == minute:
+            self._minutes[-1][1] += 1
+        else:
+            self._minutes.append([minute, 1])
+
+    def _aggregate(self, events: List[tuple]):
+        for ts, session_id, object_id, obj_type, force, position, mode in events:
+            # One bad event must not take the consumer task down with it
+            try:
+                self._add(ts, object_id, force, position)
+            except Exception:
+                self.failed += 1
+                logger.exception("Aggregating a crush event for %s from session %s failed", object_id, session_id)
+        cutoff = int(self._clock() // 60) - self.window_minutes
+        while self._minutes and self._minutes[0][0] <= cutoff:
+            self._minutes.popleft()
+        self.processed += len(events)
+
+    def _write(self, events: List[tuple]):
+        for log in self.logs:
+            try:
+                log.write(events)
+            except Exception:
+                self.write_errors += 1
+                logger.exception("Writing %d analytics events to %r failed", len(events), log)
+
+    def _take(self, first: tuple) -> List[tuple]:
+        events = [first]
+        while len(events) < self.BATCH:
+            try:
+                events.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return events
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            events = self._take(await self.queue.get())
+            try:
+                self._aggregate(events)
+                if self.logs:
+                    await loop.run_in_executor(None, self._write, events)
+            except Exception:
+                logger.exception("Processing %d crush events failed", len(events))
+
+    def drain(self):
+        """Process whatever is still queued; used at shutdown"""
+        while not self.queue.empty():
+            events = self._take(self.queue.get_nowait())
+            self._aggregate(events)
+            if self.logs:
+                self._write(events)
+
+    def close(self):
+        self.drain()
+        for log in self.logs:
+            log.close()
+
+    def object_report(self, object_id: str) -> Optional[dict]:
+        aggregate = self.objects.get(object_id)
+        if aggregate is None:
+            return None
+        size = self.grid_size
+        return {
+            "count": aggregate.count,
+            "mean_force": aggregate.force_sum / aggregate.count,
+            "force_histogram": {
+                "buckets": list(self.force_buckets) + ["+Inf"],
+                "counts": aggregate.force_counts.tolist(),
+            },
+            "heatmap": {
+                "size": size,
+                "extent": self.grid_extent,
+                "cells": [aggregate.grid[row * size:(row + 1) * size].tolist() for row in range(size)],
+            },
+        }
+
+    def report(self, object_id: Optional[str] = None) -> dict:
+        cutoff = int(self._clock() // 60) - self.window_minutes
+        object_ids = [object_id] if object_id is not None else sorted(self.objects)
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "queued": self.queue.qsize(),
+            "window_minutes": self.window_minutes,
+            "recent_crushes": sum(count for minute, count in self._minutes if minute > cutoff),
+            "objects": {
+                object_id: report for object_id in object_ids
+                if (report := self.object_report(object_id)) is not None
+            },
+        }
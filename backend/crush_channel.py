@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from shared_sessions import LeaseBusy, LeaseLost
+
+
+class CrushChannel:
+    """Streams crush actions in and crush results out over one WebSocket
+
+    Incoming messages go through a bounded queue. When the queue is full the
+    reader stops pulling frames off the socket, so a client that sends faster
+    than crushes are applied is slowed down by TCP flow control instead of
+    growing server memory. Messages are handled strictly in order.
+
+    Client messages:
+        {"type": "crush", "seq": 1, "object_id": "...", "force": 1.0, "position": {...}}
+        {"type": "ping"}
+    Server messages:
+        {"type": "crush_result", "seq": 1, "result": {...}, "delta": {...}, "total_satisfaction": 42}
+        {"type": "error", "seq": 1, "status": 404, "detail": "..."}
+            (503 when a shared session is held by another worker; nothing was applied)
+        {"type": "pong"} / {"type": "heartbeat", "ts": ...}
+
+    If an events queue is given, anything put on it (for example auto-mode
+    crushes from the scheduler) is forwarded to the client as-is.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        on_crush: Callable[[dict], Awaitable[dict]],
+        heartbeat_interval: float = 15.0,
+        queue_size: int = 32,
+        events: Optional[asyncio.Queue] = None,
+    ):
+        self.websocket = websocket
+        self.events = events
+        self.on_crush = on_crush
+        self.heartbeat_interval = heartbeat_interval
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._send_lock = asyncio.Lock()
+        self._last_sent = time.monotonic()
+
+    async def send(self, message: dict):
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(message))
+            self._last_sent = time.monotonic()
+
+    async def run(self):
+        receiver = asyncio.create_task(self._receive())
+        heartbeat = asyncio.create_task(self._heartbeat())
+        forwarder = asyncio.create_task(self._forward()) if self.events is not None else None
+        try:
+            await self._process()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+            heartbeat.cancel()
+            if forwarder is not None:
+                forwarder.cancel()
+
+    async def _receive(self):
+        try:
+            while True:
+                text = await self.websocket.receive_text()
+                await self.inbox.put(text)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await self.inbox.put(None)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            if time.monotonic() - self._last_sent >= self.heartbeat_interval:
+                try:
+                    await self.send({"type": "heartbeat", "ts": time.time()})
+                except Exception:
+                    return
+
+    async def _forward(self):
+        while True:
+            event = await self.events.get()
+            try:
+                await self.send(event)
+            except Exception:
+                return
+
+    async def _process(self):
+        while True:
+            text = await self.inbox.get()
+            if text is None:
+                return
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise ValueError("message must be a JSON object")
+            except ValueError as e:
+                await self.send({"type": "error", "status": 400, "detail": f"Invalid message: {e}"})
+                continue
+
+            kind = message.get("type", "crush")
+            seq = message.get("seq")
+            if kind == "ping":
+                await self.send({"type": "pong", "seq": seq})
+            elif kind == "crush":
+                await self._crush(seq, message)
+            else:
+                await self.send({"type": "error", "seq": seq, "status": 400, "detail": f"Unknown message type '{kind}'"})
+
+    async def _crush(self, seq, message: dict):
+        try:
+            reply = await self.on_crush(message)
+        except ValidationError as e:
+            await self.send({"type": "error", "seq": seq, "status": 422, "detail": json.loads(e.json())})
+            return
+        except HTTPException as e:
+            await self.send({"type": "error", "seq": seq, "status": e.status_code, "detail": e.detail})
+            return
+        except LeaseBusy:
+            await self.send({"type": "error", "seq": seq, "status": 503, "detail": "Session is busy"})
+            return
+        except LeaseLost:
+            await self.send({"type": "error", "seq": seq, "status": 503,
+                             "detail": "Session moved to another worker, crush not applied"})
+            return
+        await self.send({"type": "crush_result", "seq": seq, **reply})
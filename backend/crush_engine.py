@@ -0,0 +1,269 @@
+import base64
+import math
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from crush_analytics import position_xy
+
+
+class Material(NamedTuple):
+    """How a material deforms and breaks up
+
+    stiffness: 0..1, resistance to deformation
+    fragments: particles in a burst at full deformation
+    speed: base particle speed in px/s
+    spread: burst cone width in radians
+    size: particle size range in px
+    stages: (deformation threshold, stage name) in increasing order
+    fracture_at: deformation from which the object counts as broken apart
+    """
+    stiffness: float
+    fragments: int
+    speed: float
+    spread: float
+    size: tuple
+    stages: tuple
+    fracture_at: float
+
+
+MATERIALS: Dict[str, Material] = {
+    "metal": Material(0.55, 10, 140.0, 1.6, (2.0, 5.0),
+                      ((0.0, "dent"), (0.35, "buckle"), (0.7, "flatten")), 1.1),
+    "paper": Material(0.15, 14, 90.0, 2.4, (3.0, 7.0),
+                      ((0.0, "crease"), (0.3, "fold"), (0.6, "crumple")), 1.1),
+    "glass": Material(0.7, 40, 260.0, 3.0, (1.0, 3.5),
+                      ((0.0, "crack"), (0.25, "shatter")), 0.25),
+    "plastic": Material(0.35, 12, 120.0, 1.8, (2.0, 5.0),
+                        ((0.0, "bend"), (0.3, "crumple"), (0.65, "flatten")), 1.1),
+    "mixed": Material(0.5, 24, 180.0, 2.6, (1.5, 4.5),
+                      ((0.0, "crack"), (0.35, "split"), (0.7, "burst")), 0.7),
+}
+DEFAULT_MATERIAL = MATERIALS["plastic"]
+
+# Packed burst layout: little-endian float32 rows of x, y, vx, vy, size
+BURST_FORMAT = "f32le:x,y,vx,vy,size"
+BURST_FIELDS = 5
+# Forces and positions outside these ranges are clamped
+FORCE_RANGE = (0.0, 10.0)
+POSITION_LIMIT = 10_000.0
+
+
+def material_for(obj: dict) -> Material:
+    """Material keyed by the object's particles, falling back to its type"""
+    return MATERIALS.get(obj["particles"]) or MATERIALS.get(obj["type"]) or DEFAULT_MATERIAL
+
+
+class CrushEngine:
+    """Computes deformation and an initial particle burst for crushes
+
+    Pressure is the clamped force divided by the object's difficulty, and
+    deformation approaches 1 as pressure overcomes the material's stiffness.
+    Deformation picks the stage reached and scales how many particles burst
+    out, how fast and how small they are. Particles fly upwards from the
+    crush position in a cone set by the material.
+
+    simulate() handles any number of crushes with one set of NumPy calls:
+    per-crush values are worked out with plain floats and repeated out to
+    one row per particle, so there is no per-particle Python. A single
+    crush, the common case, skips the repeating and works on its particle
+    arrays directly; both give the same bursts.
+
+    Given a seed, the random numbers for a call come from a Philox
+    generator keyed by the seed with its counter set from index, the
+    history position of the call's first crush. A session's bursts then
+    depend only on its own seed and inputs, not on how its crushes were
+    interleaved with other sessions' or which process handled them, which
+    is what lets session_replay re-run them exactly. Re-keying a generator
+    costs a couple of microseconds, far less than building a new one, so
+    each thread keeps one, with the state arrays it is re-keyed from, and
+    simulate() can run in several threads at once.
+
+    An engine pickles as its seed, and unpickles as that process's engine
+    for the seed, so simulate() can be sent to a process pool as is.
+
+    NumPy is imported by warm_up(), or by the first simulate() if nothing
+    warmed the engine up, which keeps it off the server's import path.
+    """
+
+    MAX_PARTICLES = 48
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = seed
+        self.np = None
+        self.rng = None
+        self._local = threading.local()
+        self._params: Dict[str, tuple] = {}
+        self._warm_up_lock = threading.Lock()
+
+    def warm_up(self):
+        with self._warm_up_lock:
+            if self.rng is None:
+                import numpy
+                self.np = numpy
+                self.rng = numpy.random.default_rng(self.seed)
+
+    def __reduce__(self):
+        return engine_for_seed, (self.seed,)
+
+    def _object_params(self, obj: dict) -> tuple:
+        # Cached per object id, and recomputed when a catalog reload replaced the object
+        cached = self._params.get(obj["id"])
+        if cached is None or cached[0] is not obj:
+            material = material_for(obj)
+            cached = self._params[obj["id"]] = (obj, (
+                max(obj["difficulty"], 1), material.stiffness, material.fragments, material.speed,
+                material.spread, material.size[0], material.size[1] - material.size[0],
+            ))
+        return cached[1]
+
+    def _generator(self, seed: Optional[int], index: int):
+        if seed is None:
+            return self.rng
+        local = self._local
+        keyed = getattr(local, "keyed", None)
+        if keyed is None:
+            np = self.np
+            keyed = local.keyed = np.random.Generator(np.random.Philox())
+            local.counter = np.zeros(4, dtype=np.uint64)
+            local.key = np.zeros(2, dtype=np.uint64)
+            local.state = {
+                "bit_generator": "Philox", "state": {"counter": local.counter, "key": local.key},
+                "buffer": np.zeros(4, dtype=np.uint64), "buffer_pos": 4, "has_uint32": 0, "uinteger": 0,
+            }
+        # Setting the state copies the arrays, so they can be reused
+        local.counter[2] = index
+        local.key[0] = seed
+        keyed.bit_generator.state = local.state
+        return keyed
+
+    def _crush_values(self, obj: dict, force: float, position: dict) -> tuple:
+        """x, y, spread, size_min, size_span, deformation, velocity and particle count of one crush"""
+        difficulty, stiffness, fragments, speed, spread, size_min, size_span = self._object_params(obj)
+        low, high = FORCE_RANGE
+        force = min(max(force, low), high) if force == force else low
+        x, y = position_xy(position) or (0.0, 0.0)
+        x = min(max(x, -POSITION_LIMIT), POSITION_LIMIT)
+        y = min(max(y, -POSITION_LIMIT), POSITION_LIMIT)
+        pressure = force / difficulty
+        deformation = 1.0 - math.exp(-2.0 * pressure * (1.0 - stiffness))
+        count = min(max(round(fragments * (0.25 + deformation)), 1), self.MAX_PARTICLES)
+        return x, y, spread, size_min, size_span, deformation, speed * math.sqrt(pressure + 0.1), count
+
+    @staticmethod
+    def _result(obj: dict, deformation: float, count: int, data: bytes) -> dict:
+        material = material_for(obj)
+        stages = [name for threshold, name in material.stages if deformation >= threshold]
+        return {
+            "deformation": round(deformation, 4),
+            "stage": stages[-1],
+            "stages": stages,
+            "fractured": deformation >= material.fracture_at,
+            "burst": {
+                "format": BURST_FORMAT,
+                "count": count,
+                "data": base64.b64encode(data).decode("ascii"),
+            },
+        }
+
+    def simulate(self, objs: Sequence[dict], forces: Sequence[float], positions: Sequence[dict],
+                 seed: Optional[int] = None, index: int = 0) -> List[dict]:
+        if not objs:
+            return []
+        if len(objs) == 1:
+            return [self.simulate_one(objs[0], forces[0], positions[0], seed, index)]
+        if self.rng is None:
+            self.warm_up()
+        np = self.np
+        deformations = []
+        counts = []
+        rows = []
+        for obj, force, position in zip(objs, forces, positions):
+            *row, count = self._crush_values(obj, force, position)
+            deformations.append(row[5])
+            counts.append(count)
+            rows.append(row)
+
+        # One row of per-crush values for every particle; the rest is whole-array work
+        x, y, spread, size_min, size_span, deformation, velocity = np.repeat(
+            np.array(rows, dtype=np.float64), counts, axis=0
+        ).T
+        total = len(x)
+        rng = self._generator(seed, index)
+        uniform = rng.random((2, total))
+        normal = rng.standard_normal((3, total))
+
+        angle = -math.pi / 2 + (uniform[0] - 0.5) * spread
+        velocity = velocity * np.exp(0.35 * normal[0])
+        reach = 6.0 * (1.0 + deformation)
+        burst = np.empty((total, BURST_FIELDS), dtype="<f4")
+        burst[:, 0] = x + normal[1] * reach
+        burst[:, 1] = y + normal[2] * reach
+        burst[:, 2] = np.cos(angle) * velocity
+        burst[:, 3] = np.sin(angle) * velocity
+        burst[:, 4] = (size_min + size_span * uniform[1]) * (1.2 - 0.4 * deformation)
+
+        data = burst.tobytes()
+        row_bytes = BURST_FIELDS * 4
+        results = []
+        start = 0
+        for obj, amount, amount_particles in zip(objs, deformations, counts):
+            end = start + amount_particles * row_bytes
+            results.append(self._result(obj, amount, amount_particles, data[start:end]))
+            start = end
+        return results
+
+    def simulate_one(self, obj: dict, force: float, position: dict, seed: Optional[int] = None,
+                     index: int = 0) -> dict:
+        """simulate() for one crush, with plain floats for everything but the particles"""
+        if self.rng is None:
+            self.warm_up()
+        np = self.np
+        x, y, spread, size_min, size_span, deformation, velocity, count = self._crush_values(obj, force, position)
+        rng = self._generator(seed, index)
+        uniform = rng.random((2, count))
+        normal = rng.standard_normal((3, count))
+
+        angle = -math.pi / 2 + (uniform[0] - 0.5) * spread
+        velocity = velocity * np.exp(0.35 * normal[0])
+        reach = 6.0 * (1.0 + deformation)
+        burst = np.empty((count, BURST_FIELDS), dtype="<f4")
+        burst[:, 0] = x + normal[1] * reach
+        burst[:, 1] = y + normal[2] * reach
+        burst[:, 2] = np.cos(angle) * velocity
+        burst[:, 3] = np.sin(angle) * velocity
+        burst[:, 4] = (size_min + size_span * uniform[1]) * (1.2 - 0.4 * deformation)
+        return self._result(obj, deformation, count, burst.tobytes())
+
+
+_engines: Dict[Optional[int], CrushEngine] = {}
+
+
+def engine_for_seed(seed: Optional[int]) -> CrushEngine:
+    """This process's engine for a seed, warmed up; what a pickled engine loads as"""
+    engine = _engines.get(seed)
+    if engine is None:
+        engine = _engines[seed] = CrushEngine(seed)
+        engine.warm_up()
+    return engine
+
+
+def crush_result(obj: dict, force: float, simulation: dict) -> dict:
+    """The result of one crush as clients see it; session_replay builds it the same way"""
+    return {
+        "object": obj,
+        "success": True,
+        "satisfaction_gained": obj["satisfaction_score"],
+        "particles": obj["particles"],
+        "sound": obj["sound"],
+        "vibration": obj["vibration_pattern"],
+        "animation_duration": obj["crush_time"],
+        "force_applied": force,
+        "simulation": simulation
+    }
+
+
+def unpack_burst(burst: dict) -> "np.ndarray":
+    """Particle rows (x, y, vx, vy, size) from a packed burst"""
+    import numpy as np
+
+    return np.frombuffer(base64.b64decode(burst["data"]), dtype="<f4").reshape(-1, BURST_FIELDS)
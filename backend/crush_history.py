@@ -0,0 +1,141 @@
+from array import array
+from bisect import bisect_right
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class CrushHistory:
+    """Sequence of crushed object codes, run-length encoded where that pays
+
+    Codes are the small integers assigned by the catalog. While crushes
+    repeat the same object, each run is stored as a code plus the cumulative
+    position where the run ends, so appending a repeat of the last object
+    costs nothing and slicing is a binary search. A run takes 6 bytes
+    against 2 for a plain code, so once runs average fewer than three
+    crushes, as when auto mode alternates objects, the codes are kept one
+    per crush instead; the history switches back once runs average six.
+    """
+
+    __slots__ = ("_codes", "_ends", "_runs", "_counts")
+
+    def __init__(self, codes: Iterable[int] = ()):
+        self._codes = array("H")
+        # Cumulative run ends, or None while the codes are kept one per crush
+        self._ends: Optional[array] = array("I")
+        self._runs = 0
+        self._counts: Dict[int, int] = {}
+        for code in codes:
+            self.append(code)
+
+    def __len__(self) -> int:
+        if self._ends is None:
+            return len(self._codes)
+        return self._ends[-1] if self._ends else 0
+
+    def append(self, code: int, count: int = 1):
+        codes, ends = self._codes, self._ends
+        if not codes or codes[-1] != code:
+            self._runs += 1
+            if ends is not None:
+                codes.append(code)
+                ends.append((ends[-1] if ends else 0) + count)
+        elif ends is not None:
+            ends[-1] += count
+        if ends is None:
+            if count == 1:
+                codes.append(code)
+            else:
+                codes.extend(array("H", [code]) * count)
+        self._counts[code] = self._counts.get(code, 0) + count
+        length = len(codes) if ends is None else ends[-1]
+        if (3 * self._runs > length) if ends is not None else (6 * self._runs < length):
+            self._encode()
+
+    def _encode(self):
+        """Switch to whichever encoding is smaller, with some slack so appends do not flip it back and forth"""
+        length = len(self)
+        if self._ends is not None and 3 * self._runs > length:
+            codes = array("H")
+            for code, count in self.runs():
+                codes.extend(array("H", [code]) * count)
+            self._codes, self._ends = codes, None
+        elif self._ends is None and 6 * self._runs < length:
+            codes, ends = array("H"), array("I")
+            for code, count in self.runs():
+                codes.append(code)
+                ends.append((ends[-1] if ends else 0) + count)
+            self._codes, self._ends = codes, ends
+
+    def truncate(self, length: int):
+        """Drop every crush from position length on"""
+        if self._ends is None:
+            if length >= len(self._codes):
+                return
+            previous = self._codes[length - 1] if length else None
+            for code, group in groupby(self._codes[length:]):
+                if code != previous:
+                    self._runs -= 1
+                previous = code
+                remaining = self._counts[code] - sum(1 for _ in group)
+                if remaining:
+                    self._counts[code] = remaining
+                else:
+                    del self._counts[code]
+            del self._codes[length:]
+            self._encode()
+            return
+        while self._ends and self._ends[-1] > length:
+            start = self._ends[-2] if len(self._ends) > 1 else 0
+            code = self._codes[-1]
+            remaining = self._counts[code] - (self._ends[-1] - max(start, length))
+            if remaining:
+                self._counts[code] = remaining
+            else:
+                del self._counts[code]
+            if start >= length:
+                self._codes.pop()
+                self._ends.pop()
+                self._runs -= 1
+            else:
+                self._ends[-1] = length
+        self._encode()
+
+    def counts(self) -> Dict[int, int]:
+        return dict(self._counts)
+
+    def runs(self) -> Iterator[Tuple[int, int]]:
+        """Yield (code, run_length) pairs in crush order"""
+        if self._ends is None:
+            for code, group in groupby(self._codes):
+                yield code, sum(1 for _ in group)
+            return
+        start = 0
+        for code, end in zip(self._codes, self._ends):
+            yield code, end - start
+            start = end
+
+    def slice(self, offset: int, limit: int) -> List[int]:
+        """Return up to limit codes starting at position offset"""
+        stop = min(offset + limit, len(self))
+        if offset >= stop:
+            return []
+        if self._ends is None:
+            return self._codes[offset:stop].tolist()
+        result = []
+        run = bisect_right(self._ends, offset)
+        position = offset
+        while position < stop:
+            end = min(self._ends[run], stop)
+            result.extend([self._codes[run]] * (end - position))
+            position = end
+            run += 1
+        return result
+
+    def tail(self, n: int) -> List[int]:
+        total = len(self)
+        return self.slice(max(total - n, 0), n)
+
+    @property
+    def nbytes(self) -> int:
+        ends = self._ends.itemsize * len(self._ends) if self._ends is not None else 0
+        return self._codes.itemsize * len(self._codes) + ends
@@ -0,0 +1,240 @@
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Mapping, Optional
+
+from crush_analytics import position_xy
+
+# Column name -> (array typecode, NumPy dtype); every column file is a flat
+# little-endian array of one fixed-width type
+COLUMNS = {
+    "code": ("H", "<u2"),
+    "force": ("f", "<f4"),
+    "x": ("f", "<f4"),
+    "y": ("f", "<f4"),
+    "ts": ("d", "<f8"),
+    "session": ("I", "<u4"),
+    "mode": ("B", "<u1"),
+}
+
+NAN = float("nan")
+
+
+class _Table:
+    """Append-only list of names stored one per line; a name's index is its line number
+
+    With max_names, only that many of the most recently used names are
+    kept in memory. A name looked up again after falling out is appended
+    once more under a new index, so a name can have several; readers fold
+    them back into the first with first_indexes().
+    """
+
+    def __init__(self, path: str, max_names: Optional[int] = None):
+        self.path = path
+        self.max_names = max_names
+        self.index: "OrderedDict[str, int]" = OrderedDict()
+        self.lines = 0
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as names:
+                for line in names:
+                    self._remember(line.rstrip("\n"), self.lines)
+                    self.lines += 1
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return self.lines
+
+    def _remember(self, name: str, position: int):
+        self.index[name] = position
+        self.index.move_to_end(name)
+        if self.max_names is not None and len(self.index) > self.max_names:
+            self.index.popitem(last=False)
+
+    def lookup(self, name: str) -> int:
+        position = self.index.get(name)
+        if position is None:
+            position = self.lines
+            self.lines += 1
+            self._file.write(name.replace("\n", " ") + "\n")
+            self._remember(name, position)
+        elif self.max_names is not None:
+            self.index.move_to_end(name)
+        return position
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ColumnarEventLog:
+    """Crush events as append-only fixed-width column files
+
+    Each column (see COLUMNS) lives in its own file under directory and
+    grows by whole chunks: events are buffered in typed arrays and written
+    once chunk_rows have built up, flush_interval has passed, or the log is
+    closed. Session ids and modes are stored as indexes into sessions.txt
+    and modes.txt, and objects.json maps object codes to ids, types and
+    satisfaction scores. Only the session_names most recently seen session
+    ids are held in memory; an older one that comes back is added to
+    sessions.txt again. Readers only trust the rows present in every
+    column, so a chunk that was cut short by a crash is ignored.
+
+    Takes the same event tuples as CrushAnalytics, so it can be one of its logs.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        get_catalog: Callable,
+        chunk_rows: int = 65_536,
+        flush_interval: float = 5.0,
+        session_names: int = 100_000,
+        clock=time.monotonic,
+    ):
+        self.directory = directory
+        self.get_catalog = get_catalog
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self._clock = clock
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._buffers = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+        self._sessions = _Table(os.path.join(directory, "sessions.txt"), max_names=session_names)
+        self._modes = _Table(os.path.join(directory, "modes.txt"))
+        self._objects_path = os.path.join(directory, "objects.json")
+        self._objects = read_objects(directory)
+        self._objects_changed = False
+        self._last_flush = clock()
+        self.rows_written = 0
+
+    def _code(self, object_id: str) -> int:
+        catalog = self.get_catalog()
+        code = catalog.codes[object_id]
+        if str(code) not in self._objects:
+            obj = catalog.get(object_id)
+            self._objects[str(code)] = {
+                "id": object_id, "type": obj["type"], "satisfaction_score": obj["satisfaction_score"],
+            }
+            self._objects_changed = True
+        return code
+
+    def write(self, events: List[tuple]):
+        with self._lock:
+            buffers = self._buffers
+            for ts, session_id, object_id, obj_type, force, position, mode in events:
+                x, y = position_xy(position) or (NAN, NAN)
+                buffers["code"].append(self._code(object_id))
+                buffers["force"].append(force)
+                buffers["x"].append(x)
+                buffers["y"].append(y)
+                buffers["ts"].append(ts)
+                buffers["session"].append(self._sessions.lookup(session_id))
+                buffers["mode"].append(self._modes.lookup(mode or ""))
+            if (len(buffers["code"]) >= self.chunk_rows or
+                    self._clock() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def _flush(self):
+        self._last_flush = self._clock()
+        rows = len(self._buffers["code"])
+        if not rows:
+            return
+        # Names and object codes go first so that every row on disk can be resolved
+        self._sessions.flush()
+        self._modes.flush()
+        if self._objects_changed:
+            temporary = self._objects_path + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as objects:
+                json.dump(self._objects, objects)
+            os.replace(temporary, self._objects_path)
+            self._objects_changed = False
+        for name, buffer in self._buffers.items():
+            if buffer.itemsize > 1 and sys.byteorder != "little":
+                buffer.byteswap()
+            with open(os.path.join(self.directory, f"{name}.col"), "ab") as column:
+                buffer.tofile(column)
+            del buffer[:]
+        self.rows_written += rows
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._sessions.close()
+            self._modes.close()
+
+
+def read_objects(directory: str) -> Dict[str, dict]:
+    path = os.path.join(directory, "objects.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as objects:
+        return json.load(objects)
+
+
+def read_names(path: str) -> List[str]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as names:
+        return [line.rstrip("\n") for line in names]
+
+
+def first_indexes(names: List[str]) -> Optional[List[int]]:
+    """Index of the first line with the same name, for every line; None if names are unique"""
+    if len(set(names)) == len(names):
+        return None
+    first: Dict[str, int] = {}
+    return [first.setdefault(name, position) for position, name in enumerate(names)]
+
+
+class ColumnarEventReader:
+    """Memory-mapped read access to a ColumnarEventLog directory
+
+    columns maps each column name to a read-only NumPy array over its file,
+    cut to the rows that every column has. A session id written under
+    several indexes is read as its first one, which makes the session
+    column an array in memory rather than a map of the file.
+    """
+
+    def __init__(self, directory: str):
+        import numpy as np
+
+        self.directory = directory
+        sizes = {}
+        for name, (_, dtype) in COLUMNS.items():
+            path = os.path.join(directory, f"{name}.col")
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            sizes[name] = size // np.dtype(dtype).itemsize
+        self.rows = min(sizes.values())
+        self.columns: Mapping[str, "np.ndarray"] = {}
+        for name, (_, dtype) in COLUMNS.items():
+            if self.rows:
+                column = np.memmap(os.path.join(directory, f"{name}.col"), dtype=dtype, mode="r", shape=(self.rows,))
+            else:
+                column = np.empty(0, dtype=dtype)
+            self.columns[name] = column
+        self.objects = {int(code): obj for code, obj in read_objects(directory).items()}
+        self.sessions = read_names(os.path.join(directory, "sessions.txt"))
+        folded = first_indexes(self.sessions)
+        if folded is not None and self.rows:
+            self.columns["session"] = np.asarray(folded, dtype=COLUMNS["session"][1])[self.columns["session"]]
+        self.modes = read_names(os.path.join(directory, "modes.txt"))
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def object_id(self, code: int) -> Optional[str]:
+        obj = self.objects.get(code)
+        return obj["id"] if obj else None
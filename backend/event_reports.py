@@ -0,0 +1,160 @@
+"""Offline reports over a columnar crush event log
+
+    python event_reports.py /path/to/event-columns [--since TS] [--until TS] [--output report.json]
+
+Every statistic is computed with whole-column NumPy operations (bincount,
+argsort, unique) over the memory-mapped columns, so millions of events are
+reported on without building a Python object per event.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, Optional
+
+import numpy as np
+
+from event_columns import ColumnarEventReader
+
+
+def select(reader: ColumnarEventReader, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """Columns restricted to events with since <= ts < until"""
+    columns = dict(reader.columns)
+    if since is None and until is None:
+        return columns
+    ts = columns["ts"]
+    mask = np.ones(len(ts), dtype=bool)
+    if since is not None:
+        mask &= ts >= since
+    if until is not None:
+        mask &= ts < until
+    return {name: column[mask] for name, column in columns.items()}
+
+
+def _percentiles(groups: np.ndarray, values: np.ndarray, counts: np.ndarray, quantiles) -> Dict[str, np.ndarray]:
+    """Nearest-rank percentiles of values within each group, NaN for empty groups"""
+    # Groups fit in 16 bits, so this stable argsort is a radix sort; each
+    # group's values are then contiguous and sorted on their own
+    grouped = values[np.argsort(groups.astype(np.uint16), kind="stable")]
+    starts = np.cumsum(counts) - counts
+    result = {f"p{int(quantile * 100)}": np.full(len(counts), np.nan) for quantile in quantiles}
+    for group in np.flatnonzero(counts):
+        ordered = np.sort(grouped[starts[group]:starts[group] + counts[group]])
+        for quantile in quantiles:
+            rank = max(int(np.ceil(quantile * counts[group])) - 1, 0)
+            result[f"p{int(quantile * 100)}"][group] = ordered[rank]
+    return result
+
+
+def _group_stats(groups: np.ndarray, size: int, columns: Dict[str, np.ndarray], scores: np.ndarray) -> Dict[str, np.ndarray]:
+    force = columns["force"].astype(np.float64)
+    counts = np.bincount(groups, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_force = np.bincount(groups, weights=force, minlength=size) / counts
+        mean_square = np.bincount(groups, weights=force * force, minlength=size) / counts
+        std_force = np.sqrt(np.maximum(mean_square - mean_force * mean_force, 0))
+
+        x = columns["x"]
+        y = columns["y"]
+        placed = ~(np.isnan(x) | np.isnan(y))
+        placed_counts = np.bincount(groups[placed], minlength=size)
+        mean_x = np.bincount(groups[placed], weights=x[placed], minlength=size) / placed_counts
+        mean_y = np.bincount(groups[placed], weights=y[placed], minlength=size) / placed_counts
+
+    # Distinct sessions per group from unique (group, session) pairs
+    pairs = np.unique((groups.astype(np.uint64) << np.uint64(32)) | columns["session"].astype(np.uint64))
+    sessions = np.bincount((pairs >> np.uint64(32)).astype(np.int64), minlength=size)
+    satisfaction = np.rint(np.bincount(groups, weights=scores[columns["code"]], minlength=size)).astype(np.int64)
+
+    return {
+        "count": counts,
+        "sessions": sessions,
+        "satisfaction": satisfaction,
+        "mean_force": mean_force,
+        "std_force": std_force,
+        **_percentiles(groups, force, counts, (0.5, 0.95)),
+        "mean_x": mean_x,
+        "mean_y": mean_y,
+    }
+
+
+def _rows(names, stats: Dict[str, np.ndarray]) -> Dict[str, dict]:
+    rows = {}
+    for index, name in enumerate(names):
+        if name is None or not stats["count"][index]:
+            continue
+        rows[name] = {
+            key: (None if np.isnan(value) else round(float(value), 4)) if isinstance(value, np.floating)
+            else int(value)
+            for key, value in ((key, column[index]) for key, column in stats.items())
+        }
+    return rows
+
+
+def _scores(reader: ColumnarEventReader, size: int) -> np.ndarray:
+    scores = np.zeros(size, dtype=np.float64)
+    for code, obj in reader.objects.items():
+        if code < size:
+            scores[code] = obj["satisfaction_score"]
+    return scores
+
+
+def per_object(reader: ColumnarEventReader, columns: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, dict]:
+    """Crushes, sessions, satisfaction, force distribution and mean position per object"""
+    columns = columns if columns is not None else reader.columns
+    codes = columns["code"].astype(np.int64)
+    size = max(int(codes.max()) + 1 if len(codes) else 0, max(reader.objects, default=-1) + 1)
+    stats = _group_stats(codes, size, columns, _scores(reader, size))
+    return _rows([reader.object_id(code) for code in range(size)], stats)
+
+
+def per_mode(reader: ColumnarEventReader, columns: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, dict]:
+    """The per-object statistics grouped by game mode, plus each mode's most crushed object"""
+    columns = columns if columns is not None else reader.columns
+    modes = columns["mode"].astype(np.int64)
+    codes = columns["code"].astype(np.int64)
+    size = len(reader.modes)
+    objects = max(int(codes.max()) + 1 if len(codes) else 0, max(reader.objects, default=-1) + 1)
+    stats = _group_stats(modes, size, columns, _scores(reader, objects))
+    rows = _rows([mode or "unknown" for mode in reader.modes], stats)
+
+    by_mode_object = np.bincount(modes * objects + codes, minlength=size * objects).reshape(size, max(objects, 1))
+    top = by_mode_object.argmax(axis=1) if objects else np.zeros(size, dtype=np.int64)
+    for index, mode in enumerate(reader.modes):
+        if (mode or "unknown") in rows:
+            rows[mode or "unknown"]["top_object"] = reader.object_id(int(top[index]))
+    return rows
+
+
+def report(reader: ColumnarEventReader, since: Optional[float] = None, until: Optional[float] = None) -> dict:
+    columns = select(reader, since, until)
+    ts = columns["ts"]
+    return {
+        "events": int(len(ts)),
+        "sessions": int(len(np.unique(columns["session"]))),
+        "first_ts": float(ts.min()) if len(ts) else None,
+        "last_ts": float(ts.max()) if len(ts) else None,
+        "objects": per_object(reader, columns),
+        "modes": per_mode(reader, columns),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="ColumnarEventLog directory (EVENT_COLUMNS_DIR)")
+    parser.add_argument("--since", type=float, help="only events at or after this unix timestamp")
+    parser.add_argument("--until", type=float, help="only events before this unix timestamp")
+    parser.add_argument("--output", help="write the report to this JSON file instead of stdout")
+    args = parser.parse_args(argv)
+
+    result = report(ColumnarEventReader(args.directory), args.since, args.until)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+METRICS = ("satisfaction", "crushed")
+WINDOWS = ("all", "daily", "weekly")
+
+logger = logging.getLogger(__name__)
+
+class RankedIndex:
+    """Members ordered by descending score in a chunked sorted list
+
+    Keys are (-score, member) tuples kept in sorted chunks of at most
+    2 * CHUNK entries, with the last key of every chunk in a separate list
+    and the chunk lengths in a Fenwick tree. Finding a key is a bisect over
+    the chunk maxima and one within a chunk, both in C, and inserting shifts
+    at most one chunk. A rank is a prefix sum over the tree and a page
+    starts at the chunk found by descending it, so both are O(log n).
+    update() applies many score changes at once, merging them into the
+    sorted keys when they touch a large share of the members. Equal scores
+    are ordered by member.
+    """
+
+    CHUNK = 256
+    # update() rebuilds the chunks when at least 1 / REBUILD_SHARE of the members change
+    REBUILD_SHARE = 16
+
+    def __init__(self):
+        self._chunks: List[List[tuple]] = []
+        self._maxes: List[tuple] = []
+        self._tree: List[int] = []
+        self._scores: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, member: str) -> bool:
+        return member in self._scores
+
+    def score(self, member: str) -> Optional[float]:
+        return self._scores.get(member)
+
+    def _rebuild_tree(self):
+        tree = [len(chunk) for chunk in self._chunks]
+        for i in range(1, len(tree) + 1):
+            parent = i + (i & -i)
+            if parent <= len(tree):
+                tree[parent - 1] += tree[i - 1]
+        self._tree = tree
+
+    def _resize(self, index: int, delta: int):
+        tree = self._tree
+        index += 1
+        while index <= len(tree):
+            tree[index - 1] += delta
+            index += index & -index
+
+    def _prefix(self, index: int) -> int:
+        """Total length of the chunks before chunk index"""
+        tree = self._tree
+        total = 0
+        while index > 0:
+            total += tree[index - 1]
+            index -= index & -index
+        return total
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """Chunk holding a position, and the position within it"""
+        tree = self._tree
+        index = 0
+        step = 1 << (len(tree).bit_length() - 1) if tree else 0
+        while step:
+            if index + step <= len(tree) and tree[index + step - 1] <= position:
+                index += step
+                position -= tree[index - 1]
+            step >>= 1
+        return index, position
+
+    def _load(self, keys: List[tuple]):
+        self._chunks = [keys[i:i + self.CHUNK] for i in range(0, len(keys), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._rebuild_tree()
+
+    def _insert(self, key: tuple):
+        maxes = self._maxes
+        if not maxes:
+            self._chunks.append([key])
+            maxes.append(key)
+            self._rebuild_tree()
+            return
+        index = bisect_left(maxes, key)
+        if index == len(maxes):
+            index -= 1
+            self._chunks[index].append(key)
+            maxes[index] = key
+        else:
+            insort(self._chunks[index], key)
+        chunk = self._chunks[index]
+        if len(chunk) > 2 * self.CHUNK:
+            self._chunks.insert(index + 1, chunk[self.CHUNK:])
+            del chunk[self.CHUNK:]
+            maxes[index] = chunk[-1]
+            maxes.insert(index + 1, self._chunks[index + 1][-1])
+            self._rebuild_tree()
+        else:
+            self._resize(index, 1)
+
+    def _remove(self, key: tuple):
+        index = bisect_left(self._maxes, key)
+        chunk = self._chunks[index]
+        del chunk[bisect_left(chunk, key)]
+        if chunk:
+            self._maxes[index] = chunk[-1]
+            self._resize(index, -1)
+        else:
+            del self._chunks[index]
+            del self._maxes[index]
+            self._rebuild_tree()
+
+    def set(self, member: str, score: float):
+        old = self._scores.get(member)
+        if old == score:
+            return
+        self._scores[member] = score
+        key = (-score, member)
+        if old is None:
+            self._insert(key)
+            return
+        old_key = (-old, member)
+        maxes = self._maxes
+        index = bisect_left(maxes, old_key)
+        if index == bisect_left(maxes, key):
+            # Stays within its chunk, whose length does not change
+            chunk = self._chunks[index]
+            del chunk[bisect_left(chunk, old_key)]
+            insort(chunk, key)
+            maxes[index] = chunk[-1]
+        else:
+            self._remove(old_key)
+            self._insert(key)
+
+    def add(self, member: str, amount: float) -> float:
+        score = self._scores.get(member, 0) + amount
+        self.set(member, score)
+        return score
+
+    def update(self, amounts: Dict[str, float]):
+        """Add amounts to many members' scores, members not on the board starting from 0"""
+        scores = self._scores
+        if len(amounts) * self.REBUILD_SHARE < len(scores):
+            for member, amount in amounts.items():
+                self.add(member, amount)
+            return
+        keys = [key for chunk in self._chunks for key in chunk if key[1] not in amounts]
+        for member, amount in amounts.items():
+            score = scores[member] = scores.get(member, 0) + amount
+            keys.append((-score, member))
+        # One sorted run and the changed keys: the sort merges them
+        keys.sort()
+        self._load(keys)
+
+    def discard(self, member: str):
+        score = self._scores.pop(member, None)
+        if score is not None:
+            self._remove((-score, member))
+
+    def pop_lowest(self, count: int) -> List[Tuple[str, float]]:
+        """Remove up to count members with the lowest scores, returning them with their scores"""
+        popped = []
+        chunks = self._chunks
+        while count > 0 and chunks:
+            chunk = chunks[-1]
+            taken = chunk[-count:]
+            del chunk[-count:]
+            for neg_score, member in taken:
+                del self._scores[member]
+                popped.append((member, -neg_score))
+            if chunk:
+                self._maxes[-1] = chunk[-1]
+            else:
+                chunks.pop()
+                self._maxes.pop()
+            count -= len(taken)
+        if popped:
+            self._rebuild_tree()
+        return popped
+
+    def rank(self, member: str) -> Optional[int]:
+        """Zero-based position of a member, highest score first"""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        key = (-score, member)
+        index = bisect_left(self._maxes, key)
+        return self._prefix(index) + bisect_left(self._chunks[index], key)
+
+    def page(self, offset: int, limit: int) -> List[Tuple[str, float]]:
+        """Members and scores at positions offset .. offset + limit - 1"""
+        entries = []
+        index, skip = self._locate(offset)
+        for chunk in self._chunks[index:]:
+            for neg_score, member in chunk[skip:skip + limit - len(entries)]:
+                entries.append((member, -neg_score))
+            skip = 0
+            if len(entries) >= limit:
+                break
+        return entries
+
+    def lowest(self) -> Optional[str]:
+        return self._maxes[-1][1] if self._maxes else None
+
+
+def window_period(window: str, when: float) -> Tuple[str, float]:
+    """Calendar period (UTC) that a timestamp falls in for a window, and when it ends"""
+    if window == "all":
+        return "all", float("inf")
+    moment = datetime.fromtimestamp(when, tz=timezone.utc)
+    start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if window == "daily":
+        return start.strftime("%Y-%m-%d"), (start + timedelta(days=1)).timestamp()
+    year, week, weekday = moment.isocalendar()
+    end = start + timedelta(days=8 - weekday)
+    return f"{year}-W{week:02d}", end.timestamp()
+
+
+class Leaderboards:
+    """Session rankings by satisfaction and crush count, overall and per object type
+
+    Each (window, metric, type) combination is its own RankedIndex. Crushes
+    are buffered as per-session deltas by record() and applied to the
+    boards by flush(), which run_flusher() calls every interval a board at a
+    time, and reads call first. Daily and weekly boards only hold the
+    current UTC period and start empty when a new one begins; deltas are
+    flushed into the period they were recorded in. Each board keeps at
+    most capacity sessions. The lowest is dropped when it overflows, and
+    its score is remembered for up to capacity dropped sessions, so one that
+    crushes again picks up where it was.
+    """
+
+    def __init__(self, capacity: int = 100_000, clock=time.time):
+        self.capacity = capacity
+        self._clock = clock
+        self._boards: Dict[Tuple[str, str, Optional[str]], RankedIndex] = {}
+        self._spilled: Dict[Tuple[str, str, Optional[str]], "OrderedDict[str, float]"] = {}
+        self._periods: Dict[str, str] = {}
+        self._period_ends: Dict[str, float] = {}
+        # Earliest end of a current period, when deltas must be flushed before recording more
+        self._rollover = 0.0
+        # session -> object type -> [satisfaction, crushed]
+        self._pending: Dict[str, Dict[str, List[int]]] = {}
+        self._queue: "deque[Tuple[Tuple[str, str, Optional[str]], Dict[str, int]]]" = deque()
+        self.dropped = 0
+
+    def period(self, window: str) -> str:
+        """Current period of a window, clearing its boards when a new one has begun"""
+        now = self._clock()
+        if now < self._period_ends.get(window, 0.0):
+            return self._periods[window]
+        period, self._period_ends[window] = window_period(window, now)
+        if self._periods.get(window) != period:
+            self._periods[window] = period
+            for key in [key for key in self._boards if key[0] == window]:
+                del self._boards[key]
+                self._spilled.pop(key, None)
+        return period
+
+    def board(self, window: str, metric: str, obj_type: Optional[str] = None) -> RankedIndex:
+        self.flush()
+        return self._board(window, metric, obj_type)
+
+    def _board(self, window: str, metric: str, obj_type: Optional[str]) -> RankedIndex:
+        key = (window, metric, obj_type)
+        board = self._boards.get(key)
+        if board is None:
+            board = self._boards[key] = RankedIndex()
+        return board
+
+    def _trim(self, key: Tuple[str, str, Optional[str]], board: RankedIndex):
+        if len(board) <= self.capacity:
+            return
+        spilled = self._spilled.get(key)
+        if spilled is None:
+            spilled = self._spilled[key] = OrderedDict()
+        for session_id, score in board.pop_lowest(len(board) - self.capacity):
+            spilled[session_id] = score
+            spilled.move_to_end(session_id)
+            self.dropped += 1
+        while len(spilled) > self.capacity:
+            spilled.popitem(last=False)
+
+    def record(self, session_id: str, obj_type: str, satisfaction: int, count: int = 1):
+        """Buffer crushes of one object type for every board the session is on"""
+        if self._clock() >= self._rollover:
+            self.flush()
+        types = self._pending.get(session_id)
+        if types is None:
+            types = self._pending[session_id] = {}
+        delta = types.get(obj_type)
+        if delta is None:
+            types[obj_type] = [satisfaction, count]
+        else:
+            delta[0] += satisfaction
+            delta[1] += count
+
+    def _drain(self):
+        """Queue the buffered deltas as one update per board"""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        amounts: Dict[Tuple[str, Optional[str]], Dict[str, int]] = {}
+        for session_id, types in pending.items():
+            satisfaction = crushed = 0
+            for obj_type, (type_satisfaction, type_crushed) in types.items():
+                satisfaction += type_satisfaction
+                crushed += type_crushed
+                amounts.setdefault(("satisfaction", obj_type), {})[session_id] = type_satisfaction
+                amounts.setdefault(("crushed", obj_type), {})[session_id] = type_crushed
+            amounts.setdefault(("satisfaction", None), {})[session_id] = satisfaction
+            amounts.setdefault(("crushed", None), {})[session_id] = crushed
+        for window in WINDOWS:
+            for (metric, obj_type), members in amounts.items():
+                self._queue.append(((window, metric, obj_type), members))
+
+    def _apply(self, key: Tuple[str, str, Optional[str]], amounts: Dict[str, int]):
+        board = self._board(*key)
+        spilled = self._spilled.get(key)
+        if spilled:
+            amounts = {
+                session_id: amount + spilled.pop(session_id, 0) if session_id not in board else amount
+                for session_id, amount in amounts.items()
+            }
+        board.update(amounts)
+        self._trim(key, board)
+
+    def _roll(self):
+        for window in WINDOWS:
+            self.period(window)
+        self._rollover = min(self._period_ends.values())
+
+    def _flushing(self) -> Iterator[None]:
+        """Apply every buffered delta to the boards, pausing after each board"""
+        if not self._periods:
+            self._roll()
+        self._drain()
+        while self._queue:
+            self._apply(*self._queue.popleft())
+            yield
+        if self._clock() >= self._rollover:
+            self._roll()
+
+    def flush(self):
+        for _ in self._flushing():
+            pass
+
+    async def run_flusher(self, interval: float):
+        """Flush every interval seconds until cancelled, letting other work run between boards"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                for _ in self._flushing():
+                    await asyncio.sleep(0)
+            except Exception:
+                logger.exception("Leaderboard flush failed")
+
+    def finish(self, session_id: str, totals_by_type: Dict[str, Tuple[int, int]]):
+        """Set a finished session's all-time scores from its own totals
+
+        totals_by_type maps object type to (crushed, satisfaction). This also
+        ranks crushes this process never saw, such as those made before a
+        restart.
+        """
+        self.flush()
+        overall = {"crushed": 0, "satisfaction": 0}
+        for obj_type, (crushed, satisfaction) in totals_by_type.items():
+            for metric, amount in (("crushed", crushed), ("satisfaction", satisfaction)):
+                overall[metric] += amount
+                self._finish(("all", metric, obj_type), session_id, amount)
+        for metric, amount in overall.items():
+            self._finish(("all", metric, None), session_id, amount)
+
+    def _finish(self, key: Tuple[str, str, Optional[str]], session_id: str, score: int):
+        board = self._board(*key)
+        board.set(session_id, score)
+        self._spilled.get(key, {}).pop(session_id, None)
+        self._trim(key, board)
+
+    def top(self, window: str, metric: str, obj_type: Optional[str] = None,
+            offset: int = 0, limit: int = 10) -> dict:
+        board = self.board(window, metric, obj_type)
+        entries = [
+            {"rank": offset + position + 1, "session_id": session_id, "score": score}
+            for position, (session_id, score) in enumerate(board.page(offset, limit))
+        ]
+        return {"period": self._periods[window], "total": len(board), "entries": entries}
+
+    def rank(self, session_id: str, window: str, metric: str, obj_type: Optional[str] = None) -> dict:
+        board = self.board(window, metric, obj_type)
+        position = board.rank(session_id)
+        return {
+            "period": self._periods[window],
+            "rank": None if position is None else position + 1,
+            "score": board.score(session_id),
+            "total": len(board),
+        }
+
+    def metrics(self) -> dict:
+        return {
+            "boards": len(self._boards),
+            "entries": sum(len(board) for board in self._boards.values()),
+            "capacity": self.capacity,
+            "dropped": self.dropped,
+            "spilled": sum(len(spilled) for spilled in self._spilled.values()),
+            "pending": len(self._pending),
+        }
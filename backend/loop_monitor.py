@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from metrics import Counter, Histogram, route_template
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Samples event loop scheduling delay
+
+    Every interval it sleeps and measures how much later than asked it woke
+    up, which is how long ready callbacks waited behind whatever was holding
+    the loop. lag is the latest sample and worst the largest since start;
+    every sample is observed by histogram and passed to on_sample.
+    """
+
+    def __init__(self, interval: float = 0.05, histogram: Optional[Histogram] = None,
+                 on_sample: Optional[Callable[[float], None]] = None):
+        self.interval = interval
+        self.histogram = histogram
+        self.on_sample = on_sample
+        self.lag = 0.0
+        self.worst = 0.0
+        self.samples = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0.0)
+            self.lag = lag
+            self.worst = max(self.worst, lag)
+            self.samples += 1
+            if self.histogram is not None:
+                self.histogram.observe(lag)
+            if self.on_sample is not None:
+                self.on_sample(lag)
+
+
+class StepTimer:
+    """Awaits a coroutine, timing every step it runs on the event loop
+
+    A coroutine runs in steps, each from one suspension to the next, and
+    nothing else runs on the loop during a step. busy is the total time of
+    the coroutine's steps, longest the longest single one; time spent
+    suspended, waiting for I/O or an executor, counts toward neither.
+    Futures the coroutine suspends on are passed through unchanged, as are
+    results and exceptions coming back, including cancellation.
+    """
+
+    __slots__ = ("coro", "busy", "longest", "steps")
+
+    def __init__(self, coro):
+        self.coro = coro
+        self.busy = 0.0
+        self.longest = 0.0
+        self.steps = 0
+
+    def _record(self, started: float):
+        elapsed = time.perf_counter() - started
+        self.busy += elapsed
+        self.steps += 1
+        if elapsed > self.longest:
+            self.longest = elapsed
+
+    def __await__(self):
+        send, throw = self.coro.send, self.coro.throw
+        value = error = None
+        while True:
+            started = time.perf_counter()
+            try:
+                yielded = send(value) if error is None else throw(error)
+            except StopIteration as stop:
+                self._record(started)
+                return stop.value
+            except BaseException:
+                self._record(started)
+                raise
+            self._record(started)
+            try:
+                value, error = (yield yielded), None
+            except BaseException as exc:
+                value, error = None, exc
+
+
+class LoopBlockingMiddleware:
+    """Pure ASGI middleware finding handlers that hold the event loop too long
+
+    Every HTTP request and WebSocket connection is run under a StepTimer.
+    Its longest step is observed per route by histogram, and when that step
+    exceeds budget seconds, the route is counted in over_budget and logged,
+    at most once per log_interval seconds for each route.
+    """
+
+    def __init__(self, app, budget: float, histogram: Histogram, over_budget: Counter, log_interval: float = 60.0):
+        self.app = app
+        self.budget = budget
+        self.histogram = histogram
+        self.over_budget = over_budget
+        self.log_interval = log_interval
+        self._logged: Dict[str, float] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        timer = StepTimer(self.app(scope, receive, send))
+        try:
+            await timer
+        finally:
+            route = route_template(scope)
+            self.histogram.observe(timer.longest, route)
+            if timer.longest > self.budget:
+                self.over_budget.inc(route)
+                now = time.monotonic()
+                if now - self._logged.get(route, -self.log_interval) >= self.log_interval:
+                    self._logged[route] = now
+                    logger.warning(
+                        "%s held the event loop for %.1f ms in one step, over the %.1f ms budget "
+                        "(%.1f ms in %d steps)", route, timer.longest * 1000, self.budget * 1000,
+                        timer.busy * 1000, timer.steps,
+                    )
@@ -0,0 +1,72 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class Offload:
+    """Runs CPU-heavy work off the event loop
+
+    run() hands a call to a thread pool. A thread still holds the GIL while
+    it runs Python code, but the interpreter switches threads every few
+    milliseconds, so the event loop keeps serving other requests instead
+    of stalling for the whole call. start() also makes the thread pool the
+    loop's default executor, so run_in_executor(None, ...) elsewhere shares
+    its bounded set of threads.
+
+    compute() goes to a pool of processes when processes > 0, which runs
+    in parallel with the event loop at the price of pickling the call and
+    its result, and to the thread pool otherwise. Processes are spawned
+    rather than forked, since forking a process that runs threads can
+    copy locks in a held state.
+    """
+
+    def __init__(self, threads: Optional[int] = None, processes: int = 0):
+        # ThreadPoolExecutor's own default size
+        self.thread_count = threads or min(32, (os.cpu_count() or 1) + 4)
+        self.threads = ThreadPoolExecutor(self.thread_count, thread_name_prefix="offload")
+        self.processes = ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn")
+        ) if processes > 0 else None
+        self.process_count = processes
+        self.running: Dict[str, int] = {"thread": 0, "process": 0}
+        self.completed: Dict[str, int] = {"thread": 0, "process": 0}
+
+    def start(self):
+        asyncio.get_running_loop().set_default_executor(self.threads)
+
+    async def warm_up(self, func: Callable, *args):
+        """Call func in every worker process, so none is spawned on a request's time"""
+        if self.processes is not None:
+            await asyncio.gather(*(self.compute(func, *args) for _ in range(self.process_count)))
+
+    async def _submit(self, kind: str, pool: Executor, func: Callable, args: tuple):
+        self.running[kind] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+        finally:
+            self.running[kind] -= 1
+            self.completed[kind] += 1
+
+    async def run(self, func: Callable, *args):
+        return await self._submit("thread", self.threads, func, args)
+
+    async def compute(self, func: Callable, *args):
+        """Call func in a worker process, or a thread if there are none; func and args must pickle"""
+        if self.processes is None:
+            return await self.run(func, *args)
+        return await self._submit("process", self.processes, func, args)
+
+    def close(self):
+        if self.processes is not None:
+            self.processes.shutdown(wait=False, cancel_futures=True)
+        self.threads.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        return {
+            "threads": self.thread_count,
+            "processes": self.process_count,
+            "running": dict(self.running),
+            "completed": dict(self.completed),
+        }
@@ -0,0 +1,188 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+
+class RateLimiter:
+    """Token buckets keyed by client, session or anything else hashable
+
+    Each key refills at rate tokens per second up to burst. A bucket is two
+    floats, and a key whose bucket has had time to refill completely is
+    indistinguishable from a new one, so it is dropped: keys are kept in
+    least recently used order and every wait() expires up to two idle
+    ones from the front, which keeps memory proportional to recently
+    active keys with O(1) work per call.
+    """
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        if rate <= 0 or burst < 1:
+            raise ValueError("Rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.idle_after = burst / rate
+        self._clock = clock
+        # key -> [tokens, last refill time]
+        self._buckets: "OrderedDict[object, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def wait(self, key, cost: float = 1.0) -> float:
+        """Seconds until key has cost tokens, 0 if it has them now; takes none"""
+        now = self._clock()
+        buckets = self._buckets
+        for _ in range(2):
+            if not buckets:
+                break
+            oldest = next(iter(buckets))
+            if now - buckets[oldest][1] < self.idle_after or oldest == key:
+                break
+            del buckets[oldest]
+
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [self.burst, now]
+        else:
+            buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= cost:
+            return 0.0
+        return (cost - bucket[0]) / self.rate
+
+    def spend(self, key, cost: float = 1.0):
+        """Take cost tokens from key, which wait() has just found has them"""
+        self._buckets[key][0] -= cost
+
+    def acquire(self, key, cost: float = 1.0) -> float:
+        """Take cost tokens for key; 0 if allowed, otherwise seconds until it would be"""
+        wait = self.wait(key, cost)
+        if not wait:
+            self.spend(key, cost)
+        return wait
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class RouteLimit:
+    """Per-session and per-client limits for one route, used as a FastAPI dependency
+
+    Either limit may be None. Clients are told apart by request.client.host,
+    which uvicorn's --proxy-headers sets from X-Forwarded-For behind a proxy.
+    """
+
+    def __init__(self, name: str, session: Optional[Tuple[float, float]] = None,
+                 ip: Optional[Tuple[float, float]] = None, on_limited=None, clock=time.monotonic):
+        self.name = name
+        self.session = RateLimiter(*session, clock=clock) if session else None
+        self.ip = RateLimiter(*ip, clock=clock) if ip else None
+        self.on_limited = on_limited
+
+    def check(self, session_id: Optional[str] = None, client: Optional[str] = None):
+        """Raise a 429 if the client or session has used up its tokens
+
+        Both buckets are checked before either is charged, so a request
+        refused for one of them costs the other nothing.
+        """
+        limits = [(scope, limiter, key)
+                  for scope, limiter, key in (("ip", self.ip, client), ("session", self.session, session_id))
+                  if limiter is not None and key is not None]
+        for scope, limiter, key in limits:
+            wait = limiter.wait(key)
+            if wait:
+                if self.on_limited is not None:
+                    self.on_limited(self.name, scope)
+                raise HTTPException(
+                    status_code=429,
+                    detail=f"Too many {self.name} requests for this {scope}",
+                    headers={"Retry-After": retry_after(wait)},
+                )
+        for _, limiter, key in limits:
+            limiter.spend(key)
+
+    async def __call__(self, request: Request):
+        self.check(request.path_params.get("session_id"), request.client.host if request.client else None)
+
+
+def parse_limits(config: Dict[str, dict], scale: float = 1.0) -> Dict[str, dict]:
+    """Route name -> {"session": (rate, burst), "ip": (rate, burst)}, scaled
+
+    A scope set to null is not limited.
+    """
+    limits = {}
+    for name, scopes in config.items():
+        limits[name] = {}
+        for scope, value in scopes.items():
+            if scope not in ("session", "ip"):
+                raise ValueError(f"Unknown rate limit scope '{scope}' for {name}")
+            if value is not None:
+                rate, burst = value
+                limits[name][scope] = (float(rate) * scale, float(burst) * scale)
+    return limits
+
+
+class AdmissionControl:
+    """Decides when the process is too loaded to take more requests
+
+    It is overloaded while the latest event loop lag passed to observe_lag()
+    exceeds max_lag seconds, or while max_inflight requests are being
+    handled. Either threshold set to 0 is not checked.
+    """
+
+    def __init__(self, max_lag: float = 0.5, max_inflight: int = 1000, on_shed=None):
+        self.max_lag = max_lag
+        self.max_inflight = max_inflight
+        self.on_shed = on_shed
+        self.lag = 0.0
+        self.inflight = 0
+
+    def observe_lag(self, lag: float):
+        self.lag = lag
+
+    def overloaded(self) -> Optional[str]:
+        if self.max_lag > 0 and self.lag > self.max_lag:
+            return "lag"
+        if self.max_inflight > 0 and self.inflight >= self.max_inflight:
+            return "inflight"
+        return None
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware answering 429 with Retry-After while control is overloaded
+
+    Paths in exempt (health checks, metrics) are always let through.
+    """
+
+    def __init__(self, app, control: AdmissionControl, exempt: Iterable[str] = ()):
+        self.app = app
+        self.control = control
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        control = self.control
+        reason = control.overloaded()
+        if reason is not None:
+            if control.on_shed is not None:
+                control.on_shed(reason)
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [(b"content-type", b"application/json"), (b"retry-after", b"1")],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server is overloaded"}'})
+            return
+
+        control.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            control.inflight -= 1
@@ -0,0 +1,221 @@
+"""Next-object recommendations from crush co-occurrence
+
+    python recommender.py EVENT_COLUMNS_DIR --output recommender.npz
+
+builds the recommender's arrays from a columnar crush event log, so a
+server started with RECOMMENDER_PATH pointing at the output recommends
+from past sessions straight away rather than learning from scratch.
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class Recommender:
+    """Recommends what a session should crush next from what it crushed last
+
+    Every object code the recommender has seen gets a row, in index, so
+    the arrays are as large as the catalog however high its codes go.
+    cooccurrence[i, j] counts how often the code of row j was crushed
+    within WINDOW crushes after the code of row i in the same session, and
+    crushes and satisfaction hold each row's crush count and satisfaction
+    total. All three are NumPy arrays updated in place on every crush by
+    record(). add_codes() gives new codes rows, growing the arrays; the
+    server calls it when a catalog is installed, so crushes only ever find
+    their rows in place.
+
+    An object's score for a session is the chance of it following each of
+    the session's last WINDOW crushes, most recent weighted highest and
+    smoothed towards overall popularity, times its mean satisfaction per
+    crush, halved for every time it is among those last crushes so that
+    sessions are steered onto something new. Scoring is a handful of
+    whole-array operations on a WINDOW by objects slice of the matrix,
+    well under a millisecond even for a thousand objects.
+
+    NumPy is imported by warm_up(), which also loads the arrays from path
+    if that file exists; save() writes them back, with the code of each row.
+    """
+
+    WINDOW = 3
+    # Weight of the most recent crush; each earlier one counts half as much
+    RECENCY = (1.0, 0.5, 0.25)
+
+    def __init__(self, path: Optional[str] = None, prior: float = 1.0):
+        self.path = path
+        self.prior = prior
+        self.np = None
+        self.cooccurrence = None
+        self.crushes = None
+        self.satisfaction = None
+        # Object code -> row of the arrays
+        self.index: Dict[int, int] = {}
+        # Objects last scored, their codes, catalog satisfaction scores and positions by code
+        self._candidates: tuple = (None, None, None, None)
+        # Number of recent crushes -> their normalised recency weights, oldest first
+        self._recency: dict = {}
+        self._warm_up_lock = threading.Lock()
+
+    def warm_up(self, codes: Iterable[int] = ()):
+        """Import NumPy and load or create the arrays, with rows for codes"""
+        with self._warm_up_lock:
+            if self.np is not None:
+                return
+            import numpy
+            if self.path and os.path.exists(self.path):
+                with numpy.load(self.path) as arrays:
+                    self.cooccurrence = arrays["cooccurrence"].astype(numpy.float64)
+                    self.crushes = arrays["crushes"].astype(numpy.float64)
+                    self.satisfaction = arrays["satisfaction"].astype(numpy.float64)
+                    # Files saved before rows were assigned have one row per code
+                    rows = arrays["codes"].tolist() if "codes" in arrays else range(len(self.crushes))
+                self.index = {code: row for row, code in enumerate(rows)}
+            else:
+                self.cooccurrence = numpy.zeros((64, 64))
+                self.crushes = numpy.zeros(64)
+                self.satisfaction = numpy.zeros(64)
+            self._recency = {
+                count: numpy.array(self.RECENCY[:count][::-1]) / sum(self.RECENCY[:count])
+                for count in range(1, self.WINDOW + 1)
+            }
+            self.np = numpy
+            self.add_codes(codes)
+
+    def add_codes(self, codes: Iterable[int]):
+        """Give every code without one a row, doubling the arrays when they run out"""
+        if self.np is None:
+            self.warm_up()
+        index = self.index
+        for code in codes:
+            if code not in index:
+                index[code] = len(index)
+        old = len(self.crushes)
+        if len(index) <= old:
+            return
+        np = self.np
+        size = max(old * 2, (len(index) // 64 + 1) * 64)
+        cooccurrence = np.zeros((size, size))
+        cooccurrence[:old, :old] = self.cooccurrence
+        self.cooccurrence = cooccurrence
+        self.crushes = np.concatenate([self.crushes, np.zeros(size - old)])
+        self.satisfaction = np.concatenate([self.satisfaction, np.zeros(size - old)])
+
+    def record(self, recent: Sequence[int], code: int, satisfaction: float):
+        """Count a crush of code that came after the codes in recent (most recent last)"""
+        if self.np is None:
+            self.warm_up()
+        index = self.index
+        row = index.get(code)
+        if row is None:
+            self.add_codes((code,))
+            row = index[code]
+        cooccurrence = self.cooccurrence
+        for previous in recent[-self.WINDOW:]:
+            previous_row = index.get(previous)
+            if previous_row is not None:
+                cooccurrence[previous_row, row] += 1.0
+        self.crushes[row] += 1.0
+        self.satisfaction[row] += satisfaction
+
+    def scores(self, recent: Sequence[int], objects: Sequence[dict], codes) -> "np.ndarray":
+        """Score of every object in objects, in their order, for a session that last crushed recent"""
+        if self.np is None:
+            self.warm_up()
+        np = self.np
+        candidates, positions, fallback, index_of = self._candidates
+        if candidates is not objects:
+            object_codes = [codes[obj["id"]] for obj in objects]
+            self.add_codes(object_codes)
+            positions = np.array([self.index[code] for code in object_codes], dtype=np.intp)
+            fallback = np.array([obj["satisfaction_score"] for obj in objects], dtype=np.float64)
+            index_of = {code: index for index, code in enumerate(object_codes)}
+            self._candidates = (objects, positions, fallback, index_of)
+
+        crushes = self.crushes[positions]
+        popularity = (crushes + 1.0) / (crushes.sum() + len(positions))
+        recent = [code for code in recent[-self.WINDOW:] if code in self.index]
+        if recent:
+            rows = self.cooccurrence[[self.index[code] for code in recent]][:, positions]
+            following = (rows + self.prior * popularity) / (rows.sum(axis=1, keepdims=True) + self.prior)
+            weights = self._recency[len(recent)]
+            affinity = weights @ following
+        else:
+            affinity = popularity
+
+        quality = np.where(crushes > 0, self.satisfaction[positions] / np.maximum(crushes, 1.0), fallback)
+        scores = affinity * np.maximum(quality, 0.0)
+        for code in recent:
+            index = index_of.get(code)
+            if index is not None:
+                scores[index] *= 0.5
+        return scores
+
+    def recommend(self, recent: Sequence[int], objects: Sequence[dict], codes, limit: int = 3) -> List[Tuple[dict, float]]:
+        """The limit best objects to crush next, with their scores normalised to sum to 1 over objects"""
+        scores = self.scores(recent, objects, codes)
+        total = scores.sum()
+        best = self.np.argsort(-scores, kind="stable")[:limit]
+        return [(objects[index], float(scores[index] / total) if total > 0 else 0.0) for index in best]
+
+    def save(self, path: Optional[str] = None):
+        """Write the arrays to path (default self.path), replacing it atomically"""
+        path = path or self.path
+        if self.np is None or not path:
+            return
+        # Code of every row in use; rows past them are spare capacity
+        codes = self.np.array(sorted(self.index, key=self.index.get), dtype=self.np.int64)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as output:
+            self.np.savez(output, cooccurrence=self.cooccurrence, crushes=self.crushes, satisfaction=self.satisfaction,
+                          codes=codes)
+        os.replace(temporary, path)
+
+
+def build(reader, path: str) -> Recommender:
+    """Fill a recommender from every event in a ColumnarEventReader and save it to path"""
+    import numpy as np
+
+    columns = reader.columns
+    order = np.lexsort((columns["ts"], columns["session"]))
+    # Rows in code order, one for every code crushed
+    used, rows = np.unique(columns["code"][order], return_inverse=True)
+    sessions = columns["session"][order]
+    size = (len(used) // 64 + 1) * 64
+    scores = np.zeros(size)
+    for row, code in enumerate(used.tolist()):
+        obj = reader.objects.get(code)
+        if obj is not None:
+            scores[row] = obj["satisfaction_score"]
+
+    recommender = Recommender()
+    recommender.warm_up()
+    recommender.path = path
+    recommender.index = {code: row for row, code in enumerate(used.tolist())}
+    # Each event after every one of the WINDOW events before it in its session
+    pairs = np.zeros(size * size, dtype=np.int64)
+    for lag in range(1, Recommender.WINDOW + 1):
+        same = sessions[lag:] == sessions[:-lag]
+        pairs += np.bincount(rows[:-lag][same] * size + rows[lag:][same], minlength=size * size)
+    recommender.cooccurrence = pairs.reshape(size, size).astype(np.float64)
+    recommender.crushes = np.bincount(rows, minlength=size).astype(np.float64)
+    recommender.satisfaction = np.bincount(rows, weights=scores[rows], minlength=size)
+    recommender.save()
+    return recommender
+
+
+def main(argv=None):
+    import argparse
+
+    from event_columns import ColumnarEventReader
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="ColumnarEventLog directory (EVENT_COLUMNS_DIR)")
+    parser.add_argument("--output", required=True, help="file to write, used as RECOMMENDER_PATH")
+    args = parser.parse_args(argv)
+
+    recommender = build(ColumnarEventReader(args.directory), args.output)
+    print(f"{int(recommender.crushes.sum())} crushes, {int(recommender.cooccurrence.sum())} co-occurrences")
+
+
+if __name__ == "__main__":
+    main()
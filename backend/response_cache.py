@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import json
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Payloads smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 256
+
+
+def encode_json(payload) -> bytes:
+    """Encode a payload the same way FastAPI's JSONResponse does, refusing NaN and infinities"""
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class CachedPayload:
+    """A JSON payload encoded once, with pre-compressed variants"""
+
+    def __init__(self, payload):
+        self.body = encode_json(payload)
+        digest = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+        self.etag = f'"{digest}"'
+        # encoding -> (body, etag)
+        self.variants: Dict[str, Tuple[bytes, str]] = {}
+        if len(self.body) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                self._add_variant("br", brotli.compress(self.body, quality=11))
+            self._add_variant("gzip", gzip.compress(self.body, compresslevel=9, mtime=0))
+        self.etags = {self.etag} | {etag for _, etag in self.variants.values()}
+
+    def _add_variant(self, encoding: str, body: bytes):
+        if len(body) < len(self.body):
+            self.variants[encoding] = (body, f'"{self.etag[1:-1]}-{encoding}"')
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag in self.etags:
+                return True
+        return False
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+        """Pick the best pre-compressed variant the client accepts"""
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and encoding in accepted:
+                body, etag = self.variants[encoding]
+                return body, etag, encoding
+        return self.body, self.etag, None
+
+
+def _parse_accept_encoding(header: Optional[str]) -> set:
+    accepted = set()
+    if not header:
+        return accepted
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding)
+    return accepted
+
+
+class ResponseCache:
+    """Pre-serialized responses for static endpoints, rebuilt when their source changes"""
+
+    def __init__(self, max_age: int = 60):
+        self.cache_control = f"public, max-age={max_age}"
+        self._entries: Dict[Hashable, Tuple[object, CachedPayload]] = {}
+
+    def get(self, key: Hashable, source, build: Callable[[], object]) -> CachedPayload:
+        """Return the cached payload for key, rebuilding it if source is not the one it was built from"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is source:
+            return entry[1]
+        cached = CachedPayload(build())
+        self._entries[key] = (source, cached)
+        return cached
+
+    def invalidate(self):
+        self._entries.clear()
+
+    def respond(self, request: Request, cached: CachedPayload) -> Response:
+        headers = {
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if cached.matches(request.headers.get("if-none-match")):
+            _, etag, _ = cached.select(request.headers.get("accept-encoding"))
+            headers["ETag"] = etag
+            return Response(status_code=304, headers=headers)
+
+        body, etag, encoding = cached.select(request.headers.get("accept-encoding"))
+        headers["ETag"] = etag
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
@@ -1,18 +1,97 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import os
+import asyncio
 from dotenv import load_dotenv
+import random
 import uuid
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Literal, Optional
+from pydantic import BaseModel, Field
+import functools
+import hashlib
 import json
+import math
+
+from catalog import Catalog
+from catalog_source import CatalogWatcher, load_objects
+from assets import AssetStore, RangeResponse
+from auto_scheduler import AutoScheduler
+from crush_analytics import CrushAnalytics, EventLog, position_xy
+from crush_channel import CrushChannel
+from crush_engine import CrushEngine, crush_result
+from crush_history import CrushHistory
+from event_columns import ColumnarEventLog
+from leaderboard import Leaderboards
+from loop_monitor import LoopBlockingMiddleware, LoopMonitor
+from metrics import MetricsMiddleware, Registry, route_template
+from offload import Offload
+from rate_limit import AdmissionControl, AdmissionMiddleware, RouteLimit, parse_limits
+from recommender import Recommender
+from response_cache import ResponseCache, encode_json
+from session_backend import MemorySessionBackend, MongoSessionBackend
+from session_journal import JournalSessionBackend
+from session_recording import SessionRecorder
+from session_store import SessionStore
+from shared_sessions import LeaseBusy, LeaseLost, SharedSessionBackend
+from startup import Readiness, StartupProfile
+import wire_format
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Crush Simulator API", version="1.0.0")
+# Initialization phase timings; `python startup.py` reports them with import times
+startup_profile = StartupProfile()
+readiness = Readiness(startup_profile)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Background work for the life of the process
+
+    Only what every request needs is set up before the server accepts
+    connections. Optional subsystems (session persistence, analytics logs,
+    the crush engine's NumPy import) warm up in the background, and
+    /api/ready answers 503 until they have.
+    """
+    offload.start()
+    tasks = [
+        asyncio.create_task(sessions.run_sweeper(SESSION_SWEEP_INTERVAL)),
+        asyncio.create_task(auto_scheduler.run()),
+        asyncio.create_task(leaderboards.run_flusher(LEADERBOARD_FLUSH_INTERVAL)),
+    ]
+    if CATALOG_WATCH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(catalog_watcher.run()))
+    if LOOP_MONITOR_INTERVAL > 0:
+        tasks.append(asyncio.create_task(loop_monitor.run()))
+    if session_recorder is not None:
+        tasks.append(asyncio.create_task(session_recorder.run()))
+    readiness.track("session_backend", session_backend.start())
+    readiness.track("analytics", start_analytics(tasks))
+    readiness.track("crush_engine", asyncio.get_running_loop().run_in_executor(None, crush_engine.warm_up))
+    readiness.track("recommender", asyncio.get_running_loop().run_in_executor(
+        None, recommender.warm_up, list(catalog.codes.values())
+    ))
+    if offload.processes is not None:
+        readiness.track("offload", offload.warm_up(crush_engine.warm_up))
+    readiness.track("assets", asset_store.manifest(catalog))
+    try:
+        yield
+    finally:
+        readiness.cancel()
+        for task in tasks:
+            task.cancel()
+        crush_analytics.close()
+        if session_recorder is not None:
+            session_recorder.close()
+        recommender.save()
+        await session_backend.close()
+        offload.close()
+
+app = FastAPI(title="Crush Simulator API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -23,66 +102,233 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage for now (will add MongoDB later)
-sessions = {}
-crush_objects = [
-    {
-        "id": "can_aluminum",
-        "name": "Aluminum Can",
-        "type": "can",
-        "difficulty": 1,
-        "sound": "can_crush.mp3",
-        "particles": "metal",
-        "vibration_pattern": [100, 50, 200],
-        "crush_time": 2.5,
-        "satisfaction_score": 8
-    },
-    {
-        "id": "cardboard_box",
-        "name": "Cardboard Box",
-        "type": "box",
-        "difficulty": 2,
-        "sound": "cardboard_crush.mp3",
-        "particles": "paper",
-        "vibration_pattern": [150, 100, 150, 100],
-        "crush_time": 3.0,
-        "satisfaction_score": 7
-    },
+# Metrics, exposed at /metrics in Prometheus text format
+metrics_registry = Registry()
+request_counter = metrics_registry.counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")
+)
+request_latency = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("route", "method")
+)
+crush_counter = metrics_registry.counter(
+    "crush_objects_crushed_total", "Objects crushed by object id and type", ("object_id", "type")
+)
+not_found_counter = metrics_registry.counter(
+    "crush_not_found_total", "404 responses by cause", ("cause",)
+)
+validation_failure_counter = metrics_registry.counter(
+    "crush_validation_failures_total", "Request validation failures by route", ("route",)
+)
+idempotent_replay_counter = metrics_registry.counter(
+    "crush_idempotent_replays_total", "Retried crush requests answered from the idempotency record", ("route",)
+)
+rate_limited_counter = metrics_registry.counter(
+    "crush_rate_limited_total", "Requests refused by a per-session or per-client rate limit", ("route", "scope")
+)
+shed_counter = metrics_registry.counter(
+    "crush_requests_shed_total", "Requests refused by admission control", ("reason",)
+)
+loop_lag_histogram = metrics_registry.histogram(
+    "crush_event_loop_lag_sampled_seconds", "Event loop scheduling delay, sampled every LOOP_MONITOR_INTERVAL",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+loop_block_histogram = metrics_registry.histogram(
+    "crush_handler_loop_block_seconds", "Longest time a request's handler held the event loop in one step",
+    ("route",), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+loop_block_counter = metrics_registry.counter(
+    "crush_handler_over_budget_total", "Requests whose handler held the event loop past LOOP_BLOCK_BUDGET",
+    ("route",)
+)
+
+# Requests are shed with 429 while the event loop lags by more than
+# ADMISSION_MAX_LAG seconds or ADMISSION_MAX_INFLIGHT requests are running;
+# 0 turns either check off
+admission = AdmissionControl(
+    max_lag=float(os.environ.get("ADMISSION_MAX_LAG", "0.5")),
+    max_inflight=int(os.environ.get("ADMISSION_MAX_INFLIGHT", "1000")),
+    on_shed=shed_counter.inc,
+)
+# Event loop scheduling delay is sampled every LOOP_MONITOR_INTERVAL seconds
+# for admission control and metrics (0 turns sampling, and so shedding on
+# lag, off). Handlers holding the loop for longer than LOOP_BLOCK_BUDGET
+# seconds at a stretch are counted by route and logged
+LOOP_MONITOR_INTERVAL = float(os.environ.get("LOOP_MONITOR_INTERVAL", "0.05"))
+loop_monitor = LoopMonitor(LOOP_MONITOR_INTERVAL, loop_lag_histogram, on_sample=admission.observe_lag)
+app.add_middleware(
+    LoopBlockingMiddleware,
+    budget=float(os.environ.get("LOOP_BLOCK_BUDGET", "0.025")),
+    histogram=loop_block_histogram,
+    over_budget=loop_block_counter,
+)
+app.add_middleware(AdmissionMiddleware, control=admission, exempt=("/api/", "/api/ready", "/metrics"))
+app.add_middleware(MetricsMiddleware, requests=request_counter, latency=request_latency)
+
+# Resident sessions; with the Mongo backend this is a read cache
+sessions = SessionStore(
+    max_size=int(os.environ.get("SESSION_MAX_SIZE", "100000")),
+    idle_ttl=float(os.environ.get("SESSION_IDLE_TTL", "3600")),
+    ended_policy=os.environ.get("SESSION_ENDED_POLICY", "archive"),
+    archive_size=int(os.environ.get("SESSION_ARCHIVE_SIZE", "10000")),
+)
+SESSION_SWEEP_INTERVAL = float(os.environ.get("SESSION_SWEEP_INTERVAL", "30"))
+# Crushable objects, from a JSON or YAML file that is watched and reloaded
+# when it changes; CATALOG_WATCH_INTERVAL=0 turns reloading off
+CATALOG_PATH = os.environ.get(
+    "CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "crush_objects.json")
+)
+CATALOG_WATCH_INTERVAL = float(os.environ.get("CATALOG_WATCH_INTERVAL", "2"))
+with startup_profile.phase("catalog"):
+    crush_objects = load_objects(CATALOG_PATH)
+    catalog = Catalog(crush_objects)
+
+def install_catalog(new_catalog: Catalog):
+    """Swap in a new catalog version; code that already read the old one keeps using it"""
+    global catalog
+    # New codes get their recommender rows here rather than on a crush
+    recommender.add_codes(new_catalog.codes.values())
+    catalog = new_catalog
+
+catalog_watcher = CatalogWatcher(CATALOG_PATH, lambda: catalog, install_catalog, interval=CATALOG_WATCH_INTERVAL)
+
+with startup_profile.phase("session_backend"):
+    if os.environ.get("SESSION_BACKEND", "memory") == "mongo":
+        session_backend = MongoSessionBackend.from_url(
+            os.environ["MONGO_URL"],
+            sessions,
+            lambda: catalog,
+            flush_interval=float(os.environ.get("SESSION_FLUSH_INTERVAL", "0.5")),
+            max_batch=int(os.environ.get("SESSION_FLUSH_BATCH", "1000")),
+        )
+    elif os.environ.get("SESSION_BACKEND") == "shared":
+        # For several worker processes: one writer per session through short leases
+        session_backend = SharedSessionBackend.from_url(
+            os.environ.get("SHARED_SESSION_STORE", "sqlite:///crush_sessions.db"),
+            sessions,
+            lambda: catalog,
+            lease_ttl=float(os.environ.get("SESSION_LEASE_TTL", "5")),
+            acquire_timeout=float(os.environ.get("SESSION_LEASE_TIMEOUT", "2")),
+        )
+    elif os.environ.get("SESSION_BACKEND") == "journal":
+        # Sessions in memory, recovered after a crash from a journal and snapshots on local disk
+        session_backend = JournalSessionBackend(
+            os.environ.get("SESSION_JOURNAL_DIR", "crush_journal"),
+            sessions,
+            lambda: catalog,
+            sync=os.environ.get("SESSION_JOURNAL_SYNC", "commit"),
+            commit_interval=float(os.environ.get("SESSION_JOURNAL_COMMIT_INTERVAL", "0.005")),
+            snapshot_interval=float(os.environ.get("SESSION_SNAPSHOT_INTERVAL", "300")),
+            snapshot_bytes=int(os.environ.get("SESSION_SNAPSHOT_BYTES", str(64 << 20))),
+        )
+    else:
+        session_backend = MemorySessionBackend(sessions)
+
+game_modes = [
     {
-        "id": "phone_old",
-        "name": "Old Phone",
-        "type": "electronics",
-        "difficulty": 3,
-        "sound": "electronics_crush.mp3",
-        "particles": "mixed",
-        "vibration_pattern": [200, 150, 300, 100],
-        "crush_time": 4.0,
-        "satisfaction_score": 10
+        "id": "interactive",
+        "name": "Interactive Mode",
+        "description": "Tap to crush objects at your own pace",
+        "icon": "👆"
     },
     {
-        "id": "glass_bottle",
-        "name": "Glass Bottle",
-        "type": "glass",
-        "difficulty": 4,
-        "sound": "glass_shatter.mp3",
-        "particles": "glass",
-        "vibration_pattern": [50, 200, 50, 200, 300],
-        "crush_time": 1.8,
-        "satisfaction_score": 9
+        "id": "auto",
+        "name": "Auto Mode", 
+        "description": "Watch objects crush automatically in a relaxing sequence",
+        "icon": "🔄"
     },
     {
-        "id": "plastic_bottle",
-        "name": "Plastic Bottle",
-        "type": "plastic",
-        "difficulty": 1,
-        "sound": "plastic_crush.mp3",
-        "particles": "plastic",
-        "vibration_pattern": [80, 40, 120],
-        "crush_time": 2.2,
-        "satisfaction_score": 6
+        "id": "mixed",
+        "name": "Mixed Mode",
+        "description": "Combination of auto and interactive crushing",
+        "icon": "🎭"
     }
 ]
 
+# Static responses are serialized once and served with ETags
+response_cache = ResponseCache(max_age=int(os.environ.get("RESPONSE_CACHE_MAX_AGE", "60")))
+
+# Sounds named by catalog objects, read from ASSETS_DIR and served under
+# content-hashed URLs; each difficulty tier's sounds are also concatenated
+# into one bundle. Both are served from the bytes that were hashed
+ASSETS_DIR = os.environ.get("ASSETS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"))
+asset_store = AssetStore(
+    ASSETS_DIR,
+    recheck_interval=float(os.environ.get("ASSETS_RECHECK_INTERVAL", "5")),
+)
+
+# Crush events are aggregated off the request path. ANALYTICS_DIR keeps them
+# as rolled NDJSON files, EVENT_COLUMNS_DIR as columns for event_reports.py
+def open_event_logs() -> list:
+    """Open the configured event logs; the columnar log reads its name tables, which can be large"""
+    event_logs = []
+    if os.environ.get("ANALYTICS_DIR"):
+        event_logs.append(EventLog(
+            os.environ["ANALYTICS_DIR"],
+            roll_bytes=int(os.environ.get("ANALYTICS_ROLL_BYTES", str(64 * 1024 * 1024))),
+        ))
+    if os.environ.get("EVENT_COLUMNS_DIR"):
+        event_logs.append(ColumnarEventLog(os.environ["EVENT_COLUMNS_DIR"], lambda: catalog))
+    return event_logs
+
+crush_analytics = CrushAnalytics(queue_size=int(os.environ.get("ANALYTICS_QUEUE_SIZE", "10000")))
+
+async def start_analytics(tasks: list):
+    """Open the event logs off the event loop, then start consuming; crushes queue up meanwhile"""
+    crush_analytics.logs = tuple(await asyncio.get_running_loop().run_in_executor(None, open_event_logs))
+    tasks.append(asyncio.create_task(crush_analytics.run()))
+
+# Deformation and particle bursts for every crush; CRUSH_ENGINE_SEED makes them repeatable
+crush_engine = CrushEngine(
+    seed=int(os.environ["CRUSH_ENGINE_SEED"]) if os.environ.get("CRUSH_ENGINE_SEED") else None
+)
+# CPU-heavy work runs off the event loop in OFFLOAD_THREADS threads, or where
+# it can in OFFLOAD_PROCESSES worker processes. Batches of OFFLOAD_MIN_CRUSHES
+# or more crushes are simulated there
+offload = Offload(
+    threads=int(os.environ["OFFLOAD_THREADS"]) if os.environ.get("OFFLOAD_THREADS") else None,
+    processes=int(os.environ.get("OFFLOAD_PROCESSES", "0")),
+)
+OFFLOAD_MIN_CRUSHES = int(os.environ.get("OFFLOAD_MIN_CRUSHES", "64"))
+# Each session draws its bursts from its own seed, so it can be replayed exactly
+session_seeds = random.Random(crush_engine.seed)
+# SESSION_RECORD_DIR records every session's seed and crush inputs for session_replay.py
+session_recorder = SessionRecorder(
+    os.environ["SESSION_RECORD_DIR"],
+    flush_interval=float(os.environ.get("SESSION_RECORD_FLUSH_INTERVAL", "1")),
+) if os.environ.get("SESSION_RECORD_DIR") else None
+
+# What each session should crush next, learned from every crush. RECOMMENDER_PATH
+# keeps what was learned across restarts and can be built from an event log
+# with recommender.py; held per worker process
+recommender = Recommender(os.environ.get("RECOMMENDER_PATH"))
+
+# Session rankings, updated from crushes buffered for up to LEADERBOARD_FLUSH_INTERVAL
+# seconds, or until the next leaderboard read; held per worker process
+leaderboards = Leaderboards(capacity=int(os.environ.get("LEADERBOARD_CAPACITY", "100000")))
+LEADERBOARD_FLUSH_INTERVAL = float(os.environ.get("LEADERBOARD_FLUSH_INTERVAL", "1"))
+
+# Token bucket limits per route, in requests per second and burst size, for
+# each session and each client address. RATE_LIMITS is JSON overriding
+# routes here (a scope set to null is unlimited) or "off";
+# RATE_LIMIT_SCALE multiplies every rate and burst
+DEFAULT_RATE_LIMITS = {
+    "session_start": {"ip": [10, 100]},
+    "crush": {"session": [100, 500], "ip": [500, 2000]},
+    "crush_batch": {"session": [20, 100], "ip": [100, 500]},
+    "ws_crush": {"session": [100, 500]},
+    "auto_start": {"session": [1, 10], "ip": [10, 100]},
+}
+rate_limit_config = os.environ.get("RATE_LIMITS", "{}")
+rate_limits = {
+    name: RouteLimit(name, on_limited=rate_limited_counter.inc, **scopes)
+    for name, scopes in parse_limits(
+        {} if rate_limit_config == "off" else {**DEFAULT_RATE_LIMITS, **json.loads(rate_limit_config)},
+        scale=float(os.environ.get("RATE_LIMIT_SCALE", "1")),
+    ).items()
+}
+for name in DEFAULT_RATE_LIMITS:
+    rate_limits.setdefault(name, RouteLimit(name))
+
 # Models
 class CrushSession(BaseModel):
     user_id: Optional[str] = None
@@ -93,120 +339,678 @@ class CrushSession(BaseModel):
 
 class CrushAction(BaseModel):
     object_id: str
-    force: float = 1.0
+    force: float = Field(1.0, allow_inf_nan=False)
     position: dict = {"x": 0, "y": 0}
 
+@app.exception_handler(LeaseBusy)
+async def session_busy(request: Request, exc: LeaseBusy):
+    return JSONResponse(status_code=503, content={"detail": "Session is busy"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(LeaseLost)
+async def session_lost(request: Request, exc: LeaseLost):
+    # Nothing the request did was committed, so it is safe to send again
+    return JSONResponse(status_code=503, content={"detail": "Session moved to another worker, request not applied"},
+                        headers={"Retry-After": "1"})
+
+@app.exception_handler(RequestValidationError)
+async def count_validation_failure(request: Request, exc: RequestValidationError):
+    validation_failure_counter.inc(route_template(request.scope))
+    # A refused NaN or infinite force is echoed back as text, JSON has no number for it
+    errors = [
+        {**error, "input": str(error["input"])}
+        if isinstance(error.get("input"), float) and not math.isfinite(error["input"]) else error
+        for error in exc.errors()
+    ]
+    return await request_validation_exception_handler(request, RequestValidationError(errors, body=exc.body))
+
+# Number of most recent objects included in stats responses
+RECENT_OBJECTS = 5
+# Largest number of crush actions accepted in one batch request
+CRUSH_BATCH_MAX = int(os.environ.get("CRUSH_BATCH_MAX", "1000"))
+# WebSocket channel tuning
+WS_HEARTBEAT_INTERVAL = float(os.environ.get("WS_HEARTBEAT_INTERVAL", "15"))
+WS_QUEUE_SIZE = int(os.environ.get("WS_QUEUE_SIZE", "32"))
+# Idempotency keys remembered per session for retried crush requests, and the
+# most their records may take together, in bytes of JSON
+IDEMPOTENCY_KEYS = int(os.environ.get("IDEMPOTENCY_KEYS", "64"))
+IDEMPOTENCY_BYTES = int(os.environ.get("IDEMPOTENCY_BYTES", "65536"))
+# Session fields that are bookkeeping rather than part of the session's stats
+INTERNAL_FIELDS = ("history", "idempotency", "seed")
+
+def new_history(object_ids: List[str]) -> CrushHistory:
+    return CrushHistory(catalog.codes[object_id] for object_id in object_ids if object_id in catalog)
+
+def history_counts(history: CrushHistory) -> dict:
+    return {catalog.object_for_code(code)["id"]: count for code, count in history.counts().items()}
+
+def history_ids(codes: List[int]) -> List[str]:
+    return [catalog.object_for_code(code)["id"] for code in codes]
+
+def session_stats(session: dict) -> dict:
+    history = session["history"]
+    return {
+        "total_crushed": len(history),
+        "total_satisfaction": session["total_satisfaction"],
+        "objects_crushed": history_counts(history),
+        "recent_objects": history_ids(history.tail(RECENT_OBJECTS)),
+        "session_duration": session["session_duration"],
+        "catalog_version": session.get("catalog_version")
+    }
+
+async def get_session_or_404(session_id: str) -> dict:
+    session = await session_backend.get(session_id)
+    if session is None:
+        not_found_counter.inc("session")
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+def run_effects(effects: List[Callable[[], None]]):
+    for effect in effects:
+        effect()
+
+@asynccontextmanager
+async def session_scope(session_id: str, effects: Optional[List[Callable[[], None]]] = None) -> AsyncIterator[dict]:
+    """Hold a session for an update; changes are committed when the block exits
+
+    What an update changes outside the session, such as leaderboards and
+    analytics, is queued in effects and only run once the session's changes
+    are committed. A shared session whose lease is lost meanwhile raises
+    LeaseLost at commit and leaves no trace of the update anywhere.
+    """
+    async with session_backend.session(session_id) as session:
+        if session is None:
+            not_found_counter.inc("session")
+            raise HTTPException(status_code=404, detail="Session not found")
+        yield session
+    if effects:
+        run_effects(effects)
+
+def type_totals(session: dict) -> dict:
+    """Crush count and satisfaction per object type for a session"""
+    totals = {}
+    for code, count in session["history"].counts().items():
+        obj = catalog.object_for_code(code)
+        crushed, satisfaction = totals.get(obj["type"], (0, 0))
+        totals[obj["type"]] = (crushed + count, satisfaction + count * obj["satisfaction_score"])
+    return totals
+
+def get_object_or_404(object_id: str) -> dict:
+    obj = catalog.get(object_id)
+    if not obj:
+        not_found_counter.inc("object")
+        raise HTTPException(status_code=404, detail="Object not found")
+    return obj
+
+async def run_simulation(objs: List[dict], forces: List[float], positions: List[dict],
+                         seed: Optional[int], index: int) -> List[dict]:
+    """crush_engine.simulate, off the event loop for OFFLOAD_MIN_CRUSHES or more crushes"""
+    if len(objs) >= OFFLOAD_MIN_CRUSHES:
+        return await offload.compute(crush_engine.simulate, objs, forces, positions, seed, index)
+    return crush_engine.simulate(objs, forces, positions, seed, index)
+
+async def simulate_crushes(
+    session_id: str, session: dict, objs: List[dict], crush_actions: List[CrushAction],
+    effects: List[Callable[[], None]],
+) -> List[dict]:
+    """Simulate one request's crushes from the session's seed, and queue recording them for replay
+
+    Must run before the crushes are appended to the history, whose length
+    keys the random numbers they get. Batches of OFFLOAD_MIN_CRUSHES or more
+    are simulated off the event loop.
+    """
+    index = len(session["history"])
+    seed = session.get("seed")
+    simulations = await run_simulation(
+        objs,
+        [crush_action.force for crush_action in crush_actions],
+        [crush_action.position for crush_action in crush_actions],
+        seed, index,
+    )
+    # Sessions created before seeds existed have none and are not replayable
+    if session_recorder is not None and seed is not None:
+        effects.append(functools.partial(session_recorder.call, session_id, index, [
+            (catalog.codes[obj["id"]], crush_action.force, *(position_xy(crush_action.position) or (0.0, 0.0)))
+            for obj, crush_action in zip(objs, crush_actions)
+        ]))
+    return simulations
+
+def publish_crush(session_id: str, mode: Optional[str], obj: dict, crush_action: CrushAction, tail: List[int],
+                  rank: bool):
+    """Record a committed crush everywhere outside its session"""
+    code = catalog.codes[obj["id"]]
+    recommender.record(tail, code, obj["satisfaction_score"])
+    crush_counter.inc(obj["id"], obj["type"])
+    crush_analytics.emit(session_id, obj, crush_action.force, crush_action.position, mode)
+    if rank:
+        leaderboards.record(session_id, obj["type"], obj["satisfaction_score"])
+
+async def apply_crushes(
+    session_id: str, session: dict, objs: List[dict], crush_actions: List[CrushAction],
+    effects: List[Callable[[], None]], rank: bool = True, simulations: Optional[List[dict]] = None,
+) -> List[dict]:
+    """Update a session with several crushes at once and return their results
+
+    The session changes in one step with nothing awaited in between, so
+    nobody reading it sees part of the crushes; if the backend then fails
+    to record them they are taken back out before the error propagates.
+    Everything the crushes change outside the session is queued in effects,
+    to run once the session is committed. Callers applying many crushes
+    pass rank=False and update the leaderboards once per object type
+    themselves.
+    """
+    if simulations is None:
+        simulations = await simulate_crushes(session_id, session, objs, crush_actions, effects)
+    results = [
+        crush_result(obj, crush_action.force, simulation)
+        for obj, crush_action, simulation in zip(objs, crush_actions, simulations)
+    ]
+    codes = [catalog.codes[obj["id"]] for obj in objs]
+    history = session["history"]
+    length, total, queued = len(history), session["total_satisfaction"], len(effects)
+    for obj, crush_action, code, result in zip(objs, crush_actions, codes, results):
+        effects.append(functools.partial(
+            publish_crush, session_id, session.get("mode"), obj, crush_action,
+            history.tail(Recommender.WINDOW), rank,
+        ))
+        history.append(code)
+        session["total_satisfaction"] += result["satisfaction_gained"]
+    try:
+        await session_backend.record_crushes(
+            session_id, [(obj["id"], result["satisfaction_gained"]) for obj, result in zip(objs, results)]
+        )
+    except BaseException:
+        history.truncate(length)
+        session["total_satisfaction"] = total
+        del effects[queued:]
+        raise
+    return results
+
+async def apply_crush(
+    session_id: str, session: dict, obj: dict, crush_action: CrushAction, effects: List[Callable[[], None]],
+) -> dict:
+    """Update a session with one crush and return the crush result"""
+    return (await apply_crushes(session_id, session, [obj], [crush_action], effects))[0]
+
+def request_digest(body) -> str:
+    # Positions may be out of range, which JSON responses refuse; digests only need to be stable
+    encoded = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+async def idempotent_replay(request: Request, session: dict, key: Optional[str], body) -> Optional[dict]:
+    """Response to a retried request, or None if the key is new
+
+    Records of seeded sessions only say where in the history the request's
+    crushes went, and the response is simulated again from the seed; it
+    comes out the same, describing objects as the catalog now does.
+    """
+    if key is None:
+        return None
+    seen = session.get("idempotency", {}).get(key)
+    if seen is None:
+        return None
+    # Records written before requests were hashed hold the whole body
+    if seen["request"] != request_digest(body) and seen["request"] != body:
+        raise HTTPException(status_code=409, detail="Idempotency key was used for a different request")
+    idempotent_replay_counter.inc(route_template(request.scope))
+    if "response" in seen:
+        return seen["response"]
+    actions = body if isinstance(body, list) else [body]
+    index = seen["index"]
+    objs = [catalog.object_for_code(code) for code in session["history"].slice(index, len(actions))]
+    forces = [action["force"] for action in actions]
+    simulations = await run_simulation(
+        objs, forces, [action["position"] for action in actions], session["seed"], index
+    )
+    results = [crush_result(obj, force, simulation) for obj, force, simulation in zip(objs, forces, simulations)]
+    if not isinstance(body, list):
+        return results[0]
+    return {"results": results, "crushed": len(results), "satisfaction_gained": seen["gained"],
+            "total_satisfaction": seen["total"]}
+
+async def remember_idempotent(session_id: str, session: dict, key: Optional[str], body, response: dict):
+    """Record a request under its idempotency key, after its crushes were applied
+
+    Only the request's digest and where its crushes start in the history
+    are kept, plus a batch's totals; sessions without a seed cannot simulate
+    the results again and keep the whole response. The most recent
+    IDEMPOTENCY_KEYS records within IDEMPOTENCY_BYTES are kept, and only
+    the records added and dropped are persisted.
+    """
+    if key is None:
+        return
+    actions = len(body) if isinstance(body, list) else 1
+    record = {"request": request_digest(body)}
+    if session.get("seed") is None:
+        record["response"] = response
+    else:
+        record["index"] = len(session["history"]) - actions
+        if isinstance(body, list):
+            record.update(gained=response["satisfaction_gained"], total=response["total_satisfaction"])
+    record["size"] = len(encode_json(record))
+    seen = session.setdefault("idempotency", {})
+    seen.pop(key, None)
+    seen[key] = record
+    changes = {key: record}
+    size = sum(record.get("size", IDEMPOTENCY_BYTES) for record in seen.values())
+    while seen and (len(seen) > IDEMPOTENCY_KEYS or size > IDEMPOTENCY_BYTES):
+        oldest = next(iter(seen))
+        size -= seen.pop(oldest).get("size", IDEMPOTENCY_BYTES)
+        changes[oldest] = None
+    await session_backend.record_idempotency(session_id, changes)
+
+def crush_update(session: dict, result: dict) -> dict:
+    """Crush result plus the stat deltas it caused, for streaming clients"""
+    return {
+        "result": result,
+        "delta": {"total_crushed": 1, "total_satisfaction": result["satisfaction_gained"]},
+        "total_satisfaction": session["total_satisfaction"]
+    }
+
+async def auto_crush(session_id: str, obj: dict) -> Optional[dict]:
+    """Apply one scheduled auto-mode crush; returning None stops the schedule"""
+    effects = []
+    async with session_backend.session(session_id) as session:
+        if session is None or not session["active"]:
+            return None
+        result = await apply_crush(session_id, session, obj, CrushAction(object_id=obj["id"]), effects)
+        update = crush_update(session, result)
+    run_effects(effects)
+    return update
+
+def auto_preferences(session_id: str, objects: tuple) -> Optional[list]:
+    """Recommendation scores steering auto mode, or None if the session is not held locally"""
+    session = sessions.get(session_id)
+    if session is None:
+        return None
+    return recommender.scores(session["history"].tail(Recommender.WINDOW), objects, catalog.codes).tolist()
+
+auto_scheduler = AutoScheduler(auto_crush, lambda: catalog.objects, weigh=auto_preferences)
+
+metrics_registry.gauge("crush_sessions_active", "Sessions currently live", lambda: len(sessions))
+metrics_registry.gauge(
+    "crush_sessions_ended", "Ended sessions kept in the archive", lambda: sessions.metrics()["archived"]
+)
+metrics_registry.gauge(
+    "crush_objects_crushed_entries", "Total crushes held in session histories",
+    lambda: sum(len(session["history"]) for session in sessions.iter_sessions())
+)
+metrics_registry.gauge(
+    "crush_objects_crushed_bytes", "Memory used by encoded session histories",
+    lambda: sum(session["history"].nbytes for session in sessions.iter_sessions())
+)
+metrics_registry.gauge("crush_catalog_objects", "Objects in the current catalog", lambda: len(catalog))
+metrics_registry.gauge("crush_catalog_reloads", "Catalog versions installed by the file watcher", lambda: catalog_watcher.reloads)
+metrics_registry.gauge(
+    "crush_catalog_reload_errors", "Catalog file changes rejected as invalid", lambda: catalog_watcher.errors
+)
+metrics_registry.gauge("crush_event_loop_lag_seconds", "Event loop lag seen by admission control", lambda: admission.lag)
+metrics_registry.gauge("crush_requests_inflight", "HTTP requests being handled", lambda: admission.inflight)
+metrics_registry.gauge(
+    "crush_event_loop_lag_worst_seconds", "Largest event loop lag sampled since start", lambda: loop_monitor.worst
+)
+metrics_registry.gauge(
+    "crush_offload_running_threads", "Calls running in offload threads", lambda: offload.running["thread"]
+)
+metrics_registry.gauge(
+    "crush_offload_running_processes", "Calls running in offload processes", lambda: offload.running["process"]
+)
+metrics_registry.gauge(
+    "crush_rate_limit_keys", "Sessions and clients with a live rate limit bucket",
+    lambda: sum(len(limiter) for limit in rate_limits.values() for limiter in (limit.session, limit.ip) if limiter)
+)
+metrics_registry.gauge(
+    "crush_session_recording_bytes", "Session input recording written by this process",
+    lambda: session_recorder.bytes_written if session_recorder is not None else 0
+)
+if isinstance(session_backend, JournalSessionBackend):
+    metrics_registry.gauge(
+        "crush_journal_commits", "Group commits of the session journal, one fsync each",
+        lambda: session_backend.stats["commits"]
+    )
+    metrics_registry.gauge(
+        "crush_journal_bytes", "Session journal written by this process", lambda: session_backend.stats["bytes"]
+    )
+    metrics_registry.gauge(
+        "crush_journal_recovery_seconds", "Time taken to recover sessions at startup",
+        lambda: session_backend.stats["recovery_seconds"]
+    )
+metrics_registry.gauge("crush_auto_sessions", "Sessions driven by the auto scheduler", lambda: len(auto_scheduler))
+metrics_registry.gauge("crush_analytics_queued", "Crush events waiting for aggregation", crush_analytics.queue.qsize)
+metrics_registry.gauge(
+    "crush_analytics_dropped", "Crush events dropped because the analytics queue was full",
+    lambda: crush_analytics.dropped
+)
+metrics_registry.gauge(
+    "crush_analytics_failed", "Crush events that could not be aggregated", lambda: crush_analytics.failed
+)
+metrics_registry.gauge(
+    "crush_leaderboard_entries", "Session entries across all leaderboards", lambda: leaderboards.metrics()["entries"]
+)
+
 # API Routes
 @app.get("/api/")
 async def root():
     return {"message": "Crush Simulator API", "status": "running"}
 
+@app.get("/api/ready")
+async def get_readiness(response: Response):
+    """Whether every subsystem has warmed up; /api/ only says the process is alive"""
+    status = readiness.status()
+    if not status["ready"]:
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+    return status
+
 @app.get("/api/objects")
-async def get_crush_objects():
-    """Get all available objects for crushing"""
-    return {"objects": crush_objects}
+async def get_crush_objects(
+    request: Request,
+    type: Optional[str] = None,
+    difficulty: Optional[int] = None,
+    particles: Optional[str] = None,
+):
+    """Get all available objects for crushing, optionally filtered"""
+    objects = catalog.query(type=type, difficulty=difficulty, particles=particles)
+    # Unknown filter values all share one cached empty response
+    key = ("objects", type, difficulty, particles) if objects else ("objects", "empty")
+    cached = response_cache.get(key, catalog, lambda: {"objects": list(objects), "version": catalog.version})
+    return response_cache.respond(request, cached)
 
 @app.get("/api/objects/{object_id}")
-async def get_object_details(object_id: str):
+async def get_object_details(object_id: str, request: Request):
     """Get detailed information about a specific object"""
-    obj = next((obj for obj in crush_objects if obj["id"] == object_id), None)
-    if not obj:
-        raise HTTPException(status_code=404, detail="Object not found")
-    return obj
+    obj = get_object_or_404(object_id)
+    # Keyed on the object itself, so only objects that changed are re-serialized after a reload
+    cached = response_cache.get(("object", object_id), obj, lambda: obj)
+    return response_cache.respond(request, cached)
 
-@app.post("/api/session/start")
+@app.get("/api/assets/manifest")
+async def get_asset_manifest(request: Request):
+    """Sound URLs and vibration patterns per object, and a preload bundle per difficulty tier"""
+    manifest = await asset_store.manifest(catalog)
+    cached = response_cache.get("assets", manifest, lambda: manifest.payload)
+    response = response_cache.respond(request, cached)
+    if manifest.preload is not None:
+        # Lets clients start fetching the easiest tier's sounds along with the manifest
+        response.headers["Link"] = f"<{manifest.preload.url}>; rel=preload; as=fetch; crossorigin"
+    return response
+
+@app.api_route("/api/assets/bundle/{digest}", methods=["GET", "HEAD"])
+async def get_asset_bundle(digest: str, request: Request):
+    """One difficulty tier's sounds back to back, at the offsets the manifest lists"""
+    await asset_store.manifest(catalog)
+    bundle = asset_store.bundle(digest)
+    if bundle is None:
+        not_found_counter.inc("asset")
+        raise HTTPException(status_code=404, detail="Asset bundle not found")
+    return RangeResponse(request, bundle.data, f'"{digest}"', "application/octet-stream")
+
+@app.api_route("/api/assets/{digest}/{name}", methods=["GET", "HEAD"])
+async def get_asset(digest: str, name: str, request: Request):
+    """A sound file by content digest"""
+    await asset_store.manifest(catalog)
+    asset = asset_store.asset(digest)
+    if asset is None or asset.name != name:
+        not_found_counter.inc("asset")
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return RangeResponse(request, asset.data, f'"{digest}"', asset.media_type)
+
+@app.post("/api/session/start", dependencies=[Depends(rate_limits["session_start"])])
 async def start_session(session_data: CrushSession):
     """Start a new crush session"""
     session_id = str(uuid.uuid4())
     session_data.user_id = session_id
-    sessions[session_id] = {
-        **session_data.dict(),
+    history = new_history(session_data.objects_crushed)
+    seed = session_seeds.getrandbits(63)
+    await session_backend.create(session_id, {
+        **session_data.dict(exclude={"objects_crushed"}),
+        "history": history,
+        "seed": seed,
+        "catalog_version": catalog.version,
         "created_at": datetime.now().isoformat(),
         "active": True
-    }
+    })
+    if session_recorder is not None:
+        session_recorder.start(
+            session_id, seed, catalog.version, session_data.total_satisfaction, history.slice(0, len(history))
+        )
     return {"session_id": session_id, "message": "Session started successfully"}
 
-@app.post("/api/session/{session_id}/crush")
-async def crush_object(session_id: str, crush_action: CrushAction):
-    """Execute a crush action"""
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Find the object
-    obj = next((obj for obj in crush_objects if obj["id"] == crush_action.object_id), None)
-    if not obj:
-        raise HTTPException(status_code=404, detail="Object not found")
+IdempotencyKey = Header(None, alias="Idempotency-Key", min_length=1, max_length=128, pattern=r"^[A-Za-z0-9_:-]+$")
+
+@app.post("/api/session/{session_id}/crush", dependencies=[Depends(rate_limits["crush"])])
+async def crush_object(
+    session_id: str,
+    crush_action: CrushAction,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = IdempotencyKey,
+):
+    """Execute a crush action; retries carrying the same Idempotency-Key are applied once
+
+    The result is full JSON, slim JSON or packed structs depending on Accept,
+    see wire_format.
+    """
+    body = crush_action.dict()
+    effects = []
+    async with session_scope(session_id, effects) as session:
+        replay = await idempotent_replay(request, session, idempotency_key, body)
+        if replay is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return wire_format.respond(request, response, "crush", replay, catalog.codes)
+        obj = get_object_or_404(crush_action.object_id)
+        result = await apply_crush(session_id, session, obj, crush_action, effects)
+        await remember_idempotent(session_id, session, idempotency_key, body, result)
+    return wire_format.respond(request, response, "crush", result, catalog.codes)
+
+@app.post("/api/session/{session_id}/crush/batch", dependencies=[Depends(rate_limits["crush_batch"])])
+async def crush_objects_batch(
+    session_id: str,
+    request: Request,
+    response: Response,
+    crush_actions: List[CrushAction] = Body(..., max_length=CRUSH_BATCH_MAX),
+    idempotency_key: Optional[str] = IdempotencyKey,
+):
+    """Execute several crush actions at once; either all of them apply or none do
+
+    The crushes are simulated first and then applied to the session in one
+    step, which is rolled back if the backend cannot record them.
+    """
+    body = [crush_action.dict() for crush_action in crush_actions]
+    # Resolve every object before touching the session
+    objs = [get_object_or_404(crush_action.object_id) for crush_action in crush_actions]
     
-    # Update session
-    session = sessions[session_id]
-    session["objects_crushed"].append(crush_action.object_id)
-    session["total_satisfaction"] += obj["satisfaction_score"]
+    effects = []
+    async with session_scope(session_id, effects) as session:
+        replay = await idempotent_replay(request, session, idempotency_key, body)
+        if replay is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return wire_format.respond(request, response, "batch", replay, catalog.codes)
+        simulations = await simulate_crushes(session_id, session, objs, crush_actions, effects)
+        results = await apply_crushes(
+            session_id, session, objs, crush_actions, effects, rank=False, simulations=simulations
+        )
+        by_type = {}
+        for obj, result in zip(objs, results):
+            crushed, satisfaction = by_type.get(obj["type"], (0, 0))
+            by_type[obj["type"]] = (crushed + 1, satisfaction + result["satisfaction_gained"])
+        for obj_type, (crushed, satisfaction) in by_type.items():
+            effects.append(functools.partial(leaderboards.record, session_id, obj_type, satisfaction, crushed))
+        batch = {
+            "results": results,
+            "crushed": len(results),
+            "satisfaction_gained": sum(result["satisfaction_gained"] for result in results),
+            "total_satisfaction": session["total_satisfaction"]
+        }
+        await remember_idempotent(session_id, session, idempotency_key, body, batch)
+    return wire_format.respond(request, response, "batch", batch, catalog.codes)
+
+@app.websocket("/api/session/{session_id}/ws")
+async def crush_session_ws(websocket: WebSocket, session_id: str):
+    """Stream crush actions in and crush results with stat deltas out"""
+    await websocket.accept()
+    if await session_backend.get(session_id) is None:
+        await websocket.send_json({"type": "error", "status": 404, "detail": "Session not found"})
+        await websocket.close(code=4404)
+        return
     
-    # Calculate crush result
-    crush_result = {
-        "object": obj,
-        "success": True,
-        "satisfaction_gained": obj["satisfaction_score"],
-        "particles": obj["particles"],
-        "sound": obj["sound"],
-        "vibration": obj["vibration_pattern"],
-        "animation_duration": obj["crush_time"],
-        "force_applied": crush_action.force
-    }
+    client = websocket.client.host if websocket.client else None
+
+    async def on_crush(message: dict) -> dict:
+        rate_limits["ws_crush"].check(session_id, client)
+        crush_action = CrushAction(**message)
+        obj = get_object_or_404(crush_action.object_id)
+        effects = []
+        async with session_scope(session_id, effects) as session:
+            result = await apply_crush(session_id, session, obj, crush_action, effects)
+            update = crush_update(session, result)
+        return update
     
-    return crush_result
+    # Auto-mode crushes for this session are pushed down the same socket
+    events = auto_scheduler.subscribe(session_id)
+    try:
+        channel = CrushChannel(
+            websocket, on_crush,
+            heartbeat_interval=WS_HEARTBEAT_INTERVAL, queue_size=WS_QUEUE_SIZE, events=events
+        )
+        await channel.run()
+    finally:
+        auto_scheduler.unsubscribe(session_id, events)
+
+@app.post("/api/session/{session_id}/auto/start", dependencies=[Depends(rate_limits["auto_start"])])
+async def start_auto_crush(session_id: str, speed: float = Query(1.0, gt=0, le=100)):
+    """Start server-side auto crushing for a session"""
+    session = await get_session_or_404(session_id)
+    if not session["active"]:
+        raise HTTPException(status_code=409, detail="Session has ended")
+    auto_scheduler.start_session(session_id, speed=speed)
+    return {"message": "Auto crushing started", "speed": speed}
+
+@app.post("/api/session/{session_id}/auto/stop")
+async def stop_auto_crush(session_id: str):
+    """Stop server-side auto crushing for a session"""
+    await get_session_or_404(session_id)
+    stopped = auto_scheduler.stop_session(session_id)
+    return {"message": "Auto crushing stopped" if stopped else "Auto crushing was not running"}
 
 @app.get("/api/session/{session_id}/stats")
-async def get_session_stats(session_id: str):
+async def get_session_stats(session_id: str, request: Request, response: Response):
     """Get statistics for a session"""
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = await get_session_or_404(session_id)
+    
+    return wire_format.respond(request, response, "stats", session_stats(session), catalog.codes)
+
+@app.get("/api/session/{session_id}/history")
+async def get_session_history(
+    session_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    stream: bool = False,
+):
+    """Get the raw crush sequence for a session, paginated or streamed as runs"""
+    session = await get_session_or_404(session_id)
+    
+    history = session["history"]
+    if stream:
+        def stream_runs():
+            for code, count in history.runs():
+                object_id = catalog.object_for_code(code)["id"]
+                yield json.dumps({"object_id": object_id, "count": count}) + "\n"
+        return StreamingResponse(stream_runs(), media_type="application/x-ndjson")
     
-    session = sessions[session_id]
     return {
-        "total_crushed": len(session["objects_crushed"]),
-        "total_satisfaction": session["total_satisfaction"],
-        "objects_crushed": session["objects_crushed"],
-        "session_duration": session["session_duration"]
+        "total": len(history),
+        "offset": offset,
+        "limit": limit,
+        "objects_crushed": history_ids(history.slice(offset, limit))
+    }
+
+@app.get("/api/session/{session_id}/next")
+async def get_next_objects(session_id: str, limit: int = Query(3, ge=1, le=100)):
+    """Objects recommended for the session to crush next, best first; scores sum to 1 over the catalog"""
+    session = await get_session_or_404(session_id)
+    recommended = recommender.recommend(
+        session["history"].tail(Recommender.WINDOW), catalog.objects, catalog.codes, limit
+    )
+    return {
+        "session_id": session_id,
+        "recommendations": [{"object_id": obj["id"], "score": round(score, 4)} for obj, score in recommended]
     }
 
 @app.post("/api/session/{session_id}/end")
 async def end_session(session_id: str):
     """End a crush session"""
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    sessions[session_id]["active"] = False
-    sessions[session_id]["ended_at"] = datetime.now().isoformat()
-    
-    return {"message": "Session ended successfully", "stats": sessions[session_id]}
+    effects = []
+    async with session_scope(session_id, effects) as session:
+        if session_recorder is not None and session["active"]:
+            effects.append(functools.partial(session_recorder.end, session_id))
+        session["active"] = False
+        session["ended_at"] = datetime.now().isoformat()
+        effects.append(functools.partial(auto_scheduler.stop_session, session_id))
+        await session_backend.end(session_id)
+        effects.append(functools.partial(leaderboards.finish, session_id, type_totals(session)))
+        
+        stats = {key: value for key, value in session.items() if key not in INTERNAL_FIELDS}
+        stats.update(session_stats(session))
+    return {"message": "Session ended successfully", "stats": stats}
+
+LeaderboardMetric = Literal["satisfaction", "crushed"]
+LeaderboardWindow = Literal["all", "daily", "weekly"]
+
+def leaderboard_type_or_404(obj_type: Optional[str]) -> Optional[str]:
+    if obj_type is not None and obj_type not in catalog.indexes["type"]:
+        not_found_counter.inc("type")
+        raise HTTPException(status_code=404, detail="Object type not found")
+    return obj_type
+
+@app.get("/api/leaderboard/{metric}")
+async def get_leaderboard(
+    metric: LeaderboardMetric,
+    window: LeaderboardWindow = "all",
+    type: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Top sessions by satisfaction or objects crushed, optionally for one object type"""
+    board = leaderboards.top(window, metric, leaderboard_type_or_404(type), offset=offset, limit=limit)
+    return {"metric": metric, "window": window, "type": type, "offset": offset, "limit": limit, **board}
+
+@app.get("/api/session/{session_id}/rank")
+async def get_session_rank(
+    session_id: str,
+    metric: LeaderboardMetric = "satisfaction",
+    window: LeaderboardWindow = "all",
+    type: Optional[str] = None,
+):
+    """A session's position on a leaderboard; rank is null if it has no score there"""
+    rank = leaderboards.rank(session_id, window, metric, leaderboard_type_or_404(type))
+    return {"session_id": session_id, "metric": metric, "window": window, "type": type, **rank}
+
+@app.get("/api/analytics")
+async def get_analytics(object_id: Optional[str] = None):
+    """Crush counts, force histograms and position heatmaps per object, from the rolled-up aggregates"""
+    if object_id is not None:
+        get_object_or_404(object_id)
+    return crush_analytics.report(object_id)
+
+@app.get("/api/sessions/metrics")
+async def get_session_metrics():
+    """Get session store metrics"""
+    return sessions.metrics()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/modes")
-async def get_game_modes():
+async def get_game_modes(request: Request):
     """Get available game modes"""
-    return {
-        "modes": [
-            {
-                "id": "interactive",
-                "name": "Interactive Mode",
-                "description": "Tap to crush objects at your own pace",
-                "icon": "👆"
-            },
-            {
-                "id": "auto",
-                "name": "Auto Mode", 
-                "description": "Watch objects crush automatically in a relaxing sequence",
-                "icon": "🔄"
-            },
-            {
-                "id": "mixed",
-                "name": "Mixed Mode",
-                "description": "Combination of auto and interactive crushing",
-                "icon": "🎭"
-            }
-        ]
-    }
+    cached = response_cache.get("modes", game_modes, lambda: {"modes": game_modes})
+    return response_cache.respond(request, cached)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    if workers > 1 and os.environ.get("SESSION_BACKEND", "memory") != "shared":
+        raise SystemExit("Running several workers needs SESSION_BACKEND=shared")
+    uvicorn.run("server:app", host="0.0.0.0", port=8001, workers=workers)
@@ -0,0 +1,362 @@
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from crush_history import CrushHistory
+from session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBackend:
+    """Storage interface behind the session routes
+
+    Sessions are plain dicts holding a CrushHistory under "history". Routes
+    mutate the dict they got from session() and then report the change
+    through record_crushes() or record_idempotency(), so a backend only has
+    to make that change durable. session() holds a per-session lock, so a
+    read-modify-write that awaits part way through cannot interleave with
+    another one on the same session.
+    """
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """The lock serialising updates to one session; dropped once nobody holds or awaits it"""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def create(self, session_id: str, session: dict):
+        raise NotImplementedError
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[Optional[dict]]:
+        """Hold a session for a read-modify-write; yields None if it does not exist"""
+        async with self.lock(session_id):
+            yield await self.get(session_id)
+
+    async def record_crush(self, session_id: str, object_id: str, satisfaction: int):
+        raise NotImplementedError
+
+    async def record_crushes(self, session_id: str, crushes: List[Tuple[str, int]]):
+        """Persist (object_id, satisfaction) crushes just appended to the history together, oldest first"""
+        for object_id, satisfaction in crushes:
+            await self.record_crush(session_id, object_id, satisfaction)
+
+    async def record_idempotency(self, session_id: str, changes: dict):
+        """Persist idempotency records that were added (key -> record) or dropped (key -> None)"""
+        raise NotImplementedError
+
+    async def end(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def flush(self):
+        pass
+
+
+class MemorySessionBackend(SessionBackend):
+    """Keeps sessions only in the local SessionStore"""
+
+    async def create(self, session_id: str, session: dict):
+        self.store.add(session_id, session)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        return self.store.get(session_id)
+
+    async def record_crush(self, session_id: str, object_id: str, satisfaction: int):
+        pass
+
+    async def record_idempotency(self, session_id: str, changes: dict):
+        pass
+
+    async def end(self, session_id: str) -> Optional[dict]:
+        return self.store.end(session_id)
+
+
+class WriteBehindBuffer:
+    """Coalesces session updates until the next flush"""
+
+    def __init__(self):
+        self._pending: Dict[str, dict] = {}
+        self.crushes = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._pending
+
+    def _entry(self, session_id: str) -> dict:
+        entry = self._pending.get(session_id)
+        if entry is None:
+            entry = {"satisfaction": 0, "crushed": 0, "counts": {}, "runs": [], "set": {}, "idempotency": {}}
+            self._pending[session_id] = entry
+        return entry
+
+    def add_crush(self, session_id: str, object_id: str, satisfaction: int):
+        entry = self._entry(session_id)
+        entry["satisfaction"] += satisfaction
+        entry["crushed"] += 1
+        entry["counts"][object_id] = entry["counts"].get(object_id, 0) + 1
+        _append_run(entry["runs"], object_id, 1)
+        self.crushes += 1
+
+    def set_fields(self, session_id: str, fields: dict):
+        self._entry(session_id)["set"].update(fields)
+
+    def set_idempotency(self, session_id: str, changes: dict):
+        self._entry(session_id)["idempotency"].update(changes)
+
+    def pop(self, session_id: str) -> Optional[dict]:
+        entry = self._pending.pop(session_id, None)
+        if entry is not None:
+            self.crushes -= entry["crushed"]
+        return entry
+
+    def drain(self) -> Dict[str, dict]:
+        pending, self._pending = self._pending, {}
+        self.crushes = 0
+        return pending
+
+    def requeue(self, batch: Dict[str, dict]):
+        """Put a batch that failed to flush back in front of newer updates"""
+        newer = self.drain()
+        for source in (batch, newer):
+            for session_id, entry in source.items():
+                merged = self._entry(session_id)
+                merged["satisfaction"] += entry["satisfaction"]
+                merged["crushed"] += entry["crushed"]
+                for object_id, count in entry["counts"].items():
+                    merged["counts"][object_id] = merged["counts"].get(object_id, 0) + count
+                for object_id, count in entry["runs"]:
+                    _append_run(merged["runs"], object_id, count)
+                merged["set"].update(entry["set"])
+                merged["idempotency"].update(entry["idempotency"])
+                self.crushes += entry["crushed"]
+
+
+def _append_run(runs: List[list], object_id: str, count: int):
+    if runs and runs[-1][0] == object_id:
+        runs[-1][1] += count
+    else:
+        runs.append([object_id, count])
+
+
+def build_update(entry: dict) -> dict:
+    """Turn a buffered entry into a single $inc/$push/$set/$unset update document"""
+    update = {}
+    inc = {}
+    if entry["crushed"]:
+        inc["total_satisfaction"] = entry["satisfaction"]
+        inc["total_crushed"] = entry["crushed"]
+        for object_id, count in entry["counts"].items():
+            inc[f"counts.{object_id}"] = count
+        update["$push"] = {"runs": {"$each": entry["runs"]}}
+    if inc:
+        update["$inc"] = inc
+    fields = dict(entry["set"])
+    unset = {}
+    for key, record in entry["idempotency"].items():
+        if record is None:
+            unset[f"idempotency.{key}"] = ""
+        else:
+            fields[f"idempotency.{key}"] = record
+    if fields:
+        update["$set"] = fields
+    if unset:
+        update["$unset"] = unset
+    return update
+
+
+def apply_idempotency(session: dict, changes: dict):
+    """Apply record_idempotency() changes to a session or document held as a whole"""
+    records = session.setdefault("idempotency", {})
+    for key, record in changes.items():
+        records.pop(key, None)
+        if record is not None:
+            records[key] = record
+
+
+# Document fields that are derived from the history or used for bookkeeping
+DOCUMENT_ONLY_FIELDS = ("_id", "runs", "counts", "total_crushed", "owner", "lease_until", "version")
+
+
+def session_to_document(session_id: str, session: dict, catalog) -> dict:
+    """Persisted form of a session; history is stored as object id runs"""
+    document = {key: value for key, value in session.items() if key != "history"}
+    history = session["history"]
+    document["_id"] = session_id
+    document["total_crushed"] = len(history)
+    document["counts"] = {
+        catalog.object_for_code(code)["id"]: count for code, count in history.counts().items()
+    }
+    document["runs"] = [
+        [catalog.object_for_code(code)["id"], count] for code, count in history.runs()
+    ]
+    return document
+
+
+def session_from_document(document: dict, catalog) -> dict:
+    history = CrushHistory()
+    for object_id, count in document.get("runs", []):
+        if object_id in catalog.codes:
+            history.append(catalog.codes[object_id], count)
+    session = {key: value for key, value in document.items() if key not in DOCUMENT_ONLY_FIELDS}
+    session["history"] = history
+    return session
+
+
+class MongoSessionBackend(SessionBackend):
+    """Persists sessions to a MongoDB collection with write-behind batching
+
+    Sessions are created synchronously so that other workers can find them,
+    while crushes are coalesced per session and flushed with one bulk_write
+    of update_one($inc/$push) operations. The local SessionStore is used as
+    a read cache; a session it evicted while its updates were still
+    buffered is flushed before being read back. pymongo calls run in the
+    default executor so they never block the event loop.
+
+    The increments are not idempotent, so after a failed bulk_write only
+    the operations the server reports as failed are put back; the others
+    were applied.
+    """
+
+    def __init__(
+        self,
+        collection,
+        store: SessionStore,
+        get_catalog: Callable,
+        flush_interval: float = 0.5,
+        max_batch: int = 1000,
+    ):
+        super().__init__(store)
+        self.collection = collection
+        self.get_catalog = get_catalog
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.buffer = WriteBehindBuffer()
+        self._flush_lock = asyncio.Lock()
+        self._flush_needed = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        # The batch bulk_write is writing, by session
+        self._in_flight: Dict[str, dict] = {}
+
+    @classmethod
+    def from_url(cls, url: str, store: SessionStore, get_catalog: Callable, **kwargs):
+        from pymongo import MongoClient
+
+        client = MongoClient(url)
+        collection = client.get_default_database("crush_simulator")["sessions"]
+        return cls(collection, store, get_catalog, **kwargs)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def start(self):
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Session flush failed")
+
+    def to_document(self, session_id: str, session: dict) -> dict:
+        return session_to_document(session_id, session, self.get_catalog())
+
+    def from_document(self, document: dict) -> dict:
+        return session_from_document(document, self.get_catalog())
+
+    async def create(self, session_id: str, session: dict):
+        await self._run(self.collection.insert_one, self.to_document(session_id, session))
+        self.store.add(session_id, session)
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        session = self.store.get(session_id)
+        if session is not None:
+            return session
+        if session_id in self.buffer or session_id in self._in_flight:
+            # Evicted before its updates were written; the document does not have them yet
+            await self.flush()
+        document = await self._run(self.collection.find_one, {"_id": session_id})
+        if document is None:
+            return None
+        session = self.from_document(document)
+        # Another request may have loaded it while we were waiting
+        cached = self.store.get(session_id)
+        if cached is not None:
+            return cached
+        if session.get("active", True):
+            self.store.add(session_id, session)
+        return session
+
+    async def record_crush(self, session_id: str, object_id: str, satisfaction: int):
+        self.buffer.add_crush(session_id, object_id, satisfaction)
+        if self.buffer.crushes >= self.max_batch:
+            self._flush_needed.set()
+
+    async def record_idempotency(self, session_id: str, changes: dict):
+        self.buffer.set_idempotency(session_id, changes)
+
+    async def end(self, session_id: str) -> Optional[dict]:
+        session = self.store.end(session_id)
+        if session is not None:
+            self.buffer.set_fields(session_id, {"active": False, "ended_at": session.get("ended_at")})
+            await self.flush()
+        return session
+
+    async def flush(self) -> int:
+        """Write all buffered updates with one bulk_write; returns the number of operations"""
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        async with self._flush_lock:
+            batch = self.buffer.drain()
+            if not batch:
+                return 0
+            session_ids = list(batch)
+            operations: List[UpdateOne] = [
+                UpdateOne({"_id": session_id}, build_update(batch[session_id])) for session_id in session_ids
+            ]
+            self._in_flight = batch
+            try:
+                await self._run(lambda: self.collection.bulk_write(operations, ordered=False))
+            except BulkWriteError as exc:
+                failed = {session_ids[error["index"]] for error in exc.details.get("writeErrors", ())}
+                self.buffer.requeue({session_id: batch[session_id] for session_id in failed})
+                raise
+            except Exception:
+                # The request as a whole failed, after pymongo retried it (update_one is a retryable write)
+                self.buffer.requeue(batch)
+                raise
+            finally:
+                self._in_flight = {}
+            return len(operations)
@@ -0,0 +1,464 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Set, Tuple
+
+from crush_history import CrushHistory
+from session_backend import MemorySessionBackend, apply_idempotency
+from session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+# Every record is framed by its payload length and the payload's CRC-32
+FRAME = struct.Struct("<II")
+# A payload starts with its kind and the length of the UTF-8 session id that follows
+KEY = struct.Struct("<cB")
+# b"X": history position of the crush, object code, satisfaction gained
+CRUSH = struct.Struct("<IHi")
+# b"N" (created, [fields, runs]), b"E" (ended, fields set) and b"I" (idempotency
+# records added or dropped) have JSON bodies; b"F" (fields set) is only still read,
+# from journals written before it was dropped
+
+SYNC_MODES = ("commit", "interval")
+# Sessions per snapshot line, encoded between yields to the event loop
+SNAPSHOT_CHUNK = 1000
+
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+def _json(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_record(kind: bytes, session_id: str, body: bytes = b"") -> bytes:
+    key = session_id.encode("utf-8")
+    payload = KEY.pack(kind, len(key)) + key + body
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_records(data: bytes) -> Iterator[Tuple[bytes, str, memoryview, int]]:
+    """(kind, session id, body, end offset) of every intact record in a journal segment
+
+    Stops at the first record that is cut short or fails its checksum,
+    which after a crash is the torn end of the segment.
+    """
+    view = memoryview(data)
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        start = offset + FRAME.size
+        end = start + length
+        if end > len(data) or length < KEY.size:
+            return
+        payload = view[start:end]
+        if zlib.crc32(payload) != crc:
+            return
+        kind, size = KEY.unpack_from(payload)
+        yield kind, bytes(payload[KEY.size:KEY.size + size]).decode("utf-8"), payload[KEY.size + size:], end
+        offset = end
+
+
+def _runs(history: CrushHistory) -> List[int]:
+    return [value for run in history.runs() for value in run]
+
+
+def _history(runs: List[int]) -> CrushHistory:
+    history = CrushHistory()
+    for position in range(0, len(runs), 2):
+        history.append(runs[position], runs[position + 1])
+    return history
+
+
+def encode_snapshot_chunk(entries: List[Tuple[str, dict]]) -> bytes:
+    """One snapshot line: the sessions in entries, with fields every one of them has stored as columns"""
+    common = [key for key in entries[0][1] if key != "history"] if entries else []
+    common = [key for key in common if all(key in session for _, session in entries)]
+    extra = []
+    for position, (_, session) in enumerate(entries):
+        if len(session) > len(common) + 1:
+            extra.append([position, {key: value for key, value in session.items()
+                                     if key not in common and key != "history"}])
+    return _json({
+        "ids": [session_id for session_id, _ in entries],
+        "columns": {key: [session[key] for _, session in entries] for key in common},
+        "extra": extra,
+        "runs": [_runs(session["history"]) for _, session in entries],
+    }) + b"\n"
+
+
+def decode_snapshot_chunk(line: bytes) -> List[Tuple[str, dict]]:
+    chunk = json.loads(line)
+    keys = list(chunk["columns"])
+    if keys:
+        sessions = [dict(zip(keys, row)) for row in zip(*chunk["columns"].values())]
+    else:
+        sessions = [{} for _ in chunk["ids"]]
+    for position, fields in chunk["extra"]:
+        sessions[position].update(fields)
+    for session, runs in zip(sessions, chunk["runs"]):
+        session["history"] = _history(runs)
+    return list(zip(chunk["ids"], sessions))
+
+
+def apply_records(data: bytes, sessions: "OrderedDict[str, dict]", ended: Set[str]) -> int:
+    """Apply a journal segment's records to sessions, returning the length of its intact prefix
+
+    Replaying is idempotent: a crush is only appended if its history
+    position is the next one, and a session is only created if it is not
+    there yet, so records a snapshot already includes change nothing.
+    Records of sessions that are not there are skipped.
+    """
+    intact = 0
+    for kind, session_id, body, intact in iter_records(data):
+        if kind == b"N":
+            if session_id not in sessions:
+                fields, runs = json.loads(bytes(body))
+                fields["history"] = _history(runs)
+                sessions[session_id] = fields
+            continue
+        session = sessions.get(session_id)
+        if session is None:
+            continue
+        if kind == b"X":
+            index, code, satisfaction = CRUSH.unpack(body)
+            history = session["history"]
+            if index == len(history):
+                history.append(code)
+                session["total_satisfaction"] = session.get("total_satisfaction", 0) + satisfaction
+        elif kind in (b"F", b"E"):
+            session.update(json.loads(bytes(body)))
+            if kind == b"E":
+                ended.add(session_id)
+        elif kind == b"I":
+            apply_idempotency(session, json.loads(bytes(body)))
+        sessions.move_to_end(session_id)
+    return intact
+
+
+class JournalSessionBackend(MemorySessionBackend):
+    """Sessions in memory, made durable by a local append-only journal and snapshots
+
+    Every mutation is appended to a journal buffer as a small checksummed
+    record, as it happens. A single writer task writes the buffer out and
+    fsyncs it, and mutations arriving during an fsync wait for the next
+    one, so one fsync commits a whole group of them. With sync="commit"
+    create() and the end of a session() block wait until the records they
+    made are on disk, so no response reports a change a crash can lose;
+    with sync="interval" they do not wait, and up to commit_interval
+    seconds of mutations can be lost.
+
+    The journal is split into numbered segments. Every snapshot_interval
+    seconds, or once snapshot_bytes have been journalled, a snapshot starts
+    a new segment and writes every session to a file, a chunk at a time
+    between requests, then deletes older segments and snapshots. Sessions
+    can change while a snapshot is being written; replaying the journal
+    from the snapshot's segment is idempotent, so any mix of older and
+    newer state in it recovers the same sessions.
+
+    start() recovers the latest snapshot and the journal after it in the
+    default executor, truncating a torn record at the end of a segment, and
+    session lookups wait for it. Sessions evicted from the SessionStore are
+    not journalled and come back with a restart if their records are
+    still in the journal.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        store: SessionStore,
+        get_catalog: Callable,
+        sync: str = "commit",
+        commit_interval: float = 0.005,
+        snapshot_interval: float = 300.0,
+        snapshot_bytes: int = 64 << 20,
+        clock=time.monotonic,
+    ):
+        if sync not in SYNC_MODES:
+            raise ValueError(f"sync must be one of {SYNC_MODES}")
+        super().__init__(store)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.get_catalog = get_catalog
+        self.sync = sync
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_bytes = snapshot_bytes
+        self._clock = clock
+        self._buffer = bytearray()
+        # Bytes appended since start, and how many of them are on disk
+        self._appended = 0
+        self._durable = 0
+        # (position, future) of commits waiting for the journal to reach position
+        self._waiters: deque = deque()
+        self._wake = asyncio.Event()
+        self._recovered = asyncio.Event()
+        # One group commit or segment switch at a time
+        self._io = asyncio.Lock()
+        self._segment = 0
+        self._fd: Optional[int] = None
+        self._closing = False
+        self._writer: Optional[asyncio.Task] = None
+        self._snapshotter: Optional[asyncio.Task] = None
+        self._since_snapshot = 0
+        self._last_snapshot = clock()
+        self.stats = {"records": 0, "commits": 0, "bytes": 0, "snapshots": 0,
+                      "recovered_sessions": 0, "recovery_seconds": 0.0}
+
+    def _path(self, prefix: str, number: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{prefix}-{number:08d}{suffix}")
+
+    def _numbered(self, prefix: str, suffix: str) -> List[int]:
+        return sorted(
+            int(name[len(prefix) + 1:-len(suffix)]) for name in os.listdir(self.directory)
+            if name.startswith(prefix + "-") and name.endswith(suffix)
+        )
+
+    def _sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _open_segment(self, number: int):
+        self._fd = os.open(self._path("journal", number, ".log"), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._sync_directory()
+
+    def recover(self) -> Tuple["OrderedDict[str, dict]", Set[str], int]:
+        """Sessions in the latest snapshot and the journal after it, which of them ended, and the next segment"""
+        sessions: "OrderedDict[str, dict]" = OrderedDict()
+        ended: Set[str] = set()
+        snapshots = self._numbered("snapshot", ".ndjson")
+        first = snapshots[-1] if snapshots else 0
+        if snapshots:
+            with open(self._path("snapshot", first, ".ndjson"), "rb") as source:
+                for line in source:
+                    sessions.update(decode_snapshot_chunk(line))
+            ended.update(session_id for session_id, session in sessions.items() if not session.get("active", True))
+        segments = [number for number in self._numbered("journal", ".log") if number >= first]
+        for number in segments:
+            path = self._path("journal", number, ".log")
+            with open(path, "rb") as source:
+                data = source.read()
+            intact = apply_records(data, sessions, ended)
+            if intact < len(data):
+                logger.warning("Dropping %d torn bytes at the end of %s", len(data) - intact, path)
+                os.truncate(path, intact)
+        return sessions, ended, (segments[-1] + 1 if segments else first)
+
+    async def start(self):
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        sessions, ended, segment = await loop.run_in_executor(None, self.recover)
+        for count, (session_id, session) in enumerate(sessions.items()):
+            self.store.add(session_id, session)
+            if session_id in ended:
+                self.store.end(session_id)
+            if count % 10_000 == 9_999:
+                await asyncio.sleep(0)
+        self._segment = segment
+        await loop.run_in_executor(None, self._open_segment, segment)
+        self.stats["recovered_sessions"] = len(sessions)
+        self.stats["recovery_seconds"] = round(time.perf_counter() - started, 3)
+        self._recovered.set()
+        self._writer = asyncio.create_task(self._run())
+        if sessions:
+            logger.info("Recovered %d sessions in %.1fs", len(sessions), self.stats["recovery_seconds"])
+
+    async def close(self):
+        if self._snapshotter is not None:
+            self._snapshotter.cancel()
+        if self._writer is not None:
+            # Let a commit in progress finish rather than cancel it half written
+            self._closing = True
+            self._wake.set()
+            await self._writer
+            self._writer = None
+        if self._fd is not None:
+            await self.flush()
+            os.close(self._fd)
+            self._fd = None
+
+    def _append(self, record: bytes):
+        self._buffer += record
+        self._appended += len(record)
+        self.stats["records"] += 1
+
+    async def _committed(self):
+        """With sync="commit", wait until everything appended so far is on disk"""
+        if self.sync != "commit" or self._durable >= self._appended:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((self._appended, future))
+        self._wake.set()
+        await future
+
+    def _write(self, data: bytes):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        _fdatasync(self._fd)
+
+    def _switch_segment(self, data: bytes, number: int):
+        self._write(data)
+        os.close(self._fd)
+        self._open_segment(number)
+
+    async def _commit(self, switch_to: Optional[int] = None):
+        """Write and fsync the buffer as one group, optionally then starting segment switch_to"""
+        async with self._io:
+            if not self._buffer and switch_to is None:
+                return
+            data, self._buffer = self._buffer, bytearray()
+            position = self._appended
+            loop = asyncio.get_running_loop()
+            try:
+                if switch_to is None:
+                    await loop.run_in_executor(None, self._write, data)
+                else:
+                    await loop.run_in_executor(None, self._switch_segment, data, switch_to)
+                    self._segment = switch_to
+            except Exception as exc:
+                # Retried with the next group; the requests waiting on it fail
+                self._buffer[:0] = data
+                while self._waiters and self._waiters[0][0] <= position:
+                    _, future = self._waiters.popleft()
+                    if not future.done():
+                        future.set_exception(exc)
+                raise
+            self._durable = position
+            self._since_snapshot += len(data)
+            self.stats["commits"] += 1
+            self.stats["bytes"] += len(data)
+            while self._waiters and self._waiters[0][0] <= position:
+                _, future = self._waiters.popleft()
+                if not future.done():
+                    future.set_result(None)
+
+    def _snapshot_due(self) -> bool:
+        if self._snapshotter is not None and not self._snapshotter.done():
+            return False
+        if self._since_snapshot >= self.snapshot_bytes:
+            return True
+        return (self._since_snapshot > 0 and self.snapshot_interval > 0 and
+                self._clock() - self._last_snapshot >= self.snapshot_interval)
+
+    async def _run(self):
+        # Waiters wake the writer at once; otherwise it commits every commit_interval
+        timeout = self.commit_interval if self.sync == "interval" else max(self.commit_interval, 1.0)
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._commit()
+            except Exception:
+                logger.exception("Writing session journal %s failed", self.directory)
+            if not self._closing and self._snapshot_due():
+                self._snapshotter = asyncio.create_task(self.snapshot())
+
+    async def snapshot(self) -> int:
+        """Write every session to a new snapshot and drop what it replaces; returns sessions written"""
+        segment = self._segment + 1
+        # Shielded: close() cancels snapshots, but not a segment switch half done
+        await asyncio.shield(self._commit(switch_to=segment))
+        self._since_snapshot = 0
+        self._last_snapshot = self._clock()
+        # Only the ids are copied in one go, the sessions themselves a chunk
+        # at a time; a session evicted while the snapshot is written is left
+        # out, like everything evicted before it
+        session_ids = self.store.ids()
+        written = 0
+        loop = asyncio.get_running_loop()
+        path = self._path("snapshot", segment, ".ndjson")
+        output = await loop.run_in_executor(None, open, path + ".tmp", "wb")
+        try:
+            for start in range(0, len(session_ids), SNAPSHOT_CHUNK):
+                entries = [(session_id, self.store.peek(session_id))
+                           for session_id in session_ids[start:start + SNAPSHOT_CHUNK]]
+                entries = [(session_id, session) for session_id, session in entries if session is not None]
+                written += len(entries)
+                line = encode_snapshot_chunk(entries)
+                await loop.run_in_executor(None, output.write, line)
+            await loop.run_in_executor(None, self._finish_snapshot, output, path, segment)
+        except BaseException:
+            output.close()
+            raise
+        self.stats["snapshots"] += 1
+        return written
+
+    def _finish_snapshot(self, output, path: str, segment: int):
+        output.flush()
+        os.fsync(output.fileno())
+        output.close()
+        os.replace(path + ".tmp", path)
+        self._sync_directory()
+        for number in self._numbered("snapshot", ".ndjson"):
+            if number < segment:
+                os.remove(self._path("snapshot", number, ".ndjson"))
+        for number in self._numbered("journal", ".log"):
+            if number < segment:
+                os.remove(self._path("journal", number, ".log"))
+
+    async def flush(self):
+        await self._commit()
+
+    async def create(self, session_id: str, session: dict):
+        await self._recovered.wait()
+        self.store.add(session_id, session)
+        fields = {key: value for key, value in session.items() if key != "history"}
+        self._append(encode_record(b"N", session_id, _json([fields, _runs(session["history"])])))
+        await self._committed()
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        if not self._recovered.is_set():
+            await self._recovered.wait()
+        return self.store.get(session_id)
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[Optional[dict]]:
+        async with self.lock(session_id):
+            yield await self.get(session_id)
+        # Outside the lock, so the next update to the session can join the same group commit
+        await self._committed()
+
+    async def record_crush(self, session_id: str, object_id: str, satisfaction: int):
+        """Journal a crush already appended to the session's history"""
+        session = self.store.get(session_id)
+        if session is None:
+            return
+        index = len(session["history"]) - 1
+        self._append(encode_record(
+            b"X", session_id, CRUSH.pack(index, self.get_catalog().codes[object_id], satisfaction)
+        ))
+
+    async def record_crushes(self, session_id: str, crushes: List[Tuple[str, int]]):
+        """Journal a batch of crushes already appended to the session's history"""
+        session = self.store.get(session_id)
+        if session is None:
+            return
+        codes = self.get_catalog().codes
+        start = len(session["history"]) - len(crushes)
+        for offset, (object_id, satisfaction) in enumerate(crushes):
+            self._append(encode_record(
+                b"X", session_id, CRUSH.pack(start + offset, codes[object_id], satisfaction)
+            ))
+
+    async def record_idempotency(self, session_id: str, changes: dict):
+        self._append(encode_record(b"I", session_id, _json(changes)))
+
+    async def end(self, session_id: str) -> Optional[dict]:
+        session = self.store.end(session_id)
+        if session is not None:
+            self._append(encode_record(
+                b"E", session_id, _json({"active": False, "ended_at": session.get("ended_at")})
+            ))
+        return session
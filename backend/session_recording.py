@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import struct
+import threading
+import time
+import uuid
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Every record starts with its kind, the session's UUID bytes and a unix timestamp
+HEADER = struct.Struct("<c16sd")
+# b"S": seed, catalog version, starting satisfaction, number of starting history codes (then u16 each)
+START = struct.Struct("<q12sqI")
+# b"C": history position of the first crush, number of crushes (then CRUSH each)
+CALL = struct.Struct("<IH")
+CRUSH = struct.Struct("<Hddd")
+# b"E" has no body
+
+
+class SessionRecording:
+    """Everything needed to re-run one session: its seed, starting state and crush inputs
+
+    Inputs are kept as calls, one per request that crushed something (a
+    single crush, a batch, an auto-mode crush), because the crush engine
+    draws the random numbers for a whole call at once. Each call holds the
+    history position of its first crush, the wall time it arrived, and the
+    object code, force and position of every crush in it.
+    """
+
+    __slots__ = ("session_id", "seed", "catalog_version", "satisfaction", "initial", "started", "ended",
+                 "calls", "codes", "forces", "xs", "ys")
+
+    def __init__(self, session_id: str, seed: int, catalog_version: str, satisfaction: int = 0,
+                 initial: Iterable[int] = (), started: float = 0.0):
+        self.session_id = session_id
+        self.seed = seed
+        self.catalog_version = catalog_version
+        self.satisfaction = satisfaction
+        self.initial = array("H", initial)
+        self.started = started
+        self.ended: Optional[float] = None
+        # (history index, wall time, number of crushes) per call, crush columns below
+        self.calls: List[Tuple[int, float, int]] = []
+        self.codes = array("H")
+        self.forces = array("d")
+        self.xs = array("d")
+        self.ys = array("d")
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def add_call(self, index: int, ts: float, crushes: Sequence[Tuple[int, float, float, float]]):
+        self.calls.append((index, ts, len(crushes)))
+        for code, force, x, y in crushes:
+            self.codes.append(code)
+            self.forces.append(force)
+            self.xs.append(x)
+            self.ys.append(y)
+
+    def iter_calls(self) -> Iterator[Tuple[int, float, slice]]:
+        """(history index, wall time, slice of the crush columns) per call, in order"""
+        start = 0
+        for index, ts, count in self.calls:
+            yield index, ts, slice(start, start + count)
+            start += count
+
+    @property
+    def duration(self) -> float:
+        """Seconds from the session start to its last input or its end"""
+        last = self.ended if self.ended is not None else (self.calls[-1][1] if self.calls else self.started)
+        return max(last - self.started, 0.0)
+
+
+def encode_start(session_id: str, ts: float, seed: int, catalog_version: str, satisfaction: int,
+                 initial: Sequence[int]) -> bytes:
+    return (HEADER.pack(b"S", uuid.UUID(session_id).bytes, ts) +
+            START.pack(seed, catalog_version.encode("ascii"), satisfaction, len(initial)) +
+            array("H", initial).tobytes())
+
+
+def encode_call(session_id: str, ts: float, index: int, crushes: Sequence[Tuple[int, float, float, float]]) -> bytes:
+    parts = [HEADER.pack(b"C", uuid.UUID(session_id).bytes, ts), CALL.pack(index, len(crushes))]
+    parts.extend(CRUSH.pack(*crush) for crush in crushes)
+    return b"".join(parts)
+
+
+def encode_end(session_id: str, ts: float) -> bytes:
+    return HEADER.pack(b"E", uuid.UUID(session_id).bytes, ts)
+
+
+def read_recordings(paths: Iterable[str]) -> Dict[str, SessionRecording]:
+    """Sessions in recording files, keyed by session id
+
+    Records for one session may be spread over several files (one per
+    server process); calls are put back in history order. Sessions whose
+    start was not recorded cannot be replayed and are left out, and a
+    record cut short at the end of a file is ignored.
+    """
+    recordings: Dict[str, SessionRecording] = {}
+    pending: Dict[str, list] = {}
+    ends: Dict[str, float] = {}
+    for path in paths:
+        with open(path, "rb") as source:
+            data = source.read()
+        offset = 0
+        while offset + HEADER.size <= len(data):
+            kind, key, ts = HEADER.unpack_from(data, offset)
+            body = offset + HEADER.size
+            session_id = str(uuid.UUID(bytes=key))
+            if kind == b"S":
+                if body + START.size > len(data):
+                    break
+                seed, version, satisfaction, count = START.unpack_from(data, body)
+                end = body + START.size + 2 * count
+                if end > len(data):
+                    break
+                initial = array("H", data[body + START.size:end])
+                recordings[session_id] = SessionRecording(
+                    session_id, seed, version.decode("ascii"), satisfaction, initial, ts
+                )
+            elif kind == b"C":
+                if body + CALL.size > len(data):
+                    break
+                index, count = CALL.unpack_from(data, body)
+                start = body + CALL.size
+                end = start + CRUSH.size * count
+                if end > len(data):
+                    break
+                crushes = list(CRUSH.iter_unpack(data[start:end]))
+                pending.setdefault(session_id, []).append((index, ts, crushes))
+            elif kind == b"E":
+                end = body
+                ends[session_id] = ts
+            else:
+                raise ValueError(f"{path}: unknown record kind {kind!r} at byte {offset}")
+            offset = end
+
+    for session_id, calls in pending.items():
+        recording = recordings.get(session_id)
+        if recording is None:
+            continue
+        for index, ts, crushes in sorted(calls, key=lambda call: call[0]):
+            recording.add_call(index, ts, crushes)
+    for session_id, ts in ends.items():
+        if session_id in recordings:
+            recordings[session_id].ended = ts
+    return recordings
+
+
+def recording_files(paths: Iterable[str]) -> List[str]:
+    """Recording files among paths, looking inside directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(".rec")
+            ))
+        else:
+            files.append(path)
+    return files
+
+
+class SessionRecorder:
+    """Appends every session's inputs to a binary recording file
+
+    Each server process writes its own file in directory. Records are
+    buffered in memory and appended every flush_interval seconds by run(),
+    with the write itself in the default executor. Recording a crush is a
+    struct.pack and a bytearray append, done as the crush is applied.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0, clock=time.time):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.path = os.path.join(directory, f"sessions-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.rec")
+        self._clock = clock
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self.bytes_written = 0
+
+    def start(self, session_id: str, seed: int, catalog_version: str, satisfaction: int = 0,
+              initial: Sequence[int] = ()):
+        self._buffer += encode_start(session_id, self._clock(), seed, catalog_version, satisfaction, initial)
+
+    def call(self, session_id: str, index: int, crushes: Sequence[Tuple[int, float, float, float]]):
+        """Record one request's crushes as (code, force, x, y), starting at history position index"""
+        self._buffer += encode_call(session_id, self._clock(), index, crushes)
+
+    def end(self, session_id: str):
+        self._buffer += encode_end(session_id, self._clock())
+
+    def _write(self, data: bytes):
+        with self._lock, open(self.path, "ab") as recording:
+            recording.write(data)
+            self.bytes_written += len(data)
+
+    async def flush(self):
+        # Swapped out on the event loop, so nothing appends to the buffer being written
+        data, self._buffer = self._buffer, bytearray()
+        if data:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, bytes(data))
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except OSError:
+                logger.exception("Writing session recording %s failed", self.path)
+
+    def close(self):
+        data, self._buffer = self._buffer, bytearray()
+        if data:
+            self._write(bytes(data))
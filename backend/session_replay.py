@@ -0,0 +1,218 @@
+"""Replay recorded sessions through the crush logic and diff the outcomes
+
+    python session_replay.py replay RECORDINGS... [--catalog FILE] [--processes N] [--output results.ndjson]
+    python session_replay.py diff BASELINE CANDIDATE [--output diff.json]
+
+replay reads the recordings a server writes to SESSION_RECORD_DIR (files or
+directories), re-runs every session from its seed and inputs against a
+catalog file, and writes one result line per session: totals plus the
+object, satisfaction, deformation, stage, fracture, particle count and a
+digest of the particle burst of each crush. Replaying against the catalog
+the sessions were recorded with reproduces what their users were sent;
+replaying the same recordings with a changed catalog or crush engine and
+diffing the two result files shows what the change does to them.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from catalog import Catalog
+from catalog_source import load_objects
+from crush_engine import CrushEngine, crush_result
+from session_recording import SessionRecording, read_recordings, recording_files
+
+# Fields of a crush outcome, in the order they are written
+OUTCOME_FIELDS = ("object", "satisfaction", "deformation", "stage", "fractured", "particles", "burst")
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crush_objects.json")
+
+
+def burst_digest(burst: dict) -> str:
+    """Short digest of a packed particle burst, enough to tell whether two bursts differ"""
+    return hashlib.blake2b(base64.b64decode(burst["data"]), digest_size=8).hexdigest()
+
+
+def replay_session(recording: SessionRecording, catalog: Catalog, engine: CrushEngine) -> dict:
+    """Re-run one session's calls as the server ran them, returning its outcomes"""
+    result = {
+        "session_id": recording.session_id,
+        "catalog_version": recording.catalog_version,
+        "calls": len(recording.calls),
+        "crushes": len(recording),
+        "duration": round(recording.duration, 3),
+    }
+    try:
+        objs = [catalog.object_for_code(code) for code in recording.codes]
+    except KeyError as exc:
+        result["error"] = f"Object code {exc.args[0]} is not in the catalog"
+        return result
+
+    total = recording.satisfaction
+    outcomes = []
+    for index, _, crushes in recording.iter_calls():
+        call_objs = objs[crushes]
+        forces = recording.forces[crushes]
+        positions = [{"x": x, "y": y} for x, y in zip(recording.xs[crushes], recording.ys[crushes])]
+        simulations = engine.simulate(call_objs, forces, positions, recording.seed, index)
+        for obj, force, simulation in zip(call_objs, forces, simulations):
+            crush = crush_result(obj, force, simulation)
+            total += crush["satisfaction_gained"]
+            outcomes.append([
+                obj["id"], crush["satisfaction_gained"], simulation["deformation"], simulation["stage"],
+                simulation["fractured"], simulation["burst"]["count"], burst_digest(simulation["burst"]),
+            ])
+    result["total_satisfaction"] = total
+    result["outcomes"] = outcomes
+    return result
+
+
+# Per worker process: the catalog and engine every session in it is replayed with
+_worker: dict = {}
+
+
+def _start_worker(objects: List[dict]):
+    engine = CrushEngine()
+    engine.warm_up()
+    _worker["catalog"] = Catalog(objects)
+    _worker["engine"] = engine
+
+
+def _replay_chunk(recordings: List[SessionRecording]) -> List[dict]:
+    return [replay_session(recording, _worker["catalog"], _worker["engine"]) for recording in recordings]
+
+
+def replay(recordings: Sequence[SessionRecording], objects: List[dict], processes: Optional[int] = None,
+           chunk_size: int = 64) -> List[dict]:
+    """Replay sessions against a catalog's objects, in a pool of processes unless processes is 1
+
+    Sessions are independent, so they are handed out in chunks of
+    chunk_size and results come back in the order of recordings.
+    """
+    chunks = [list(recordings[start:start + chunk_size]) for start in range(0, len(recordings), chunk_size)]
+    if processes == 1:
+        _start_worker(objects)
+        return [result for chunk in chunks for result in _replay_chunk(chunk)]
+    with ProcessPoolExecutor(processes, initializer=_start_worker, initargs=(objects,)) as pool:
+        return [result for chunk in pool.map(_replay_chunk, chunks) for result in chunk]
+
+
+def write_results(path: str, results: Iterable[dict]):
+    with open(path, "w", encoding="utf-8") as output:
+        for result in results:
+            output.write(json.dumps(result, separators=(",", ":")) + "\n")
+
+
+def read_results(path: str) -> Dict[str, dict]:
+    with open(path, encoding="utf-8") as source:
+        return {result["session_id"]: result for result in map(json.loads, source)}
+
+
+def diff(baseline: Dict[str, dict], candidate: Dict[str, dict], largest: int = 10) -> dict:
+    """What changed between two replays of the same sessions
+
+    Counts changed sessions and crushes, which outcome fields changed, the
+    satisfaction difference overall and per object, and lists the sessions
+    whose satisfaction moved the most with the first crush that differs.
+    """
+    shared = [session_id for session_id in baseline if session_id in candidate]
+    fields = dict.fromkeys(OUTCOME_FIELDS, 0)
+    objects: Dict[str, dict] = {}
+    sessions = []
+    changed_crushes = 0
+    crushes = 0
+    errors = 0
+    totals = [0, 0]
+    for session_id in shared:
+        before, after = baseline[session_id], candidate[session_id]
+        if "error" in before or "error" in after:
+            errors += 1
+            continue
+        totals[0] += before["total_satisfaction"]
+        totals[1] += after["total_satisfaction"]
+        first_changed = None
+        for position, (old, new) in enumerate(zip(before["outcomes"], after["outcomes"])):
+            crushes += 1
+            stats = objects.setdefault(old[0], {"crushes": 0, "changed": 0, "satisfaction_delta": 0})
+            stats["crushes"] += 1
+            stats["satisfaction_delta"] += new[1] - old[1]
+            if old == new:
+                continue
+            changed_crushes += 1
+            stats["changed"] += 1
+            for field, old_value, new_value in zip(OUTCOME_FIELDS, old, new):
+                fields[field] += old_value != new_value
+            if first_changed is None:
+                first_changed = {"crush": position, "baseline": old, "candidate": new}
+        if first_changed is not None:
+            sessions.append({
+                "session_id": session_id,
+                "satisfaction_delta": after["total_satisfaction"] - before["total_satisfaction"],
+                "first_changed": first_changed,
+            })
+    sessions.sort(key=lambda session: abs(session["satisfaction_delta"]), reverse=True)
+    return {
+        "sessions": len(shared),
+        "only_in_baseline": len(baseline) - len(shared),
+        "only_in_candidate": sum(session_id not in baseline for session_id in candidate),
+        "errors": errors,
+        "changed_sessions": len(sessions),
+        "crushes": crushes,
+        "changed_crushes": changed_crushes,
+        "fields": fields,
+        "total_satisfaction": {"baseline": totals[0], "candidate": totals[1], "delta": totals[1] - totals[0]},
+        "objects": {object_id: stats for object_id, stats in sorted(objects.items()) if stats["changed"]},
+        "largest_changes": sessions[:largest],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="replay recordings and write their outcomes")
+    replay_parser.add_argument("recordings", nargs="+", help="recording files or SESSION_RECORD_DIR directories")
+    replay_parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="catalog file to replay against")
+    replay_parser.add_argument("--processes", type=int, help="worker processes, 1 to replay in this process")
+    replay_parser.add_argument("--output", help="write results as NDJSON to this file")
+    diff_parser = commands.add_parser("diff", help="compare two replay result files")
+    diff_parser.add_argument("baseline")
+    diff_parser.add_argument("candidate")
+    diff_parser.add_argument("--output", help="write the diff to this JSON file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        report = diff(read_results(args.baseline), read_results(args.candidate))
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump(report, output, indent=2)
+        else:
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        return
+
+    recordings = list(read_recordings(recording_files(args.recordings)).values())
+    objects = load_objects(args.catalog)
+    started = time.perf_counter()
+    results = replay(recordings, objects, args.processes)
+    elapsed = time.perf_counter() - started
+    if args.output:
+        write_results(args.output, results)
+
+    recorded = sum(recording.duration for recording in recordings)
+    version = Catalog(objects).version
+    print(f"sessions        {len(recordings):9d}")
+    print(f"crushes         {sum(len(recording) for recording in recordings):9d}")
+    print(f"errors          {sum('error' in result for result in results):9d}")
+    print(f"other catalogs  {sum(recording.catalog_version != version for recording in recordings):9d}")
+    print(f"recorded        {recorded:9.1f} s")
+    print(f"replayed in     {elapsed:9.1f} s ({recorded / elapsed if elapsed else 0:.0f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional
+
+from session_backend import (
+    DOCUMENT_ONLY_FIELDS,
+    SessionBackend,
+    WriteBehindBuffer,
+    apply_idempotency,
+    build_update,
+    session_from_document,
+    session_to_document,
+)
+from session_store import SessionStore
+
+
+class LeaseBusy(Exception):
+    """Another worker currently owns the session"""
+
+
+class LeaseLost(Exception):
+    """Our lease expired and another worker took the session over"""
+
+
+class SqliteLeaseStore:
+    """Shared session store in a local SQLite file
+
+    Stands in for a shared database when all workers run on one machine.
+    Every state change runs in a BEGIN IMMEDIATE transaction, so lease checks
+    and updates are atomic across processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                fields TEXT NOT NULL,
+                total_satisfaction INTEGER NOT NULL DEFAULT 0,
+                total_crushed INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                position INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                object_id TEXT NOT NULL,
+                count INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS runs_by_session ON runs (session_id, position);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        return conn
+
+    def create(self, document: dict):
+        fields = {key: value for key, value in document.items()
+                  if key not in DOCUMENT_ONLY_FIELDS and key != "total_satisfaction"}
+        conn = self._transaction()
+        try:
+            conn.execute(
+                "INSERT INTO sessions (id, fields, total_satisfaction, total_crushed) VALUES (?, ?, ?, ?)",
+                (document["_id"], json.dumps(fields), document.get("total_satisfaction", 0), document["total_crushed"]),
+            )
+            conn.executemany(
+                "INSERT INTO runs (session_id, object_id, count) VALUES (?, ?, ?)",
+                [(document["_id"], object_id, count) for object_id, count in document["runs"]],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self, session_id: str, owner: str, ttl: float) -> Optional[int]:
+        """Take the lease and return the session version, or None if the session does not exist"""
+        now = time.time()
+        conn = self._transaction()
+        try:
+            row = conn.execute(
+                "SELECT owner, lease_until, version FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            current_owner, lease_until, version = row
+            if current_owner not in (None, owner) and lease_until > now:
+                raise LeaseBusy(session_id)
+            conn.execute(
+                "UPDATE sessions SET owner = ?, lease_until = ? WHERE id = ?", (owner, now + ttl, session_id)
+            )
+            return version
+        finally:
+            conn.execute("COMMIT")
+
+    def version(self, session_id: str) -> Optional[int]:
+        row = self._conn().execute("SELECT version FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str) -> Optional[dict]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT fields, total_satisfaction, total_crushed, version FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        fields, total_satisfaction, total_crushed, version = row
+        runs = conn.execute(
+            "SELECT object_id, count FROM runs WHERE session_id = ? ORDER BY position", (session_id,)
+        ).fetchall()
+        return {
+            **json.loads(fields),
+            "_id": session_id,
+            "total_satisfaction": total_satisfaction,
+            "total_crushed": total_crushed,
+            "runs": [list(run) for run in runs],
+            "version": version,
+        }
+
+    def commit(self, session_id: str, owner: str, entry: dict) -> int:
+        """Apply a buffered entry while holding the lease; returns the new version"""
+        conn = self._transaction()
+        try:
+            row = conn.execute(
+                "SELECT owner, fields, version FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None or row[0] != owner:
+                raise LeaseLost(session_id)
+            fields = json.loads(row[1])
+            fields.update(entry["set"])
+            if entry["idempotency"]:
+                apply_idempotency(fields, entry["idempotency"])
+            version = row[2] + 1
+            conn.execute(
+                "UPDATE sessions SET fields = ?, total_satisfaction = total_satisfaction + ?, "
+                "total_crushed = total_crushed + ?, version = ? WHERE id = ?",
+                (json.dumps(fields), entry["satisfaction"], entry["crushed"], version, session_id),
+            )
+            conn.executemany(
+                "INSERT INTO runs (session_id, object_id, count) VALUES (?, ?, ?)",
+                [(session_id, object_id, count) for object_id, count in entry["runs"]],
+            )
+            conn.execute("COMMIT")
+            return version
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release(self, session_id: str, owner: str):
+        self._conn().execute(
+            "UPDATE sessions SET owner = NULL, lease_until = 0 WHERE id = ? AND owner = ?", (session_id, owner)
+        )
+
+
+class MongoLeaseStore:
+    """Shared session store in a MongoDB collection, using the same documents as MongoSessionBackend"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def create(self, document: dict):
+        self.collection.insert_one({**document, "owner": None, "lease_until": 0, "version": 0})
+
+    def acquire(self, session_id: str, owner: str, ttl: float) -> Optional[int]:
+        from pymongo import ReturnDocument
+
+        now = time.time()
+        document = self.collection.find_one_and_update(
+            {"_id": session_id, "$or": [{"owner": owner}, {"owner": None}, {"lease_until": {"$lt": now}}]},
+            {"$set": {"owner": owner, "lease_until": now + ttl}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is not None:
+            return document.get("version", 0)
+        if self.collection.find_one({"_id": session_id}, {"_id": 1}) is not None:
+            raise LeaseBusy(session_id)
+        return None
+
+    def version(self, session_id: str) -> Optional[int]:
+        document = self.collection.find_one({"_id": session_id}, {"version": 1})
+        return document.get("version", 0) if document else None
+
+    def load(self, session_id: str) -> Optional[dict]:
+        return self.collection.find_one({"_id": session_id})
+
+    def commit(self, session_id: str, owner: str, entry: dict) -> int:
+        from pymongo import ReturnDocument
+
+        update = build_update(entry)
+        update.setdefault("$inc", {})["version"] = 1
+        document = self.collection.find_one_and_update(
+            {"_id": session_id, "owner": owner}, update,
+            projection={"version": 1}, return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            raise LeaseLost(session_id)
+        return document["version"]
+
+    def release(self, session_id: str, owner: str):
+        self.collection.update_one({"_id": session_id, "owner": owner}, {"$set": {"owner": None, "lease_until": 0}})
+
+
+class SharedSessionBackend(SessionBackend):
+    """Session state shared by several worker processes, with one writer per session at a time
+
+    Mutations happen inside session(), which takes a short lease on the
+    session in the shared store, runs the request, commits the buffered
+    changes as increments and releases the lease. A worker that finds the
+    lease held elsewhere retries until acquire_timeout, then gives up with
+    LeaseBusy. Leases expire after lease_ttl so a crashed worker cannot
+    block a session forever.
+
+    The local SessionStore caches sessions together with the version they
+    were loaded at; a session is only reloaded when another worker has
+    committed since. Versions are forgotten with the cached session, when
+    the store evicts it or it ends.
+    """
+
+    def __init__(
+        self,
+        lease_store,
+        store: SessionStore,
+        get_catalog: Callable,
+        lease_ttl: float = 5.0,
+        acquire_timeout: float = 2.0,
+        worker_id: Optional[str] = None,
+    ):
+        super().__init__(store)
+        self.lease_store = lease_store
+        self.get_catalog = get_catalog
+        self.lease_ttl = lease_ttl
+        self.acquire_timeout = acquire_timeout
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.buffer = WriteBehindBuffer()
+        self._versions: Dict[str, int] = {}
+        store.evict_listeners.append(self._forget)
+
+    def _forget(self, session_id: str):
+        self._versions.pop(session_id, None)
+
+    @classmethod
+    def from_url(cls, url: str, store: SessionStore, get_catalog: Callable, **kwargs):
+        if url.startswith("sqlite:///"):
+            lease_store = SqliteLeaseStore(url[len("sqlite:///"):])
+        else:
+            from pymongo import MongoClient
+
+            collection = MongoClient(url).get_default_database("crush_simulator")["sessions"]
+            lease_store = MongoLeaseStore(collection)
+        return cls(lease_store, store, get_catalog, **kwargs)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _load(self, session_id: str, version: int) -> Optional[dict]:
+        if self._versions.get(session_id) == version:
+            session = self.store.get(session_id)
+            if session is not None:
+                return session
+        document = await self._run(self.lease_store.load, session_id)
+        if document is None:
+            return None
+        session = session_from_document(document, self.get_catalog())
+        # Ended sessions are read straight from the shared store, not cached as live ones
+        if session.get("active", True):
+            self.store.add(session_id, session)
+            self._versions[session_id] = version
+        return session
+
+    async def _acquire(self, session_id: str) -> Optional[int]:
+        deadline = time.monotonic() + self.acquire_timeout
+        delay = 0.002
+        while True:
+            try:
+                return await self._run(self.lease_store.acquire, session_id, self.worker_id, self.lease_ttl)
+            except LeaseBusy:
+                if time.monotonic() + delay > deadline:
+                    raise
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+    async def create(self, session_id: str, session: dict):
+        document = session_to_document(session_id, session, self.get_catalog())
+        await self._run(self.lease_store.create, document)
+        self.store.add(session_id, session)
+        self._versions[session_id] = 0
+
+    async def get(self, session_id: str) -> Optional[dict]:
+        """Read-only snapshot, reloaded if another worker has changed it"""
+        version = await self._run(self.lease_store.version, session_id)
+        if version is None:
+            return None
+        return await self._load(session_id, version)
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[Optional[dict]]:
+        async with self.lock(session_id):
+            version = await self._acquire(session_id)
+            if version is None:
+                yield None
+                return
+            try:
+                session = await self._load(session_id, version)
+                try:
+                    yield session
+                except BaseException:
+                    # The cached copy may be half-updated; reload it next time
+                    self.buffer.pop(session_id)
+                    self._versions.pop(session_id, None)
+                    raise
+                entry = self.buffer.pop(session_id)
+                if entry is not None:
+                    try:
+                        committed = await self._run(self.lease_store.commit, session_id, self.worker_id, entry)
+                    except BaseException:
+                        self._versions.pop(session_id, None)
+                        raise
+                    # Unless the store evicted the session while the commit ran
+                    if session_id in self.store:
+                        self._versions[session_id] = committed
+            finally:
+                await self._run(self.lease_store.release, session_id, self.worker_id)
+
+    async def record_crush(self, session_id: str, object_id: str, satisfaction: int):
+        self.buffer.add_crush(session_id, object_id, satisfaction)
+
+    async def record_idempotency(self, session_id: str, changes: dict):
+        self.buffer.set_idempotency(session_id, changes)
+
+    async def end(self, session_id: str) -> Optional[dict]:
+        session = self.store.end(session_id)
+        self._forget(session_id)
+        if session is not None:
+            self.buffer.set_fields(session_id, {"active": False, "ended_at": session.get("ended_at")})
+        return session
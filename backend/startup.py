@@ -0,0 +1,163 @@
+"""Startup timing and readiness for the API process
+
+    python startup.py [--top 20] [--output profile.json]
+
+runs a fresh interpreter that imports server with -X importtime and goes
+through the app's lifespan until every subsystem is ready, then reports
+import time per module that server imports and the time of each
+initialization phase. server imports this module, so it keeps its own
+imports to what the server needs.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, List, Optional
+
+
+class StartupProfile:
+    """Wall time of named initialization phases, in the order they ran"""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.phases[name] = self._clock() - started
+
+    def report(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+
+
+class Readiness:
+    """Subsystems warming up in the background after the server starts accepting requests
+
+    track() runs a warm-up as a task and times it into profile. The process
+    is ready once every tracked warm-up has finished; one that raised is
+    reported as failed and keeps the process unready.
+    """
+
+    def __init__(self, profile: Optional[StartupProfile] = None):
+        self.profile = profile or StartupProfile()
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    def track(self, name: str, warm_up: Awaitable) -> asyncio.Task:
+        async def timed():
+            with self.profile.phase(f"warm_up:{name}"):
+                await warm_up
+        task = self.tasks[name] = asyncio.create_task(timed())
+        return task
+
+    def state(self, name: str) -> str:
+        task = self.tasks[name]
+        if not task.done():
+            return "starting"
+        return "failed" if task.cancelled() or task.exception() is not None else "ready"
+
+    @property
+    def ready(self) -> bool:
+        return all(self.state(name) == "ready" for name in self.tasks)
+
+    async def wait(self):
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "subsystems": {name: self.state(name) for name in self.tasks},
+            "startup_ms": self.profile.report(),
+        }
+
+
+# Run in the child interpreter: import server, then start and stop its lifespan
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def main():
+    async with server.app.router.lifespan_context(server.app):
+        await server.readiness.wait()
+        return time.perf_counter()
+
+ready = asyncio.run(main())
+print(json.dumps({
+    "import_ms": round((imported - started) * 1000, 3),
+    "ready_ms": round((ready - started) * 1000, 3),
+    "status": server.readiness.status(),
+}))
+"""
+
+
+def parse_importtime(lines: List[str], parent: str = "server") -> Dict[str, dict]:
+    """Self and cumulative import time, in ms, of the modules imported directly by parent"""
+    modules = {}
+    depth = None
+    # -X importtime lists children before their parent, so walk it backwards
+    for line in reversed(lines):
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth is None:
+            if name == parent:
+                depth = level
+            continue
+        if level <= depth:
+            break
+        if level == depth + 1:
+            modules[name] = {"self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000}
+    return modules
+
+
+def profile(python: str = sys.executable) -> dict:
+    import os
+    import subprocess
+
+    child = subprocess.run(
+        [python, "-X", "importtime", "-c", CHILD], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(child.stderr.splitlines())
+    return result
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=20, help="slowest imports to list")
+    parser.add_argument("--output", help="write the profile to this JSON file")
+    args = parser.parse_args(argv)
+
+    result = profile()
+    print(f"import server   {result['import_ms']:9.1f} ms")
+    print(f"ready           {result['ready_ms']:9.1f} ms")
+    print("\nslowest imports (cumulative ms)")
+    imports = sorted(result["imports"].items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)
+    for name, times in imports[:args.top]:
+        print(f"  {name:32} {times['cumulative_ms']:9.1f}")
+    print("\ninitialization phases (ms)")
+    for name, ms in result["status"]["startup_ms"].items():
+        print(f"  {name:32} {ms:9.1f}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Alternative encodings for crush results and session stats
+
+Clients pick an encoding with the Accept header:
+
+    application/json                 the full results (default)
+    application/vnd.crush.slim+json  results that reference objects by id only
+    application/vnd.crush.struct     a fixed little-endian struct layout
+
+Slim JSON drops the object dict and the fields copied from it (particles,
+sound, vibration, animation_duration); clients already have those from
+/api/objects. The struct layout refers to objects by their catalog code,
+the "code" field /api/objects gives each object, and carries
+particle bursts as raw float32 rows instead of base64. Every struct body
+starts with a one byte kind (b"C" crush, b"B" batch, b"S" stats) and a
+format version byte:
+
+    crush   FRAME RESULT burst
+    batch   FRAME BATCH (RESULT burst) * crushed
+    stats   FRAME STATS (code u16, count u32) * objects, code u16 * recent
+
+where burst is the RESULT's particle count of BURST_FIELDS float32 rows.
+"""
+
+import base64
+import struct
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+
+from crush_engine import BURST_FIELDS
+from response_cache import encode_json
+
+JSON = "application/json"
+SLIM_JSON = "application/vnd.crush.slim+json"
+STRUCT = "application/vnd.crush.struct"
+MEDIA_TYPES = (JSON, SLIM_JSON, STRUCT)
+
+VERSION = 1
+FRAME = struct.Struct("<cB")
+# code, satisfaction_gained, force_applied, deformation, stage index, fractured, particles
+RESULT = struct.Struct("<HiffBBH")
+# Largest float32; forces beyond it are packed as it
+FLOAT32_MAX = 3.4028234663852886e38
+# crushed, satisfaction_gained, total_satisfaction
+BATCH = struct.Struct("<Iqq")
+# total_crushed, total_satisfaction, session_duration, objects, recent
+STATS = struct.Struct("<qqqHH")
+OBJECT_COUNT = struct.Struct("<HI")
+
+# Result fields that repeat what /api/objects already says about the object
+OBJECT_FIELDS = ("object", "particles", "sound", "vibration", "animation_duration")
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """The supported media type the client prefers, JSON when it has no preference"""
+    if not accept:
+        return JSON
+    best, best_q = JSON, 0.0
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        media_type = media_type.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        if media_type in MEDIA_TYPES and q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def slim_result(result: dict) -> dict:
+    slim = {"object_id": result["object"]["id"]}
+    slim.update((key, value) for key, value in result.items() if key not in OBJECT_FIELDS)
+    return slim
+
+
+def slim_batch(batch: dict) -> dict:
+    return {**batch, "results": [slim_result(result) for result in batch["results"]]}
+
+
+def _pack_result(parts: List[bytes], codes, result: dict):
+    simulation = result["simulation"]
+    burst = simulation["burst"]
+    force = min(max(result["force_applied"], -FLOAT32_MAX), FLOAT32_MAX)
+    parts.append(RESULT.pack(
+        codes[result["object"]["id"]], result["satisfaction_gained"], force,
+        simulation["deformation"], len(simulation["stages"]) - 1, simulation["fractured"], burst["count"],
+    ))
+    parts.append(base64.b64decode(burst["data"]))
+
+
+def pack_result(codes, result: dict) -> bytes:
+    parts = [FRAME.pack(b"C", VERSION)]
+    _pack_result(parts, codes, result)
+    return b"".join(parts)
+
+
+def pack_batch(codes, batch: dict) -> bytes:
+    parts = [FRAME.pack(b"B", VERSION),
+             BATCH.pack(batch["crushed"], batch["satisfaction_gained"], batch["total_satisfaction"])]
+    for result in batch["results"]:
+        _pack_result(parts, codes, result)
+    return b"".join(parts)
+
+
+def pack_stats(codes, stats: dict) -> bytes:
+    objects = stats["objects_crushed"]
+    recent = stats["recent_objects"]
+    parts = [FRAME.pack(b"S", VERSION), STATS.pack(
+        stats["total_crushed"], stats["total_satisfaction"], stats["session_duration"], len(objects), len(recent),
+    )]
+    parts.extend(OBJECT_COUNT.pack(codes[object_id], count) for object_id, count in objects.items())
+    parts.append(struct.pack(f"<{len(recent)}H", *(codes[object_id] for object_id in recent)))
+    return b"".join(parts)
+
+
+def _unpack_result(body: bytes, offset: int) -> Tuple[dict, int]:
+    code, gained, force, deformation, stage, fractured, count = RESULT.unpack_from(body, offset)
+    offset += RESULT.size
+    end = offset + count * BURST_FIELDS * 4
+    result = {
+        "code": code, "satisfaction_gained": gained, "force_applied": force, "deformation": deformation,
+        "stage": stage, "fractured": bool(fractured), "particles": count, "burst": body[offset:end],
+    }
+    return result, end
+
+
+def unpack(body: bytes) -> dict:
+    """Decode a struct body, keeping objects as codes and bursts as raw float32 bytes"""
+    kind, version = FRAME.unpack_from(body)
+    if version != VERSION:
+        raise ValueError(f"Unsupported wire format version {version}")
+    offset = FRAME.size
+    if kind == b"C":
+        result, _ = _unpack_result(body, offset)
+        return result
+    if kind == b"B":
+        crushed, gained, total = BATCH.unpack_from(body, offset)
+        offset += BATCH.size
+        results = []
+        for _ in range(crushed):
+            result, offset = _unpack_result(body, offset)
+            results.append(result)
+        return {"results": results, "crushed": crushed, "satisfaction_gained": gained, "total_satisfaction": total}
+    if kind == b"S":
+        total_crushed, total_satisfaction, duration, objects, recent = STATS.unpack_from(body, offset)
+        offset += STATS.size
+        counts = {}
+        for _ in range(objects):
+            code, count = OBJECT_COUNT.unpack_from(body, offset)
+            counts[code] = count
+            offset += OBJECT_COUNT.size
+        return {
+            "total_crushed": total_crushed,
+            "total_satisfaction": total_satisfaction,
+            "objects_crushed": counts,
+            "recent_objects": list(struct.unpack_from(f"<{recent}H", body, offset)),
+            "session_duration": duration,
+        }
+    raise ValueError(f"Unknown wire format kind {kind!r}")
+
+
+# Kind -> (slim JSON encoder, struct encoder); stats only ever name objects by id
+ENCODERS: Dict[str, Tuple[Callable, Callable]] = {
+    "crush": (slim_result, pack_result),
+    "batch": (slim_batch, pack_batch),
+    "stats": (lambda stats: stats, pack_stats),
+}
+
+
+def respond(request: Request, response: Response, kind: str, payload: dict, codes):
+    """Encode payload in the media type the request asked for
+
+    The result is a Response carrying response's headers. Full JSON comes
+    out byte for byte as FastAPI would encode it, but
+    without jsonable_encoder walking every value of the payload in Python
+    first: payloads here only hold JSON types already, and for a large
+    batch that walk took most of the request's time on the event loop.
+    """
+    media_type = negotiate(request.headers.get("accept"))
+    response.headers["Vary"] = "Accept"
+    if media_type == JSON:
+        body = encode_json(payload)
+    else:
+        slim, pack = ENCODERS[kind]
+        body = encode_json(slim(payload)) if media_type == SLIM_JSON else pack(codes, payload)
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(body, media_type=media_type, headers=headers)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Asset Manifest Testing for Crush Simulator
+Checks content hashes, difficulty tier bundles and change detection of the
+asset manifest, Range header parsing, and the caching and range handling of
+the asset routes on a server with its own ASSETS_DIR, which keep serving
+the bytes that were hashed when a file changes on disk. Starts its own
+server, no live server needed.
+"""
+
+import asyncio
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from assets import AssetStore, RangeNotSatisfiable, parse_range
+from catalog import Catalog
+from server import crush_objects
+
+catalog = Catalog(crush_objects)
+PORT = 8014
+# Sounds left out to check that missing files are listed
+MISSING = "electronics_crush.mp3"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def write_sounds(directory):
+    """A stand-in file of a different size for every catalog sound but MISSING"""
+    os.makedirs(directory, exist_ok=True)
+    for i, obj in enumerate(crush_objects):
+        if obj["sound"] != MISSING:
+            with open(os.path.join(directory, obj["sound"]), "wb") as sound:
+                sound.write(os.urandom(4000 + 1000 * i))
+
+
+def read(directory, name):
+    with open(os.path.join(directory, name), "rb") as sound:
+        return sound.read()
+
+
+async def test_manifest(directory):
+    """Test digests, tier bundles, missing sounds and rebuilding when a sound changes"""
+    print("🧪 Testing Asset Manifest")
+
+    sounds = os.path.join(directory, "manifest")
+    write_sounds(sounds)
+    clock = FakeClock()
+    store = AssetStore(sounds, recheck_interval=5, clock=clock)
+    manifest = await store.manifest(catalog)
+    payload = manifest.payload
+
+    digests_ok = all(
+        sound["digest"] == hashlib.blake2b(read(sounds, name), digest_size=8).hexdigest()
+        and sound["url"] == f"/api/assets/{sound['digest']}/{name}"
+        for name, sound in payload["sounds"].items()
+    )
+    difficulties = [tier["difficulty"] for tier in payload["tiers"]]
+    bundled = []
+    bundles_ok = True
+    for tier in payload["tiers"]:
+        if "bundle" not in tier:
+            continue
+        data = store.bundle(tier["bundle"]["digest"]).data
+        for name, (offset, length) in tier["bundle"]["members"].items():
+            bundled.append(name)
+            bundles_ok &= data[offset:offset + length] == read(sounds, name)
+            bundles_ok &= payload["objects"][next(
+                obj_id for obj_id, obj in payload["objects"].items() if obj["sound"] == name
+            )]["difficulty"] == tier["difficulty"]
+    each_once = sorted(bundled) == sorted(payload["sounds"])
+    patterns_ok = all(payload["objects"][obj["id"]]["vibration_pattern"] == obj["vibration_pattern"]
+                      for obj in crush_objects)
+
+    same = await store.manifest(catalog)
+    changed_name = crush_objects[0]["sound"]
+    with open(os.path.join(sounds, changed_name), "ab") as sound:
+        sound.write(b"remastered")
+    before_recheck = await store.manifest(catalog)
+    clock.now += 10
+    rebuilt = await store.manifest(catalog)
+    new_digest = rebuilt.payload["sounds"][changed_name]["digest"]
+    old_digest = payload["sounds"][changed_name]["digest"]
+
+    print(f"✅ Digests and URLs match the files: {digests_ok}")
+    print(f"✅ Tiers {difficulties}, every sound in one bundle at its offset: {each_once and bundles_ok}")
+    print(f"✅ Vibration patterns from the catalog: {patterns_ok}; missing: {payload['missing']}")
+    print(f"✅ Changed sound rehashed after the recheck interval: {old_digest} -> {new_digest}")
+    if (digests_ok and difficulties == sorted(difficulties) and each_once and bundles_ok and patterns_ok and
+            payload["missing"] == [MISSING] and same is manifest and before_recheck is manifest and
+            new_digest != old_digest and store.asset(old_digest) is None and store.asset(new_digest) is not None):
+        print("✅ Asset manifest: PASS")
+    else:
+        print("❌ Asset manifest: FAIL")
+
+
+def test_range_parsing():
+    """Test single, open-ended, suffix, ignored and unsatisfiable ranges"""
+    print("\n🧪 Testing Range Parsing")
+
+    cases = {
+        "bytes=0-99": (0, 100),
+        "bytes=100-": (100, 1000),
+        "bytes=-100": (900, 1000),
+        "bytes=-5000": (0, 1000),
+        "bytes=900-5000": (900, 1000),
+        "bytes=0-1,5-6": None,
+        "items=0-1": None,
+        "bytes=abc-": None,
+        "bytes=5-1": None,
+        None: None,
+    }
+    parsed = {header: parse_range(header, 1000) for header in cases}
+    unsatisfiable = []
+    for header in ("bytes=1000-", "bytes=2000-3000", "bytes=-0"):
+        try:
+            parse_range(header, 1000)
+        except RangeNotSatisfiable:
+            unsatisfiable.append(header)
+
+    wrong = {header: span for header, span in parsed.items() if span != cases[header]}
+    print(f"✅ Parsed as expected: {len(cases) - len(wrong)}/{len(cases)}")
+    print(f"✅ Unsatisfiable: {unsatisfiable}")
+    if not wrong and len(unsatisfiable) == 3:
+        print("✅ Range parsing: PASS")
+    else:
+        print(f"❌ Range parsing: FAIL {wrong}")
+
+
+def test_serving(directory):
+    """Test immutable caching, ranges, conditional requests and bundles over HTTP"""
+    print("\n🧪 Testing Asset Serving")
+
+    sounds = os.path.join(directory, "server")
+    write_sounds(sounds)
+    env = dict(os.environ, ASSETS_DIR=sounds, ASSETS_RECHECK_INTERVAL="60",
+               CATALOG_WATCH_INTERVAL="0", RATE_LIMITS="off")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(PORT)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://localhost:{PORT}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{base_url}/api/", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        response = requests.get(f"{base_url}/api/assets/manifest")
+        manifest = response.json()
+        preload = response.headers.get("link", "")
+        name, sound = next(iter(manifest["sounds"].items()))
+        url = base_url + sound["url"]
+        data = read(sounds, name)
+        etag = f'"{sound["digest"]}"'
+
+        whole = requests.get(url)
+        partial = requests.get(url, headers={"Range": "bytes=100-199"})
+        suffix = requests.get(url, headers={"Range": "bytes=-10"})
+        past_end = requests.get(url, headers={"Range": f"bytes={len(data)}-"})
+        not_modified = requests.get(url, headers={"If-None-Match": etag})
+        other_version = requests.get(url, headers={"Range": "bytes=0-9", "If-Range": '"0000"'})
+        head = requests.head(url)
+        unknown = requests.get(f"{base_url}/api/assets/{'0' * 16}/{name}")
+        renamed = requests.get(f"{base_url}/api/assets/{sound['digest']}/other.mp3")
+
+        tier = next(tier for tier in manifest["tiers"] if "bundle" in tier)
+        bundle = requests.get(base_url + tier["bundle"]["url"]).content
+        bundle_ok = all(bundle[offset:offset + length] == read(sounds, member)
+                        for member, (offset, length) in tier["bundle"]["members"].items())
+
+        # Until the manifest is rebuilt, a changed file still serves the bytes its URL names
+        with open(os.path.join(sounds, name), "wb") as rewritten:
+            rewritten.write(b"shorter")
+        changed = requests.get(url)
+        changed_ok = (changed.content == data and changed.headers["content-length"] == str(len(data)) and
+                      hashlib.blake2b(changed.content, digest_size=8).hexdigest() == sound["digest"])
+
+        whole_ok = (whole.content == data and whole.headers["cache-control"] == "public, max-age=31536000, immutable"
+                    and whole.headers["etag"] == etag and whole.headers["accept-ranges"] == "bytes")
+        partial_ok = (partial.status_code == 206 and partial.content == data[100:200] and
+                      partial.headers["content-range"] == f"bytes 100-199/{len(data)}" and
+                      suffix.status_code == 206 and suffix.content == data[-10:])
+        conditional_ok = (past_end.status_code == 416 and past_end.headers["content-range"] == f"bytes */{len(data)}"
+                          and not_modified.status_code == 304 and other_version.status_code == 200
+                          and other_version.content == data)
+        head_ok = head.status_code == 200 and head.headers["content-length"] == str(len(data)) and not head.content
+
+        print(f"✅ Whole file with immutable caching headers: {whole_ok}")
+        print(f"✅ Byte ranges: {partial.status_code}, {suffix.status_code}; past the end: {past_end.status_code}")
+        print(f"✅ If-None-Match: {not_modified.status_code}; stale If-Range: {other_version.status_code}; "
+              f"HEAD: {head_ok}")
+        print(f"✅ Unknown digest: {unknown.status_code}; wrong name: {renamed.status_code}")
+        print(f"✅ Bundle members match their files: {bundle_ok}; preload: {preload}")
+        print(f"✅ File changed on disk still served as hashed: {changed_ok}")
+        if (whole_ok and partial_ok and conditional_ok and head_ok and unknown.status_code == 404 and
+                renamed.status_code == 404 and bundle_ok and changed_ok and
+                manifest["tiers"][0]["bundle"]["url"] in preload):
+            print("✅ Asset serving: PASS")
+        else:
+            print("❌ Asset serving: FAIL")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(test_manifest(directory))
+        test_range_parsing()
+        test_serving(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+File-Backed Catalog Testing for Crush Simulator
+Loads catalogs from JSON and YAML files, checks schema validation and code
+stability across versions, and reloads a watched file, no live server needed.
+"""
+
+import asyncio
+import copy
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from catalog import Catalog, CatalogError
+from catalog_source import CatalogWatcher, load_catalog, load_objects
+from crush_history import CrushHistory
+from server import crush_objects
+from session_backend import session_from_document, session_to_document
+
+try:
+    import yaml
+except ImportError:  # YAML catalogs are only checked when PyYAML is installed
+    yaml = None
+
+
+def write_catalog(path, objects):
+    """Replace the catalog file atomically, as an editor or deploy script should"""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as catalog_file:
+        if path.endswith(".yaml"):
+            yaml.safe_dump({"objects": objects}, catalog_file)
+        else:
+            json.dump({"objects": objects}, catalog_file)
+    os.replace(temporary, path)
+
+
+def test_validation(directory):
+    """Test that catalog files are checked against the schema"""
+    print("🧪 Testing Catalog Validation")
+
+    path = os.path.join(directory, "objects.json")
+    invalid = {
+        "missing field": [{key: value for key, value in crush_objects[0].items() if key != "sound"}],
+        "unknown field": [{**crush_objects[0], "colour": "red"}],
+        "wrong type": [{**crush_objects[0], "difficulty": "1"}],
+        "negative score": [{**crush_objects[0], "satisfaction_score": -1}],
+        "duplicate id": [crush_objects[0], {**crush_objects[1], "id": crush_objects[0]["id"]}],
+        "duplicate code": [crush_objects[0], {**crush_objects[1], "code": crush_objects[0]["code"]}],
+        "empty": [],
+        "all retired": [{**crush_objects[0], "retired": True}],
+    }
+    rejected = []
+    for name, objects in invalid.items():
+        write_catalog(path, objects)
+        try:
+            load_catalog(path)
+        except CatalogError:
+            rejected.append(name)
+    with open(path, "w") as catalog_file:
+        catalog_file.write('{"objects": [')
+    try:
+        load_catalog(path)
+    except CatalogError:
+        rejected.append("truncated")
+
+    write_catalog(path, crush_objects)
+    loaded = load_objects(path)
+    same = loaded == crush_objects and load_catalog(path).version == Catalog(crush_objects).version
+    yaml_ok = True
+    if yaml is not None:
+        yaml_path = os.path.join(directory, "objects.yaml")
+        write_catalog(yaml_path, crush_objects)
+        yaml_ok = load_objects(yaml_path) == crush_objects
+
+    # A restart only has the file to go on for retired objects
+    write_catalog(path, crush_objects[1:] + [{**crush_objects[0], "retired": True}])
+    restarted = load_catalog(path)
+    code = crush_objects[0]["code"]
+    retired_ok = (crush_objects[0]["id"] not in restarted and restarted.object_for_code(code)["id"] == crush_objects[0]["id"]
+                  and list(restarted.retired) == [code] and restarted.version == Catalog(crush_objects[1:]).version)
+
+    print(f"✅ Invalid catalogs rejected: {len(rejected)}/{len(invalid) + 1}")
+    print(f"✅ JSON and YAML load the shipped objects: {same and yaml_ok}")
+    print(f"✅ Retired object read back from the file, out of service but decodable: {retired_ok}")
+    if len(rejected) == len(invalid) + 1 and same and yaml_ok and retired_ok:
+        print("✅ Catalog validation: PASS")
+    else:
+        print(f"❌ Catalog validation: FAIL (accepted {sorted(set(invalid) | {'truncated'} - set(rejected))})")
+
+
+def test_code_stability():
+    """Test that codes survive new versions and histories keep retired objects"""
+    print("\n🧪 Testing Code Stability")
+
+    first = Catalog(crush_objects)
+    changed = copy.deepcopy(crush_objects[1:])
+    changed[0]["satisfaction_score"] += 1
+    changed.append({**crush_objects[0], "id": "paint_can", "name": "Paint Can", "code": 9})
+    changed.append({**crush_objects[0], "retired": True})
+    second = Catalog(changed, previous=first)
+    # What the same data loads as after a restart, with no previous version to compare against
+    restarted = Catalog(changed)
+
+    removed = crush_objects[0]["id"]
+    kept = crush_objects[2]["id"]
+    stable = all(second.codes[obj["id"]] == first.codes[obj["id"]] for obj in crush_objects)
+    reused = second.get(kept) is first.get(kept) and second.get(crush_objects[1]["id"]) is not first.get(crush_objects[1]["id"])
+    retired = removed not in second and second.object_for_code(first.codes[removed])["id"] == removed
+
+    history = CrushHistory([first.codes[removed], first.codes[kept]])
+    session = session_from_document(session_to_document("s1", {"history": history}, second), restarted)
+    history_ok = [restarted.object_for_code(code)["id"] for code in session["history"].slice(0, 10)] == [removed, kept]
+
+    conflicts = []
+    for name, objects in {
+        "code changed": [{**crush_objects[0], "code": 40}] + crush_objects[1:],
+        "code reused": changed[:-1] + [{**crush_objects[0], "id": "new_object"}],
+        "dropped instead of retired": changed[:-1],
+    }.items():
+        try:
+            Catalog(objects, previous=second)
+        except CatalogError:
+            conflicts.append(name)
+
+    print(f"✅ Codes unchanged across versions: {stable}")
+    print(f"✅ Unchanged objects reused, changed ones replaced: {reused}")
+    print(f"✅ Retired object out of service and still in histories after a restart: {retired and history_ok}")
+    print(f"✅ Conflicting versions rejected: {conflicts}")
+    if stable and reused and retired and history_ok and len(conflicts) == 3 and first.version != second.version:
+        print("✅ Code stability: PASS")
+    else:
+        print("❌ Code stability: FAIL")
+
+
+async def test_watcher(directory):
+    """Test that the watcher swaps in new versions and keeps the old one over a bad file"""
+    print("\n🧪 Testing Catalog Watcher")
+
+    path = os.path.join(directory, "watched.json")
+    write_catalog(path, crush_objects)
+    state = {"catalog": load_catalog(path)}
+    watcher = CatalogWatcher(path, lambda: state["catalog"], lambda catalog: state.update(catalog=catalog))
+    original = state["catalog"]
+
+    unchanged = await watcher.check()
+    write_catalog(path, crush_objects + [{**crush_objects[0], "id": "paint_can", "name": "Paint Can", "code": 5}])
+    reloaded = await watcher.check()
+    added = "paint_can" in state["catalog"] and state["catalog"].version != original.version
+
+    before_bad = state["catalog"]
+    write_catalog(path, [{**crush_objects[0], "difficulty": 0}])
+    rejected = not await watcher.check() and state["catalog"] is before_bad and watcher.errors == 1
+
+    print(f"✅ Untouched file left alone: {not unchanged}")
+    print(f"✅ Edited file installed as a new version: {reloaded and added}")
+    print(f"✅ Invalid edit ignored, previous version kept: {rejected}")
+    if not unchanged and reloaded and added and rejected:
+        print("✅ Catalog watcher: PASS")
+    else:
+        print("❌ Catalog watcher: FAIL")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        test_validation(directory)
+        test_code_stability()
+        asyncio.run(test_watcher(directory))
+
+
+if __name__ == "__main__":
+    main()
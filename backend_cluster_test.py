@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Multi-Worker Session Testing for Crush Simulator
+Checks the shared session backend: lease exclusivity between backends, what
+a busy or lost lease does to crushes over HTTP, WebSockets and auto mode,
+and exact totals when one session is hammered through several uvicorn
+workers. Starts its own server, no live server needed.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from catalog import Catalog
+from crush_history import CrushHistory
+import server
+from auto_scheduler import AutoScheduler
+from crush_channel import CrushChannel
+from server import crush_objects
+from session_backend import session_to_document
+from session_store import SessionStore
+from shared_sessions import LeaseBusy, LeaseLost, SharedSessionBackend, SqliteLeaseStore
+
+catalog = Catalog(crush_objects)
+PORT = 8011
+WORKERS = 4
+
+
+def new_session():
+    return {"user_id": None, "mode": "manual", "total_satisfaction": 0, "session_duration": 0,
+            "history": CrushHistory(), "created_at": "2024-01-01T00:00:00", "active": True}
+
+
+def make_backend(path, worker_id):
+    return SharedSessionBackend(SqliteLeaseStore(path), SessionStore(), lambda: catalog,
+                                acquire_timeout=0.05, worker_id=worker_id)
+
+
+async def crush(backend, session_id, object_id):
+    async with backend.session(session_id) as session:
+        obj = catalog.get(object_id)
+        session["history"].append(catalog.codes[object_id])
+        session["total_satisfaction"] += obj["satisfaction_score"]
+        await backend.record_crush(session_id, object_id, obj["satisfaction_score"])
+
+
+async def test_lease_exclusivity(path):
+    """Test that two workers never hold the same session at once and see each other's writes"""
+    print("🧪 Testing Lease Exclusivity")
+
+    first = make_backend(path, "worker-a")
+    second = make_backend(path, "worker-b")
+    await first.create("s1", new_session())
+
+    busy = False
+    async with first.session("s1"):
+        try:
+            async with second.session("s1"):
+                pass
+        except LeaseBusy:
+            busy = True
+
+    await crush(first, "s1", "can_aluminum")
+    await crush(second, "s1", "phone_old")
+    await crush(first, "s1", "can_aluminum")
+    session = await second.get("s1")
+    ids = [catalog.object_for_code(code)["id"] for code in session["history"].tail(10)]
+
+    # Versions leave with the sessions they belong to
+    for i in range(5):
+        await first.create(f"evicted-{i}", new_session())
+    first.store.max_size = 2
+    await first.create("s2", new_session())
+    await first.end("s1")
+    await second.end("s1")
+    cached = sorted(first._versions)
+
+    print(f"✅ Second worker refused while lease held: {busy}")
+    print(f"✅ History seen by second worker: {ids}")
+    print(f"✅ Versions cached after evictions and end: {cached}, {second._versions}")
+    if (busy and ids == ["can_aluminum", "phone_old", "can_aluminum"] and
+            cached == ["evicted-4", "s2"] and not second._versions):
+        print("✅ Lease exclusivity: PASS")
+    else:
+        print("❌ Lease exclusivity: FAIL")
+
+
+class StolenLeases(SqliteLeaseStore):
+    """A lease store where another worker always takes the session over before the commit"""
+
+    def commit(self, session_id, owner, entry):
+        raise LeaseLost(session_id)
+
+
+async def test_lost_leases(path):
+    """Test that crushes on busy or lost leases are refused cleanly and leave nothing behind"""
+    print("\n🧪 Testing Busy And Lost Leases")
+
+    backend = SharedSessionBackend(StolenLeases(path), server.sessions, lambda: server.catalog)
+    await backend.create("lost", new_session())
+    original, server.session_backend = server.session_backend, backend
+    counted = server.crush_counter.value("can_aluminum", "can")
+    queued = server.crush_analytics.queue.qsize()
+    pending = server.leaderboards.metrics()["pending"]
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            lost = await client.post("/api/session/lost/crush", json={"object_id": "can_aluminum"})
+            stats = (await client.get("/api/session/lost/stats")).json()
+    finally:
+        server.session_backend = original
+    untouched = (server.crush_counter.value("can_aluminum", "can") == counted and stats["total_crushed"] == 0 and
+                 server.crush_analytics.queue.qsize() == queued and server.leaderboards.metrics()["pending"] == pending)
+
+    # A WebSocket gets an error frame instead of the socket failing
+    class Socket:
+        sent = []
+
+        async def send_text(self, text):
+            self.sent.append(text)
+
+    async def on_crush(message):
+        raise LeaseBusy("s")
+
+    channel = CrushChannel(Socket(), on_crush)
+    await channel._crush(7, {"object_id": "can_aluminum"})
+    frame = json.loads(Socket.sent[-1])
+
+    # Auto mode tries a busy session again instead of stopping it
+    attempts = []
+
+    async def auto_crush(session_id, obj):
+        attempts.append(session_id)
+        if len(attempts) == 1:
+            raise LeaseBusy(session_id)
+        return {"result": obj["id"]}
+
+    quick = [{**obj, "crush_time": 0.01} for obj in catalog.objects]
+    scheduler = AutoScheduler(auto_crush, lambda: quick, seed=1)
+    task = asyncio.create_task(scheduler.run())
+    scheduler.start_session("auto")
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    # Ended sessions are not put back in a worker's cache of live sessions
+    other = make_backend(path + ".ended", "worker-c")
+    other.lease_store.create(session_to_document("ended", {**new_session(), "active": False}, catalog))
+    reloaded = await other.get("ended")
+
+    print(f"✅ Lost lease: {lost.status_code}, nothing recorded anywhere: {untouched}")
+    print(f"✅ Busy lease over a WebSocket: {frame}")
+    print(f"✅ Auto mode after a busy lease: {len(attempts)} attempts, still scheduled: {'auto' in scheduler}")
+    print(f"✅ Ended session read but not cached: {reloaded is not None and 'ended' not in other.store}")
+    if (lost.status_code == 503 and untouched and frame == {"type": "error", "seq": 7, "status": 503,
+                                                            "detail": "Session is busy"}
+            and len(attempts) > 2 and "auto" in scheduler and scheduler.busy == 1
+            and reloaded is not None and "ended" not in other.store):
+        print("✅ Busy and lost leases: PASS")
+    else:
+        print("❌ Busy and lost leases: FAIL")
+
+
+def test_concurrent_workers(path):
+    """Test exact totals when crushes for one session are spread over several workers"""
+    print(f"\n🧪 Testing Concurrent Crushes Across {WORKERS} Workers")
+
+    env = dict(os.environ, SESSION_BACKEND="shared", SHARED_SESSION_STORE=f"sqlite:///{path}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(PORT), "--workers", str(WORKERS)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://localhost:{PORT}/api"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{base_url}/", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        session_id = requests.post(f"{base_url}/session/start", json={"mode": "manual"}).json()["session_id"]
+        sequence = ["can_aluminum", "phone_old", "glass_bottle", "cardboard_box"] * 50
+
+        def send(object_id):
+            with requests.Session() as http:
+                return http.post(f"{base_url}/session/{session_id}/crush",
+                                 json={"object_id": object_id}, timeout=10).status_code
+
+        started = time.time()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            statuses = list(pool.map(send, sequence))
+        elapsed = time.time() - started
+
+        stats = requests.get(f"{base_url}/session/{session_id}/stats").json()
+        expected_satisfaction = sum(catalog.get(object_id)["satisfaction_score"] for object_id in sequence)
+        ok = statuses.count(200)
+
+        print(f"✅ {ok}/{len(sequence)} crushes accepted in {elapsed:.2f}s")
+        print(f"✅ Total crushed: {stats['total_crushed']} (expected {ok})")
+        print(f"✅ Total satisfaction: {stats['total_satisfaction']} (expected {expected_satisfaction})")
+        if (ok == len(sequence) and stats["total_crushed"] == len(sequence) and
+                stats["total_satisfaction"] == expected_satisfaction and
+                stats["objects_crushed"] == {object_id: 50 for object_id in set(sequence)}):
+            print("✅ Concurrent workers: PASS")
+        else:
+            print(f"❌ Concurrent workers: FAIL (statuses {set(statuses)}, stats {stats})")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(test_lease_exclusivity(os.path.join(directory, "lease.db")))
+        asyncio.run(test_lost_leases(os.path.join(directory, "lost.db")))
+        test_concurrent_workers(os.path.join(directory, "cluster.db"))
+
+
+if __name__ == "__main__":
+    main()
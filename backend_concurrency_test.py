@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Concurrency Testing for Crush Simulator
+Hammers single sessions from many concurrent clients and checks that totals
+are exact, that retried requests with an Idempotency-Key count once and
+that a batch the backend fails to record leaves nothing behind.
+Needs the live server on port 8001.
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import server
+from catalog import Catalog
+from server import crush_objects
+from session_backend import MemorySessionBackend
+from session_store import SessionStore
+
+BACKEND_URL = "http://localhost:8001"
+catalog = Catalog(crush_objects)
+CLIENTS = 16
+
+
+def start_session():
+    session_data = {"mode": "interactive", "objects_crushed": [], "total_satisfaction": 0, "session_duration": 0}
+    return requests.post(f"{BACKEND_URL}/api/session/start", json=session_data).json()["session_id"]
+
+
+def satisfaction(object_ids):
+    return sum(catalog.get(object_id)["satisfaction_score"] for object_id in object_ids)
+
+
+async def test_session_lock():
+    """Test that read-modify-writes which await part way through do not lose updates"""
+    print("🧪 Testing Per-Session Lock")
+
+    backend = MemorySessionBackend(SessionStore())
+    await backend.create("s1", {"total_satisfaction": 0})
+
+    async def increment():
+        async with backend.session("s1") as session:
+            total = session["total_satisfaction"]
+            await asyncio.sleep(0)
+            session["total_satisfaction"] = total + 1
+
+    await asyncio.gather(*(increment() for _ in range(1000)))
+    total = (await backend.get("s1"))["total_satisfaction"]
+    print(f"✅ Total after 1000 concurrent increments: {total}")
+    if total == 1000:
+        print("✅ Per-session lock: PASS")
+    else:
+        print("❌ Per-session lock: FAIL")
+
+
+def test_concurrent_crushes():
+    """Test exact totals when one session is hammered with single and batch crushes"""
+    print(f"\n🧪 Testing {CLIENTS} Concurrent Clients On One Session")
+
+    session_id = start_session()
+    sequence = ["can_aluminum", "phone_old", "glass_bottle", "cardboard_box"] * 100
+    batches = [["plastic_bottle", "can_aluminum", "plastic_bottle"]] * 50
+
+    def crush(object_id):
+        return requests.post(f"{BACKEND_URL}/api/session/{session_id}/crush", json={"object_id": object_id}).status_code
+
+    def crush_batch(object_ids):
+        body = [{"object_id": object_id} for object_id in object_ids]
+        return requests.post(f"{BACKEND_URL}/api/session/{session_id}/crush/batch", json=body).status_code
+
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        singles = pool.map(crush, sequence)
+        batched = pool.map(crush_batch, batches)
+        statuses = list(singles) + list(batched)
+
+    crushed = sequence + [object_id for batch in batches for object_id in batch]
+    stats = requests.get(f"{BACKEND_URL}/api/session/{session_id}/stats").json()
+    expected_counts = {object_id: crushed.count(object_id) for object_id in set(crushed)}
+
+    print(f"✅ Requests accepted: {statuses.count(200)}/{len(statuses)}")
+    print(f"✅ Total crushed: {stats['total_crushed']} (expected {len(crushed)})")
+    print(f"✅ Total satisfaction: {stats['total_satisfaction']} (expected {satisfaction(crushed)})")
+    if (statuses.count(200) == len(statuses) and stats["total_crushed"] == len(crushed) and
+            stats["total_satisfaction"] == satisfaction(crushed) and
+            stats["objects_crushed"] == expected_counts):
+        print("✅ Concurrent crushes: PASS")
+    else:
+        print(f"❌ Concurrent crushes: FAIL ({stats})")
+
+
+def test_idempotent_retries():
+    """Test that concurrent retries of one request are applied exactly once"""
+    print("\n🧪 Testing Idempotent Retries")
+
+    session_id = start_session()
+    crush_url = f"{BACKEND_URL}/api/session/{session_id}/crush"
+    batch_url = f"{BACKEND_URL}/api/session/{session_id}/crush/batch"
+    crush_key = str(uuid.uuid4())
+    batch_key = str(uuid.uuid4())
+    batch_body = [{"object_id": "phone_old"}, {"object_id": "glass_bottle"}]
+
+    def retry_crush(_):
+        return requests.post(crush_url, json={"object_id": "can_aluminum"}, headers={"Idempotency-Key": crush_key})
+
+    def retry_batch(_):
+        return requests.post(batch_url, json=batch_body, headers={"Idempotency-Key": batch_key})
+
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        crush_responses = list(pool.map(retry_crush, range(20)))
+        batch_responses = list(pool.map(retry_batch, range(20)))
+
+    replayed = sum(response.headers.get("Idempotent-Replayed") == "true"
+                   for response in crush_responses + batch_responses)
+    # Replayed from where its crush sits in the history, after the batch went in
+    late = requests.post(crush_url, json={"object_id": "can_aluminum"}, headers={"Idempotency-Key": crush_key})
+    same_bodies = (len({response.text for response in crush_responses + [late]}) == 1 and
+                   len({response.text for response in batch_responses}) == 1)
+    conflict = requests.post(crush_url, json={"object_id": "phone_old"}, headers={"Idempotency-Key": crush_key})
+    invalid = requests.post(crush_url, json={"object_id": "phone_old"}, headers={"Idempotency-Key": "not a key!"})
+    stats = requests.get(f"{BACKEND_URL}/api/session/{session_id}/stats").json()
+    expected = ["can_aluminum", "phone_old", "glass_bottle"]
+
+    print(f"✅ Replayed responses: {replayed} (expected 38), late replay: {late.headers.get('Idempotent-Replayed')}")
+    print(f"✅ Replays identical to the original: {same_bodies}")
+    print(f"✅ Key reused for a different request: {conflict.status_code} (expected 409)")
+    print(f"✅ Malformed key: {invalid.status_code} (expected 422)")
+    print(f"✅ Total crushed: {stats['total_crushed']} (expected 3)")
+    if (replayed == 38 and same_bodies and conflict.status_code == 409 and invalid.status_code == 422 and
+            stats["total_crushed"] == 3 and stats["total_satisfaction"] == satisfaction(expected)):
+        print("✅ Idempotent retries: PASS")
+    else:
+        print(f"❌ Idempotent retries: FAIL ({stats})")
+
+
+async def test_failed_batch():
+    """Test that a batch is taken back out of the session when the backend fails to record it"""
+    print("\n🧪 Testing Failed Batches")
+
+    class FailingBackend(MemorySessionBackend):
+        fail = True
+
+        async def record_crush(self, session_id, object_id, satisfaction):
+            if self.fail and object_id == "glass_bottle":
+                raise RuntimeError("backend down")
+
+    backend = FailingBackend(SessionStore())
+    original, server.session_backend = server.session_backend, backend
+    batch = [{"object_id": "can_aluminum"}, {"object_id": "phone_old"}, {"object_id": "glass_bottle"}]
+    try:
+        transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session_id = (await client.post("/api/session/start", json={"mode": "interactive"})).json()["session_id"]
+            await client.post(f"/api/session/{session_id}/crush", json={"object_id": "phone_old"})
+            failed = await client.post(f"/api/session/{session_id}/crush/batch", json=batch)
+            after_failure = (await client.get(f"/api/session/{session_id}/stats")).json()
+            backend.fail = False
+            retried = await client.post(f"/api/session/{session_id}/crush/batch", json=batch)
+            stats = (await client.get(f"/api/session/{session_id}/stats")).json()
+    finally:
+        server.session_backend = original
+
+    print(f"✅ Failed batch: {failed.status_code}, left behind: {after_failure['total_crushed'] - 1} crushes")
+    print(f"✅ Retried batch: {retried.status_code}, total crushed: {stats['total_crushed']} (expected 4)")
+    if (failed.status_code == 500 and after_failure["total_crushed"] == 1 and
+            after_failure["total_satisfaction"] == satisfaction(["phone_old"]) and
+            retried.status_code == 200 and stats["total_crushed"] == 4 and
+            stats["total_satisfaction"] == satisfaction(["phone_old"] + [crush["object_id"] for crush in batch]) and
+            stats["objects_crushed"] == {"phone_old": 2, "can_aluminum": 1, "glass_bottle": 1}):
+        print("✅ Failed batches: PASS")
+    else:
+        print(f"❌ Failed batches: FAIL ({after_failure}, {stats})")
+
+
+if __name__ == "__main__":
+    print("🧪 Starting Concurrency Tests for Crush Simulator Backend")
+    print("=" * 60)
+
+    asyncio.run(test_session_lock())
+    test_concurrent_crushes()
+    test_idempotent_retries()
+    asyncio.run(test_failed_batch())
+
+    print("\n" + "=" * 60)
+    print("🎉 Concurrency testing completed!")
@@ -6,6 +6,8 @@ Tests error handling and edge cases.
 
 import requests
 import json
+import struct
+import time
 
 BACKEND_URL = "http://localhost:8001"
 
@@ -81,12 +83,13 @@ def test_data_persistence():
             stats = stats_response.json()
             print(f"✅ Objects crushed: {stats['total_crushed']} (expected {len(objects_to_crush)})")
             print(f"✅ Total satisfaction: {stats['total_satisfaction']} (expected {total_expected_satisfaction})")
-            print(f"✅ Objects list: {len(stats['objects_crushed'])} items")
+            print(f"✅ Object counts: {sum(stats['objects_crushed'].values())} crushes")
             
             # Verify correctness
             if (stats['total_crushed'] == len(objects_to_crush) and 
                 stats['total_satisfaction'] == total_expected_satisfaction and
-                len(stats['objects_crushed']) == len(objects_to_crush)):
+                sum(stats['objects_crushed'].values()) == len(objects_to_crush) and
+                stats['recent_objects'] == objects_to_crush):
                 print("✅ Data persistence: PASS")
             else:
                 print("❌ Data persistence: FAIL")
@@ -129,6 +132,93 @@ def test_concurrent_sessions():
     for session_id in sessions:
         requests.post(f"{BACKEND_URL}/api/session/{session_id}/end")
 
+def test_session_store_metrics():
+    """Test that ended sessions leave the live session set"""
+    print("\n🧪 Testing Session Store Metrics")
+    
+    before = requests.get(f"{BACKEND_URL}/api/sessions/metrics").json()
+    
+    session_data = {"mode": "interactive", "objects_crushed": [], "total_satisfaction": 0, "session_duration": 0}
+    session_id = requests.post(f"{BACKEND_URL}/api/session/start", json=session_data).json()["session_id"]
+    during = requests.get(f"{BACKEND_URL}/api/sessions/metrics").json()
+    
+    requests.post(f"{BACKEND_URL}/api/session/{session_id}/end")
+    after = requests.get(f"{BACKEND_URL}/api/sessions/metrics").json()
+    
+    if during["resident"] == before["resident"] + 1 and after["resident"] == before["resident"]:
+        print(f"✅ Resident sessions: {before['resident']} -> {during['resident']} -> {after['resident']}: PASS")
+    else:
+        print(f"❌ Resident sessions: {before['resident']} -> {during['resident']} -> {after['resident']}: FAIL")
+
+def metric_value(metrics_text, line_prefix):
+    for line in metrics_text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+def test_metrics_endpoint():
+    """Test that /metrics counts 404s by cause and validation failures"""
+    print("\n🧪 Testing Metrics Endpoint")
+    
+    session_404 = 'crush_not_found_total{cause="session"}'
+    object_404 = 'crush_not_found_total{cause="object"}'
+    invalid = 'crush_validation_failures_total{route="/api/session/{session_id}/crush"}'
+    
+    before = requests.get(f"{BACKEND_URL}/metrics").text
+    requests.post(f"{BACKEND_URL}/api/session/invalid-session-id/crush", json={"object_id": "can_aluminum"})
+    requests.get(f"{BACKEND_URL}/api/objects/invalid-object")
+    requests.post(f"{BACKEND_URL}/api/session/invalid-session-id/crush", json={"force": "hard"})
+    after = requests.get(f"{BACKEND_URL}/metrics").text
+    
+    for name in (session_404, object_404, invalid):
+        delta = metric_value(after, name) - metric_value(before, name)
+        if delta == 1:
+            print(f"✅ {name} +1: PASS")
+        else:
+            print(f"❌ {name} +{delta}: FAIL")
+
+def test_out_of_range_position():
+    """Test that a position too large for a float is ignored rather than stopping analytics"""
+    print("\n🧪 Testing Out Of Range Position")
+    
+    session_id = requests.post(f"{BACKEND_URL}/api/session/start", json={"mode": "interactive"}).json()["session_id"]
+    before = requests.get(f"{BACKEND_URL}/api/analytics").json()
+    # 1e309 parses to infinity
+    huge = requests.post(f"{BACKEND_URL}/api/session/{session_id}/crush",
+                         data='{"object_id": "can_aluminum", "position": {"x": 1e309, "y": 0}}',
+                         headers={"Content-Type": "application/json"})
+    requests.post(f"{BACKEND_URL}/api/session/{session_id}/crush", json={"object_id": "can_aluminum"})
+    for _ in range(20):
+        after = requests.get(f"{BACKEND_URL}/api/analytics").json()
+        if after["processed"] - before["processed"] >= 2:
+            break
+        time.sleep(0.1)
+    
+    processed = after["processed"] - before["processed"]
+    if huge.status_code == 200 and processed == 2 and after["failed"] == before["failed"]:
+        print(f"✅ Crush with x=1e309: {huge.status_code}, both crushes aggregated afterwards: PASS")
+    else:
+        print(f"❌ Crush with x=1e309: {huge.status_code}, {processed} crushes aggregated: FAIL")
+
+def test_out_of_range_force():
+    """Test that forces JSON and float32 cannot carry are refused or clamped instead of failing"""
+    print("\n🧪 Testing Out Of Range Force")
+    
+    session_id = requests.post(f"{BACKEND_URL}/api/session/start", json={"mode": "interactive"}).json()["session_id"]
+    url = f"{BACKEND_URL}/api/session/{session_id}/crush"
+    json_headers = {"Content-Type": "application/json"}
+    refused = [requests.post(url, data=f'{{"object_id": "can_aluminum", "force": {force}}}', headers=json_headers).status_code
+               for force in ("NaN", "Infinity", "1e309")]
+    huge = requests.post(url, json={"object_id": "can_aluminum", "force": 1e300}, headers={
+        "Accept": "application/vnd.crush.struct"})
+    # Frame (2 bytes), code and satisfaction (6 bytes), then force_applied as float32
+    packed_force = struct.unpack_from("<f", huge.content, 8)[0] if huge.status_code == 200 else None
+    
+    if refused == [422] * 3 and huge.status_code == 200 and packed_force == 3.4028234663852886e38:
+        print(f"✅ NaN and infinite forces: {refused}; force 1e300 packed as {packed_force:.4g}: PASS")
+    else:
+        print(f"❌ NaN and infinite forces: {refused}; force 1e300: {huge.status_code}, {packed_force}: FAIL")
+
 if __name__ == "__main__":
     print("🧪 Starting Edge Case Tests for Crush Simulator Backend")
     print("=" * 60)
@@ -137,6 +227,10 @@ if __name__ == "__main__":
     test_invalid_object_operations()
     test_data_persistence()
     test_concurrent_sessions()
+    test_session_store_metrics()
+    test_metrics_endpoint()
+    test_out_of_range_position()
+    test_out_of_range_force()
     
     print("\n" + "=" * 60)
     print("🎉 Edge case testing completed!")
\ No newline at end of file
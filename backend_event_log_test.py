@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Columnar Event Log Testing for Crush Simulator
+Writes crush events through the columnar log and checks the memory-mapped
+columns and NumPy reports against plain Python, no live server needed.
+"""
+
+import os
+import random
+import sys
+import tempfile
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from catalog import Catalog
+from event_columns import ColumnarEventLog, ColumnarEventReader
+from event_reports import per_mode, per_object, report
+from server import crush_objects
+
+catalog = Catalog(crush_objects)
+
+
+def make_events(count, seed=7):
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        obj = rng.choice(catalog.objects)
+        position = {"x": rng.uniform(-400, 400), "y": rng.uniform(-300, 300)} if i % 10 else {"x": "?"}
+        events.append((1_700_000_000.0 + i, f"session-{rng.randrange(200)}", obj["id"], obj["type"],
+                       round(rng.uniform(0.1, 3.0), 2), position, rng.choice(["interactive", "auto", "mixed"])))
+    return events
+
+
+def test_round_trip(directory):
+    """Test that chunked writes, reopening and memory-mapped reads keep every event"""
+    print("🧪 Testing Columnar Round Trip")
+
+    events = make_events(25_000)
+    log = ColumnarEventLog(directory, lambda: catalog, chunk_rows=4096)
+    for start in range(0, 15_000, 1000):
+        log.write(events[start:start + 1000])
+    log.close()
+    # A second writer appends to the same files, holding too few session ids to avoid repeating them
+    log = ColumnarEventLog(directory, lambda: catalog, chunk_rows=4096, session_names=50)
+    for start in range(15_000, len(events), 1000):
+        log.write(events[start:start + 1000])
+    log.close()
+
+    # A torn chunk in one column must not be read
+    with open(os.path.join(directory, "force.col"), "ab") as column:
+        column.write(b"\0" * 12)
+
+    reader = ColumnarEventReader(directory)
+    sessions_ok = [reader.sessions[index] for index in reader["session"][:5]] == [event[1] for event in events[:5]]
+    codes_ok = [reader.object_id(code) for code in reader["code"][-5:]] == [event[2] for event in events[-5:]]
+    ts_ok = float(reader["ts"][12_345]) == events[12_345][0]
+
+    repeated = len(reader.sessions) > len({event[1] for event in events})
+    print(f"✅ Rows read back: {len(reader)} (expected {len(events)}), session ids repeated: {repeated}")
+    print(f"✅ Sessions, codes and timestamps match: {sessions_ok and codes_ok and ts_ok}")
+    if len(reader) == len(events) and sessions_ok and codes_ok and ts_ok and repeated:
+        print("✅ Columnar round trip: PASS")
+    else:
+        print("❌ Columnar round trip: FAIL")
+    return events, reader
+
+
+def test_reports(events, reader):
+    """Test the vectorized per-object and per-mode reports against plain Python"""
+    print("\n🧪 Testing Vectorized Reports")
+
+    objects = per_object(reader)
+    modes = per_mode(reader)
+    failures = []
+    for object_id in {event[2] for event in events}:
+        forces = sorted(event[4] for event in events if event[2] == object_id)
+        sessions = {event[1] for event in events if event[2] == object_id}
+        row = objects[object_id]
+        median = forces[(len(forces) + 1) // 2 - 1]
+        if (row["count"] != len(forces) or row["sessions"] != len(sessions) or
+                abs(row["mean_force"] - sum(forces) / len(forces)) > 1e-3 or abs(row["p50"] - median) > 1e-3 or
+                row["satisfaction"] != len(forces) * catalog.get(object_id)["satisfaction_score"]):
+            failures.append((object_id, row))
+
+    by_mode = defaultdict(Counter)
+    for event in events:
+        by_mode[event[6]][event[2]] += 1
+    for mode, counts in by_mode.items():
+        row = modes[mode]
+        if row["count"] != sum(counts.values()) or counts[row["top_object"]] != max(counts.values()):
+            failures.append((mode, row))
+
+    window = report(reader, since=events[1000][0], until=events[2000][0])
+    print(f"✅ Objects reported: {len(objects)}, modes reported: {sorted(modes)}")
+    print(f"✅ Events in a 1000 second window: {window['events']} (expected 1000)")
+    if not failures and window["events"] == 1000:
+        print("✅ Vectorized reports: PASS")
+    else:
+        print(f"❌ Vectorized reports: FAIL ({failures[:3]})")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        events, reader = test_round_trip(directory)
+        test_reports(events, reader)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Session Journal Testing for Crush Simulator
+Checks that the journal session backend recovers sessions after a restart,
+ignores a torn record, keeps snapshots consistent with updates made while
+they are written and groups commits, and that a server killed mid-session
+comes back with every crush it acknowledged. Starts its own server, no
+live server needed.
+"""
+
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from catalog import Catalog
+from crush_history import CrushHistory
+from server import crush_objects
+from session_backend import apply_idempotency
+from session_journal import SNAPSHOT_CHUNK, JournalSessionBackend
+from session_store import SessionStore
+
+catalog = Catalog(crush_objects)
+PORT = 8015
+
+
+def make_backend(directory, **kwargs):
+    return JournalSessionBackend(directory, SessionStore(), lambda: catalog, **kwargs)
+
+
+def new_session():
+    return {"user_id": None, "mode": "auto", "total_satisfaction": 0, "session_duration": 0,
+            "history": CrushHistory(), "created_at": "2024-01-01T00:00:00", "active": True}
+
+
+async def crush(backend, session_id, object_id):
+    async with backend.session(session_id) as session:
+        obj = catalog.get(object_id)
+        session["history"].append(catalog.codes[object_id])
+        session["total_satisfaction"] += obj["satisfaction_score"]
+        await backend.record_crush(session_id, object_id, obj["satisfaction_score"])
+
+
+def state(session):
+    return (session["history"].slice(0, len(session["history"])), session["total_satisfaction"],
+            session["active"], session.get("idempotency"))
+
+
+async def test_restart_recovery(directory):
+    """Test that a restarted backend has every session, crush, idempotency record and end, and skips a torn record"""
+    print("🧪 Testing Journal Recovery")
+
+    path = os.path.join(directory, "recovery")
+    backend = make_backend(path)
+    await backend.start()
+    await backend.create("s1", new_session())
+    await backend.create("s2", new_session())
+    for object_id in ["glass_bottle", "glass_bottle", "cardboard_box", "phone_old"]:
+        await crush(backend, "s1", object_id)
+    await crush(backend, "s2", "can_aluminum")
+    for changes in ({"key-1": {"request": "d1", "index": 0}, "key-2": {"request": "d2", "index": 1}},
+                    {"key-3": {"request": "d3", "index": 2}}, {"key-1": None}):
+        async with backend.session("s1") as session:
+            apply_idempotency(session, changes)
+            await backend.record_idempotency("s1", changes)
+    async with backend.session("s2") as session:
+        session["active"] = False
+        session["ended_at"] = "2024-01-01T00:05:00"
+        await backend.end("s2")
+    before = {session_id: state(backend.store.get(session_id)) for session_id in ("s1", "s2")}
+    commits = backend.stats["commits"]
+    await backend.close()
+
+    # A write cut short by the crash
+    journal = sorted(name for name in os.listdir(path) if name.startswith("journal-"))[-1]
+    with open(os.path.join(path, journal), "ab") as torn:
+        torn.write(b"\x30\x00\x00\x00\x01\x02")
+
+    restarted = make_backend(path)
+    await restarted.start()
+    after = {session_id: state(await restarted.get(session_id)) for session_id in ("s1", "s2")}
+    ended_archived = restarted.store.metrics()["archived"] == 1
+    await crush(restarted, "s1", "can_aluminum")
+    await restarted.close()
+    again = make_backend(path)
+    await again.start()
+    appended = len((await again.get("s1"))["history"])
+    await again.close()
+
+    print(f"✅ Sessions identical after a restart: {after == before}; ended one archived: {ended_archived}")
+    print(f"✅ {commits} commits for {restarted.stats['recovered_sessions']} sessions and 11 updates")
+    print(f"✅ Torn record ignored and the journal still appendable: {appended} crushes")
+    if after == before and ended_archived and appended == 5:
+        print("✅ Journal recovery: PASS")
+    else:
+        print(f"❌ Journal recovery: FAIL ({before} != {after})")
+
+
+async def test_snapshot_during_updates(directory):
+    """Test a snapshot taken while sessions keep changing, then recovery from it and the journal tail"""
+    print("\n🧪 Testing Snapshots Under Load")
+
+    path = os.path.join(directory, "snapshot")
+    backend = make_backend(path, sync="interval")
+    await backend.start()
+    session_ids = [f"s{i}" for i in range(3 * SNAPSHOT_CHUNK)]
+    for session_id in session_ids:
+        await backend.create(session_id, new_session())
+
+    async def keep_crushing():
+        for i in range(2000):
+            await crush(backend, session_ids[(i * 7919) % len(session_ids)], crush_objects[i % len(crush_objects)]["id"])
+            if i % 50 == 0:
+                await asyncio.sleep(0)
+
+    updates = asyncio.create_task(keep_crushing())
+    written = await backend.snapshot()
+    await updates
+    await crush(backend, "s1", "phone_old")
+    before = {session_id: state(backend.store.get(session_id)) for session_id in session_ids}
+    await backend.close()
+    files = sorted(os.listdir(path))
+
+    restarted = make_backend(path)
+    await restarted.start()
+    after = {session_id: state(await restarted.get(session_id)) for session_id in session_ids}
+    await restarted.close()
+
+    crushed = sum(len(history) for history, _, _, _ in after.values())
+    print(f"✅ Snapshot of {written} sessions while they changed; files left: {files}")
+    print(f"✅ Recovered {restarted.stats['recovered_sessions']} sessions, {crushed} crushes, identical: {after == before}")
+    if after == before and crushed == 2001 and written == len(session_ids) and len(files) == 2:
+        print("✅ Snapshots under load: PASS")
+    else:
+        print("❌ Snapshots under load: FAIL")
+
+
+async def test_group_commit(directory):
+    """Test that concurrent updates share fsyncs and each waits until its own is done"""
+    print("\n🧪 Testing Group Commit")
+
+    backend = make_backend(os.path.join(directory, "group"))
+    await backend.start()
+    session_ids = [f"s{i}" for i in range(200)]
+    await asyncio.gather(*(backend.create(session_id, new_session()) for session_id in session_ids))
+    creates = backend.stats["commits"]
+    await asyncio.gather(*(crush(backend, session_id, "can_aluminum") for session_id in session_ids))
+    commits = backend.stats["commits"] - creates
+    durable = backend._durable == backend._appended
+    await backend.close()
+
+    print(f"✅ 200 concurrent creates in {creates} commits, 200 concurrent crushes in {commits}")
+    print(f"✅ Everything acknowledged is on disk: {durable}")
+    if creates < 20 and commits < 20 and durable:
+        print("✅ Group commit: PASS")
+    else:
+        print("❌ Group commit: FAIL")
+
+
+def test_killed_server(directory):
+    """Test that sessions survive a server killed with SIGKILL"""
+    print("\n🧪 Testing Recovery After a Crash")
+
+    env = dict(os.environ, SESSION_BACKEND="journal", SESSION_JOURNAL_DIR=os.path.join(directory, "server"),
+               CATALOG_WATCH_INTERVAL="0", RATE_LIMITS="off")
+    base_url = f"http://localhost:{PORT}/api"
+
+    def start_server():
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(PORT)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for _ in range(100):
+            try:
+                if requests.get(f"{base_url}/ready", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.1)
+        return server
+
+    server = start_server()
+    try:
+        session_id = requests.post(f"{base_url}/session/start", json={"mode": "interactive"}).json()["session_id"]
+        for obj in crush_objects:
+            requests.post(f"{base_url}/session/{session_id}/crush", json={"object_id": obj["id"]})
+        requests.post(f"{base_url}/session/{session_id}/crush/batch", json=[{"object_id": "can_aluminum"}] * 10)
+        retried = {"object_id": "phone_old"}
+        requests.post(f"{base_url}/session/{session_id}/crush", json=retried, headers={"Idempotency-Key": "k1"})
+        before = requests.get(f"{base_url}/session/{session_id}/stats").json()
+    finally:
+        server.send_signal(signal.SIGKILL)
+        server.wait()
+
+    server = start_server()
+    try:
+        after = requests.get(f"{base_url}/session/{session_id}/stats")
+        replay = requests.post(f"{base_url}/session/{session_id}/crush", json=retried, headers={"Idempotency-Key": "k1"})
+        total = requests.get(f"{base_url}/session/{session_id}/stats").json()["total_crushed"]
+    finally:
+        server.terminate()
+        server.wait()
+
+    same = after.status_code == 200 and after.json() == before
+    print(f"✅ Stats after SIGKILL and restart: HTTP {after.status_code}, identical: {same}")
+    print(f"✅ Retry after the crash replayed: {replay.headers.get('idempotent-replayed')}; crushes {total}")
+    if same and before["total_crushed"] == len(crush_objects) + 11 and replay.headers.get("idempotent-replayed") == "true" \
+            and total == before["total_crushed"]:
+        print("✅ Recovery after a crash: PASS")
+    else:
+        print(f"❌ Recovery after a crash: FAIL ({before} vs {after.text})")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(test_restart_recovery(directory))
+        asyncio.run(test_snapshot_during_updates(directory))
+        asyncio.run(test_group_commit(directory))
+        test_killed_server(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Offloading and Event Loop Monitoring Testing for Crush Simulator
+Checks that step timing sees only the time a coroutine holds the event loop,
+that the lag monitor notices a blocked loop, that crush simulations come out
+the same in threads and worker processes as inline, and that a handler
+holding the loop past its budget is reported. Runs in process, no live
+server needed.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Read by server at import: a budget any batch of crushes goes over
+os.environ.update(LOOP_BLOCK_BUDGET="0.0001", LOOP_MONITOR_INTERVAL="0.01", OFFLOAD_MIN_CRUSHES="20",
+                  RATE_LIMITS="off", CATALOG_WATCH_INTERVAL="0")
+
+from catalog import Catalog
+from catalog_source import load_objects
+from crush_engine import CrushEngine
+from loop_monitor import LoopMonitor, StepTimer
+from offload import Offload
+
+catalog = Catalog(load_objects(os.path.join(BACKEND_DIR, "crush_objects.json")))
+
+
+async def test_step_timer():
+    """Test that only the steps a coroutine runs count, and that results, errors and cancellation pass through"""
+    print("🧪 Testing Step Timing")
+
+    async def handler(block: float, fail: bool = False):
+        time.sleep(block)
+        await asyncio.sleep(0.1)
+        time.sleep(block / 2)
+        if fail:
+            raise ValueError("failed")
+        return "done"
+
+    timer = StepTimer(handler(0.03))
+    result = await timer
+    failing = StepTimer(handler(0.01, fail=True))
+    try:
+        await failing
+        raised = False
+    except ValueError:
+        raised = True
+
+    async def timed(coro):
+        return await StepTimer(coro)
+
+    task = asyncio.create_task(timed(handler(0.0)))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    try:
+        await task
+        cancelled = False
+    except asyncio.CancelledError:
+        cancelled = True
+
+    print(f"✅ Longest step {timer.longest * 1000:.1f} ms, {timer.busy * 1000:.1f} ms in {timer.steps} steps")
+    print(f"✅ Error raised through the timer: {raised}; cancellation delivered: {cancelled}")
+    if (result == "done" and 0.03 <= timer.longest < 0.045 and 0.045 <= timer.busy < 0.08 and timer.steps == 2
+            and raised and cancelled):
+        print("✅ Step timing: PASS")
+    else:
+        print("❌ Step timing: FAIL")
+
+
+async def test_lag_monitor():
+    """Test that blocking the loop shows up as lag, and an idle loop does not"""
+    print("\n🧪 Testing Lag Monitor")
+
+    samples = []
+    monitor = LoopMonitor(interval=0.01, on_sample=samples.append)
+    task = asyncio.create_task(monitor.run())
+    await asyncio.sleep(0.1)
+    idle = max(samples)
+    time.sleep(0.2)
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    print(f"✅ Idle lag {idle * 1000:.1f} ms; worst after blocking 200 ms: {monitor.worst * 1000:.1f} ms")
+    if idle < 0.05 and 0.18 <= monitor.worst < 0.3 and monitor.samples == len(samples):
+        print("✅ Lag monitor: PASS")
+    else:
+        print("❌ Lag monitor: FAIL")
+
+
+async def test_offloaded_simulation():
+    """Test that simulations in threads and worker processes match the inline ones exactly"""
+    print("\n🧪 Testing Offloaded Simulation")
+
+    engine = CrushEngine(seed=42)
+    engine.warm_up()
+    objs = [catalog.objects[i % len(catalog.objects)] for i in range(200)]
+    forces = [0.5 + (i % 7) for i in range(200)]
+    positions = [{"x": i, "y": -i} for i in range(200)]
+    calls = [(objs[i:i + 50], forces[i:i + 50], positions[i:i + 50], 1000 + i, i) for i in range(0, 200, 50)]
+    inline = [engine.simulate(*call) for call in calls]
+
+    offload = Offload(threads=4, processes=2)
+    offload.start()
+    try:
+        threaded = await asyncio.gather(*(offload.run(engine.simulate, *call) for call in calls * 5))
+        await offload.warm_up(engine.warm_up)
+        in_processes = await asyncio.gather(*(offload.compute(engine.simulate, *call) for call in calls))
+        default_executor = await asyncio.get_running_loop().run_in_executor(None, lambda: threading.current_thread().name)
+        metrics = offload.metrics()
+    finally:
+        offload.close()
+
+    same_threaded = threaded == inline * 5
+    same_processes = in_processes == inline
+    print(f"✅ 20 concurrent calls in threads identical: {same_threaded}; in processes: {same_processes}")
+    print(f"✅ Default executor runs in {default_executor}; {metrics}")
+    if (same_threaded and same_processes and default_executor.startswith("offload") and
+            metrics["completed"] == {"thread": 20, "process": 6}):
+        print("✅ Offloaded simulation: PASS")
+    else:
+        print("❌ Offloaded simulation: FAIL")
+
+
+async def test_blocking_handlers():
+    """Test that a handler over the loop budget is counted and logged, with batches simulated off the loop"""
+    print("\n🧪 Testing Blocking Handler Detection")
+
+    import server
+
+    warnings = []
+    handler = logging.Handler()
+    handler.emit = lambda record: warnings.append(record.getMessage())
+    logging.getLogger("loop_monitor").addHandler(handler)
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.app.router.lifespan_context(server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            session_id = (await client.post("/api/session/start", json={})).json()["session_id"]
+            session = server.sessions[session_id]
+            actions = [{"object_id": obj["id"], "force": 2.0} for obj in catalog.objects] * 8
+            crush_engine = CrushEngine(server.crush_engine.seed)
+            expected = crush_engine.simulate(
+                [catalog.get(action["object_id"]) for action in actions], [2.0] * len(actions),
+                [{"x": 0, "y": 0}] * len(actions), session["seed"], 0,
+            )
+            batch = (await client.post(f"/api/session/{session_id}/crush/batch", json=actions)).json()
+            for _ in range(3):
+                await client.post(f"/api/session/{session_id}/crush/batch", json=actions)
+            threads = server.offload.completed["thread"]
+            await asyncio.sleep(0.05)
+            metrics = (await client.get("/metrics")).text
+
+    route = "/api/session/{session_id}/crush/batch"
+    over = f'crush_handler_over_budget_total{{route="{route}"}} 4' in metrics
+    sampled = "crush_event_loop_lag_sampled_seconds_count" in metrics
+    logged = [warning for warning in warnings if warning.startswith(route)]
+    same = [result["simulation"] for result in batch["results"]] == expected
+    print(f"✅ Batches of {len(actions)} simulated in offload threads: {threads}, same as inline: {same}")
+    print(f"✅ Over budget counted 4 times: {over}; logged once: {logged[:1]}")
+    if over and sampled and len(logged) == 1 and same and threads == 4:
+        print("✅ Blocking handler detection: PASS")
+    else:
+        print("❌ Blocking handler detection: FAIL")
+
+
+def main():
+    asyncio.run(test_step_timer())
+    asyncio.run(test_lag_monitor())
+    asyncio.run(test_offloaded_simulation())
+    asyncio.run(test_blocking_handlers())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Rate Limiting and Admission Control Testing for Crush Simulator
+Checks token buckets and idle key expiry against a fake clock, that a
+request refused by one of a route's limits costs nothing from the other, load
+shedding in process, and per-route limits on a server started with tight
+RATE_LIMITS. Starts its own server, no live server needed.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi import HTTPException
+
+from rate_limit import RateLimiter, RouteLimit
+
+PORT = 8012
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_buckets():
+    """Test bursts, refill, Retry-After and that idle keys do not accumulate"""
+    print("🧪 Testing Token Buckets")
+
+    clock = FakeClock()
+    limiter = RateLimiter(rate=2, burst=5, clock=clock)
+    burst = [limiter.acquire("a") for _ in range(6)]
+    clock.now += 1.0
+    refilled = [limiter.acquire("a") for _ in range(3)]
+    independent = limiter.acquire("b")
+
+    for i in range(100_000):
+        clock.now += 0.01
+        limiter.acquire(f"client-{i}")
+    bounded = len(limiter) <= 2 * 2.5 / 0.01 + 2
+
+    burst_ok = burst[:5] == [0.0] * 5 and abs(burst[5] - 0.5) < 1e-9
+    refill_ok = refilled[:2] == [0.0, 0.0] and refilled[2] > 0
+    print(f"✅ Burst of 5 then wait {burst[5]:.2f}s: {burst_ok}")
+    print(f"✅ Two tokens back after one second: {refill_ok}")
+    print(f"✅ Keys live after 100000 one-off clients: {len(limiter)}")
+    if burst_ok and refill_ok and independent == 0.0 and bounded:
+        print("✅ Token buckets: PASS")
+    else:
+        print("❌ Token buckets: FAIL")
+
+
+def test_refused_requests():
+    """Test that a request one limit refuses takes no tokens from the other"""
+    print("\n🧪 Testing Refused Requests")
+
+    clock = FakeClock()
+    limit = RouteLimit("crush", session=(1, 2), ip=(1, 5), clock=clock)
+
+    def outcome(session_id, client):
+        try:
+            limit.check(session_id, client)
+        except HTTPException as error:
+            return error.detail.rsplit(" ", 1)[-1]
+        return "ok"
+
+    # Two crushes fill the session's burst, three more are refused for the session
+    first = [outcome("s1", "c1") for _ in range(5)]
+    # The client still has the three tokens those refusals did not spend
+    other = [outcome(session_id, "c1") for session_id in ("s2", "s3", "s4", "s5")]
+    # And a client refused by its own limit spends nothing of a fresh session's
+    refused = [outcome("s6", "c1") for _ in range(3)]
+    fresh = [outcome("s6", "c2") for _ in range(3)]
+
+    print(f"✅ One session: {first}")
+    print(f"✅ Same client, other sessions: {other}")
+    print(f"✅ Client over its limit, then another client on that session: {refused}, {fresh}")
+    if (first == ["ok"] * 2 + ["session"] * 3 and other == ["ok"] * 3 + ["ip"] and
+            refused == ["ip"] * 3 and fresh == ["ok"] * 2 + ["session"]):
+        print("✅ Refused requests: PASS")
+    else:
+        print("❌ Refused requests: FAIL")
+
+
+async def test_admission_control():
+    """Test that lag sheds requests with 429 while health checks still answer"""
+    print("\n🧪 Testing Admission Control")
+
+    import server
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        server.admission.lag = server.admission.max_lag * 2
+        try:
+            shed = await client.get("/api/objects")
+            health = await client.get("/api/")
+            ready = await client.get("/api/ready")
+        finally:
+            server.admission.lag = 0.0
+        recovered = await client.get("/api/objects")
+
+    print(f"✅ Lagging loop sheds with {shed.status_code}, Retry-After {shed.headers.get('retry-after')}")
+    print(f"✅ Health and readiness still answer: {health.status_code}, {ready.status_code}")
+    if (shed.status_code == 429 and shed.headers.get("retry-after") == "1" and health.status_code == 200 and
+            ready.status_code == 200 and recovered.status_code == 200):
+        print("✅ Admission control: PASS")
+    else:
+        print("❌ Admission control: FAIL")
+
+
+def test_route_limits():
+    """Test per-session and per-client limits configured through RATE_LIMITS"""
+    print("\n🧪 Testing Per-Route Limits")
+
+    limits = {"crush": {"session": [1, 3], "ip": None}, "session_start": {"ip": [1, 4]}}
+    env = dict(os.environ, RATE_LIMITS=json.dumps(limits), CATALOG_WATCH_INTERVAL="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(PORT)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://localhost:{PORT}/api"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{base_url}/", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        starts = [requests.post(f"{base_url}/session/start", json={"mode": "interactive"}) for _ in range(5)]
+        first, second = (response.json()["session_id"] for response in starts[:2])
+        crush = {"object_id": "can_aluminum"}
+        flood = [requests.post(f"{base_url}/session/{first}/crush", json=crush) for _ in range(5)]
+        other = requests.post(f"{base_url}/session/{second}/crush", json=crush)
+        stats = requests.get(f"{base_url}/session/{first}/stats").json()
+        unlimited = requests.post(f"{base_url}/session/{first}/crush/batch", json=[crush] * 3)
+
+        start_codes = [response.status_code for response in starts]
+        flood_codes = [response.status_code for response in flood]
+        retry = flood[-1].headers.get("retry-after")
+        print(f"✅ Session starts from one client: {start_codes}")
+        print(f"✅ Crushes on one session: {flood_codes}, Retry-After {retry}")
+        print(f"✅ Another session unaffected: {other.status_code}; refused crushes not applied: {stats['total_crushed']}")
+        if (start_codes == [200] * 4 + [429] and flood_codes == [200] * 3 + [429] * 2 and retry == "1" and
+                other.status_code == 200 and stats["total_crushed"] == 3 and unlimited.status_code == 200):
+            print("✅ Per-route limits: PASS")
+        else:
+            print("❌ Per-route limits: FAIL")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    test_token_buckets()
+    test_refused_requests()
+    asyncio.run(test_admission_control())
+    test_route_limits()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Session Replay Testing for Crush Simulator
+Checks the recording format, that a session's bursts do not depend on other
+sessions, and that replaying what a server recorded reproduces the results
+it sent and diffs a catalog change. Starts its own server, no live server needed.
+"""
+
+import copy
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from catalog import Catalog
+from crush_engine import CrushEngine
+from server import crush_objects
+from session_recording import SessionRecorder, read_recordings
+from session_replay import burst_digest, diff, replay
+
+catalog = Catalog(crush_objects)
+PORT = 8013
+SESSION_A = "00000000-0000-4000-8000-00000000000a"
+SESSION_B = "00000000-0000-4000-8000-00000000000b"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        self.now += 0.5
+        return self.now
+
+
+def test_recording_format(directory):
+    """Test that recordings read back in history order, across files and with a torn tail"""
+    print("🧪 Testing Recording Format")
+
+    first = SessionRecorder(os.path.join(directory, "format"), clock=FakeClock())
+    first.start(SESSION_A, 42, catalog.version, 7, [0, 0, 3])
+    first.call(SESSION_A, 3, [(1, 1.5, 10.0, 20.0)])
+    first.close()
+    second = SessionRecorder(os.path.join(directory, "format"), clock=FakeClock())
+    second.path = first.path.replace(".rec", "-b.rec")
+    second.call(SESSION_A, 4, [(2, 0.5, -1.0, 2.0), (4, 9.0, 0.0, 0.0)])
+    second.call(SESSION_B, 0, [(1, 1.0, 0.0, 0.0)])
+    second.end(SESSION_A)
+    second.close()
+
+    # Later file first, as a directory listing might give them
+    recording = read_recordings([second.path, first.path])
+    session = recording[SESSION_A]
+    calls = [(index, count) for index, _, count in session.calls]
+    ordered = calls == [(3, 1), (4, 2)] and list(session.codes) == [1, 2, 4] and list(session.forces) == [1.5, 0.5, 9.0]
+    start_ok = session.seed == 42 and session.satisfaction == 7 and list(session.initial) == [0, 0, 3]
+
+    with open(first.path, "ab") as torn:
+        torn.write(b"C" + bytes(10))
+    torn_ok = len(read_recordings([first.path])[SESSION_A]) == 1
+
+    print(f"✅ Calls merged in history order: {calls}")
+    print(f"✅ Seed and starting state kept: {start_ok}; session without a start left out: {SESSION_B not in recording}")
+    print(f"✅ Torn record at the end ignored: {torn_ok}")
+    if ordered and start_ok and SESSION_B not in recording and session.ended is not None and torn_ok:
+        print("✅ Recording format: PASS")
+    else:
+        print("❌ Recording format: FAIL")
+
+
+def test_independent_sessions():
+    """Test that a session's bursts depend on its seed and inputs only"""
+    print("\n🧪 Testing Seeded Sessions")
+
+    objs = [catalog.get("glass_bottle"), catalog.get("can_aluminum")]
+    forces = [2.0, 0.7]
+    positions = [{"x": 10, "y": 20}, {"x": 30, "y": 40}]
+
+    engine = CrushEngine()
+    alone = [engine.simulate(objs, forces, positions, seed=5, index=index) for index in (0, 2)]
+    mixed = CrushEngine(seed=99)
+    interleaved = []
+    for index in (0, 2):
+        mixed.simulate(objs * 3, forces * 3, positions * 3)
+        mixed.simulate(objs, forces, positions, seed=6, index=index)
+        interleaved.append(mixed.simulate(objs, forces, positions, seed=5, index=index))
+    other_seed = engine.simulate(objs, forces, positions, seed=6, index=0)
+
+    same = interleaved == alone
+    bursts = {result[0]["burst"]["data"] for result in (alone[0], alone[1], other_seed)}
+    distinct = len(bursts) == 3
+    print(f"✅ Same bursts alone and interleaved with other sessions: {same}")
+    print(f"✅ Other seeds and later calls get other bursts: {distinct}")
+    if same and distinct:
+        print("✅ Seeded sessions: PASS")
+    else:
+        print("❌ Seeded sessions: FAIL")
+
+
+def test_server_replay(directory):
+    """Test that replaying a server's recording reproduces its results, and diffing a catalog change"""
+    print("\n🧪 Testing Replay of a Recorded Server")
+
+    record_dir = os.path.join(directory, "server")
+    env = dict(os.environ, SESSION_RECORD_DIR=record_dir, SESSION_RECORD_FLUSH_INTERVAL="0.1",
+               CATALOG_WATCH_INTERVAL="0", RATE_LIMITS="off")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(PORT)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://localhost:{PORT}/api"
+    sent = {}
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{base_url}/", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        starts = [{"mode": "interactive"}, {"mode": "interactive", "objects_crushed": ["cardboard_box"], "total_satisfaction": 5}]
+        for body in starts:
+            session_id = requests.post(f"{base_url}/session/start", json=body).json()["session_id"]
+            results = sent[session_id] = []
+            for i, obj in enumerate(crush_objects * 2):
+                crush = {"object_id": obj["id"], "force": 0.3 + i * 0.45, "position": {"x": i * 37, "y": 400 - i * 11}}
+                results.append(requests.post(f"{base_url}/session/{session_id}/crush", json=crush).json())
+            batch = [{"object_id": obj["id"], "force": 1.2} for obj in crush_objects]
+            results.extend(requests.post(f"{base_url}/session/{session_id}/crush/batch", json=batch).json()["results"])
+            totals = requests.post(f"{base_url}/session/{session_id}/end").json()["stats"]["total_satisfaction"]
+            sent[session_id] = (results, totals)
+    finally:
+        server.terminate()
+        server.wait()
+
+    recordings = read_recordings([os.path.join(record_dir, name) for name in os.listdir(record_dir)])
+    ordered = [recordings[session_id] for session_id in sent if session_id in recordings]
+    replayed = replay(ordered, crush_objects, processes=2, chunk_size=1)
+
+    matches = 0
+    for result in replayed:
+        results, total = sent[result["session_id"]]
+        expected = [[r["object"]["id"], r["satisfaction_gained"], r["simulation"]["deformation"], r["simulation"]["stage"],
+                     r["simulation"]["fractured"], r["simulation"]["burst"]["count"], burst_digest(r["simulation"]["burst"])]
+                    for r in results]
+        matches += result["outcomes"] == expected and result["total_satisfaction"] == total
+
+    changed = copy.deepcopy(crush_objects)
+    changed[0]["satisfaction_score"] += 5
+    report = diff({r["session_id"]: r for r in replayed},
+                  {r["session_id"]: r for r in replay(ordered, changed, processes=1)})
+    crushes_of_changed = 3 * len(sent)
+    diff_ok = (report["changed_sessions"] == len(sent) and report["changed_crushes"] == crushes_of_changed and
+               report["fields"]["satisfaction"] == crushes_of_changed and report["fields"]["burst"] == 0 and
+               list(report["objects"]) == [changed[0]["id"]] and
+               report["total_satisfaction"]["delta"] == 5 * crushes_of_changed)
+
+    print(f"✅ Sessions recorded: {len(ordered)}/{len(sent)}")
+    print(f"✅ Replays identical to what the server sent: {matches}/{len(sent)}")
+    print(f"✅ Catalog change diffed: {report['changed_crushes']} crushes, satisfaction {report['total_satisfaction']['delta']:+d}")
+    if len(ordered) == len(sent) and matches == len(sent) and diff_ok:
+        print("✅ Server replay: PASS")
+    else:
+        print("❌ Server replay: FAIL")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        test_recording_format(directory)
+        test_independent_sessions()
+        test_server_replay(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Session Storage Backend Testing for Crush Simulator
+Runs the MongoDB session backend against mongomock, no live server needed.
+"""
+
+import asyncio
+import os
+import sys
+
+import mongomock
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from catalog import Catalog
+from crush_history import CrushHistory
+from server import crush_objects
+from session_backend import MongoSessionBackend
+from session_store import SessionStore
+
+catalog = Catalog(crush_objects)
+
+
+def make_backend(collection, max_size=100_000):
+    return MongoSessionBackend(collection, SessionStore(max_size=max_size), lambda: catalog, max_batch=10_000)
+
+
+class FailingCollection:
+    """A collection whose bulk writes fail for some sessions, reported the way MongoDB does"""
+
+    def __init__(self, collection, failing):
+        self.collection = collection
+        self.failing = set(failing)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, operations, ordered=True):
+        errors = []
+        for index, operation in enumerate(operations):
+            if operation._filter["_id"] in self.failing:
+                errors.append({"index": index, "code": 11000, "errmsg": "write failed"})
+            else:
+                self.collection.bulk_write([operation])
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": 0,
+                                  "nUpserted": 0, "nMatched": len(operations) - len(errors),
+                                  "nModified": len(operations) - len(errors), "nRemoved": 0, "upserted": []})
+
+
+def new_session():
+    return {"user_id": None, "mode": "auto", "total_satisfaction": 0, "session_duration": 0,
+            "history": CrushHistory(), "created_at": "2024-01-01T00:00:00", "active": True}
+
+
+async def crush(backend, session_id, object_id):
+    session = await backend.get(session_id)
+    obj = catalog.get(object_id)
+    session["history"].append(catalog.codes[object_id])
+    session["total_satisfaction"] += obj["satisfaction_score"]
+    await backend.record_crush(session_id, object_id, obj["satisfaction_score"])
+
+
+async def test_write_behind_batching():
+    """Test that many crushes are coalesced into one bulk write"""
+    print("🧪 Testing Write-Behind Batching")
+
+    collection = mongomock.MongoClient().db.sessions
+    backend = make_backend(collection)
+    await backend.create("s1", new_session())
+
+    sequence = ["can_aluminum"] * 50 + ["phone_old"] * 30 + ["can_aluminum"] * 20
+    for object_id in sequence:
+        await crush(backend, "s1", object_id)
+
+    unflushed = collection.find_one({"_id": "s1"})["total_crushed"]
+    operations = await backend.flush()
+    document = collection.find_one({"_id": "s1"})
+    expected_satisfaction = sum(catalog.get(object_id)["satisfaction_score"] for object_id in sequence)
+
+    print(f"✅ Crushes visible before flush: {unflushed} (expected 0)")
+    print(f"✅ Bulk operations for {len(sequence)} crushes: {operations} (expected 1)")
+    if (unflushed == 0 and operations == 1 and
+            document["total_crushed"] == len(sequence) and
+            document["total_satisfaction"] == expected_satisfaction and
+            document["counts"] == {"can_aluminum": 70, "phone_old": 30} and
+            document["runs"] == [["can_aluminum", 50], ["phone_old", 30], ["can_aluminum", 20]]):
+        print("✅ Write-behind batching: PASS")
+    else:
+        print(f"❌ Write-behind batching: FAIL ({document})")
+
+
+async def test_restart_recovery():
+    """Test that a fresh backend reloads sessions written by another one"""
+    print("\n🧪 Testing Restart Recovery")
+
+    collection = mongomock.MongoClient().db.sessions
+    backend = make_backend(collection)
+    await backend.create("s1", new_session())
+    for object_id in ["glass_bottle", "glass_bottle", "cardboard_box"]:
+        await crush(backend, "s1", object_id)
+    await backend.flush()
+    await crush(backend, "s1", "glass_bottle")
+    await backend.close()
+
+    restarted = make_backend(collection)
+    session = await restarted.get("s1")
+    history = [catalog.object_for_code(code)["id"] for code in session["history"].slice(0, 10)]
+
+    if history == ["glass_bottle", "glass_bottle", "cardboard_box", "glass_bottle"] and session["total_satisfaction"] == 34:
+        print("✅ Restart recovery: PASS")
+    else:
+        print(f"❌ Restart recovery: FAIL ({history}, {session['total_satisfaction']})")
+
+
+async def test_end_session_flushes():
+    """Test that ending a session persists it as inactive"""
+    print("\n🧪 Testing End Session Flush")
+
+    collection = mongomock.MongoClient().db.sessions
+    backend = make_backend(collection)
+    await backend.create("s1", new_session())
+    await crush(backend, "s1", "plastic_bottle")
+
+    session = await backend.get("s1")
+    session["active"] = False
+    session["ended_at"] = "2024-01-01T00:05:00"
+    await backend.end("s1")
+    document = collection.find_one({"_id": "s1"})
+
+    if document["active"] is False and document["ended_at"] == "2024-01-01T00:05:00" and document["total_crushed"] == 1:
+        print("✅ End session flush: PASS")
+    else:
+        print(f"❌ End session flush: FAIL ({document})")
+
+
+async def test_partial_flush_failure():
+    """Test that only the updates a failed bulk write did not apply are written again"""
+    print("\n🧪 Testing Partial Flush Failure")
+
+    collection = FailingCollection(mongomock.MongoClient().db.sessions, failing=["s2"])
+    backend = make_backend(collection)
+    for session_id in ("s1", "s2"):
+        await backend.create(session_id, new_session())
+        for object_id in ["can_aluminum", "phone_old"]:
+            await crush(backend, session_id, object_id)
+    try:
+        await backend.flush()
+        raised = False
+    except BulkWriteError:
+        raised = True
+    collection.failing.clear()
+    await crush(backend, "s1", "can_aluminum")
+    await backend.flush()
+    written = {session_id: collection.find_one({"_id": session_id}) for session_id in ("s1", "s2")}
+    crushed = {session_id: document["total_crushed"] for session_id, document in written.items()}
+    runs = {session_id: document["runs"] for session_id, document in written.items()}
+
+    print(f"✅ Bulk write error raised: {raised}; totals after the retry: {crushed}")
+    if (raised and crushed == {"s1": 3, "s2": 2} and
+            runs["s1"] == [["can_aluminum", 1], ["phone_old", 1], ["can_aluminum", 1]]):
+        print("✅ Partial flush failure: PASS")
+    else:
+        print(f"❌ Partial flush failure: FAIL ({runs})")
+
+
+async def test_evicted_session_read():
+    """Test that a session evicted with unflushed crushes reads back with them"""
+    print("\n🧪 Testing Evicted Session Read")
+
+    collection = mongomock.MongoClient().db.sessions
+    backend = make_backend(collection, max_size=1)
+    await backend.create("s1", new_session())
+    for object_id in ["glass_bottle", "cardboard_box"]:
+        await crush(backend, "s1", object_id)
+    # Pushes s1 out of the local cache before anything was flushed
+    await backend.create("s2", new_session())
+    evicted = "s1" not in backend.store
+    session = await backend.get("s1")
+
+    print(f"✅ Evicted with buffered crushes: {evicted}; read back with {len(session['history'])} crushes")
+    if evicted and len(session["history"]) == 2 and session["total_satisfaction"] == 16:
+        print("✅ Evicted session read: PASS")
+    else:
+        print(f"❌ Evicted session read: FAIL ({session})")
+
+
+if __name__ == "__main__":
+    print("🧪 Starting Session Storage Tests for Crush Simulator Backend")
+    print("=" * 60)
+
+    asyncio.run(test_write_behind_batching())
+    asyncio.run(test_restart_recovery())
+    asyncio.run(test_end_session_flushes())
+    asyncio.run(test_partial_flush_failure())
+    asyncio.run(test_evicted_session_read())
+
+    print("\n" + "=" * 60)
+    print("🎉 Session storage testing completed!")
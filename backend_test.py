@@ -4,13 +4,16 @@ Comprehensive Backend API Testing for Crush Simulator
 Tests all endpoints and functionality as requested in the review.
 """
 
+import base64
 import requests
 import json
+from websockets.sync.client import connect as ws_connect
 import time
 from typing import Dict, Any
 
 # Backend URL from frontend .env
 BACKEND_URL = "http://localhost:8001"
+WS_URL = BACKEND_URL.replace("http", "ws", 1)
 
 class CrushSimulatorTester:
     def __init__(self):
@@ -49,6 +52,28 @@ class CrushSimulatorTester:
             self.log_test("API Health Check", False, f"Connection error: {str(e)}")
             return False
             
+    def test_readiness(self) -> bool:
+        """Test GET /api/ready - readiness once subsystems have warmed up"""
+        try:
+            deadline = time.time() + 10
+            response = requests.get(f"{self.base_url}/api/ready")
+            while response.status_code == 503 and time.time() < deadline:
+                time.sleep(0.1)
+                response = requests.get(f"{self.base_url}/api/ready")
+            data = response.json()
+            if response.status_code != 200 or not data["ready"]:
+                self.log_test("Readiness", False, f"HTTP {response.status_code}: {data}")
+                return False
+            if set(data["subsystems"].values()) != {"ready"} or "catalog" not in data["startup_ms"]:
+                self.log_test("Readiness", False, f"Unexpected readiness report: {data}")
+                return False
+                
+            self.log_test("Readiness", True, f"Ready: {', '.join(data['subsystems'])}")
+            return True
+        except Exception as e:
+            self.log_test("Readiness", False, f"Error: {str(e)}")
+            return False
+            
     def test_get_objects(self) -> bool:
         """Test GET /api/objects - get all crushable objects"""
         try:
@@ -109,6 +134,39 @@ class CrushSimulatorTester:
             self.log_test("Get Game Modes", False, f"Error: {str(e)}")
             return False
             
+    def test_asset_manifest(self) -> bool:
+        """Test GET /api/assets/manifest - sounds and vibration patterns of every object"""
+        try:
+            response = requests.get(f"{self.base_url}/api/assets/manifest")
+            if response.status_code != 200:
+                self.log_test("Asset Manifest", False, f"HTTP {response.status_code}")
+                return False
+            manifest = response.json()
+            objects = requests.get(f"{self.base_url}/api/objects").json()["objects"]
+            for obj in objects:
+                entry = manifest["objects"].get(obj["id"])
+                if entry is None or entry["vibration_pattern"] != obj["vibration_pattern"]:
+                    self.log_test("Asset Manifest", False, f"No matching entry for {obj['id']}: {entry}")
+                    return False
+                if entry["sound"] not in manifest["sounds"] and entry["sound"] not in manifest["missing"]:
+                    self.log_test("Asset Manifest", False, f"Sound {entry['sound']} neither served nor missing")
+                    return False
+            difficulties = [tier["difficulty"] for tier in manifest["tiers"]]
+            if difficulties != sorted({obj["difficulty"] for obj in objects}):
+                self.log_test("Asset Manifest", False, f"Unexpected tiers: {difficulties}")
+                return False
+            missing = requests.get(f"{self.base_url}/api/assets/{'0' * 16}/can_crush.mp3")
+            if missing.status_code != 404:
+                self.log_test("Asset Manifest", False, f"Unknown asset gave HTTP {missing.status_code}")
+                return False
+
+            self.log_test("Asset Manifest", True, f"{len(manifest['sounds'])} sounds served, "
+                          f"{len(manifest['missing'])} missing, tiers {difficulties}")
+            return True
+        except Exception as e:
+            self.log_test("Asset Manifest", False, f"Error: {str(e)}")
+            return False
+            
     def test_start_session(self) -> bool:
         """Test POST /api/session/start - create new game session"""
         try:
@@ -177,6 +235,265 @@ class CrushSimulatorTester:
             self.log_test("Crush Object", False, f"Error: {str(e)}")
             return False
             
+    def test_crush_batch(self) -> bool:
+        """Test POST /api/session/{id}/crush/batch - batch crush actions"""
+        if not self.session_id:
+            self.log_test("Crush Batch", False, "No active session")
+            return False
+            
+        try:
+            objects = requests.get(f"{self.base_url}/api/objects").json()["objects"]
+            before = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            
+            batch = [{"object_id": obj["id"], "force": 1.5, "position": {"x": 10, "y": 20}} for obj in objects]
+            response = requests.post(f"{self.base_url}/api/session/{self.session_id}/crush/batch", json=batch)
+            if response.status_code != 200:
+                self.log_test("Crush Batch", False, f"HTTP {response.status_code}")
+                return False
+                
+            data = response.json()
+            expected_gain = sum(obj["satisfaction_score"] for obj in objects)
+            if len(data["results"]) != len(batch) or data["satisfaction_gained"] != expected_gain:
+                self.log_test("Crush Batch", False, f"Unexpected batch result: {data['crushed']} crushed, +{data['satisfaction_gained']}")
+                return False
+                
+            # A batch with an unknown object must not change the session at all
+            bad_batch = [{"object_id": objects[0]["id"]}, {"object_id": "invalid-object"}]
+            bad_response = requests.post(f"{self.base_url}/api/session/{self.session_id}/crush/batch", json=bad_batch)
+            after = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            if bad_response.status_code != 404 or after["total_crushed"] != before["total_crushed"] + len(batch):
+                self.log_test("Crush Batch", False, "Rejected batch was partially applied")
+                return False
+                
+            self.log_test("Crush Batch", True, f"Crushed {data['crushed']} objects in one request, +{data['satisfaction_gained']} satisfaction")
+            return True
+        except Exception as e:
+            self.log_test("Crush Batch", False, f"Error: {str(e)}")
+            return False
+            
+    def test_crush_simulation(self) -> bool:
+        """Test the deformation and particle burst returned with every crush"""
+        if not self.session_id:
+            self.log_test("Crush Simulation", False, "No active session")
+            return False
+            
+        try:
+            url = f"{self.base_url}/api/session/{self.session_id}/crush"
+            soft = requests.post(url, json={"object_id": "glass_bottle", "force": 0.2, "position": {"x": 50, "y": 60}}).json()
+            hard = requests.post(url, json={"object_id": "glass_bottle", "force": 3.0, "position": {"x": 50, "y": 60}}).json()
+            batch = requests.post(f"{url}/batch", json=[{"object_id": "cardboard_box", "force": 2.0}] * 3).json()
+            
+            simulations = [soft["simulation"], hard["simulation"]] + [result["simulation"] for result in batch["results"]]
+            for simulation in simulations:
+                burst = simulation["burst"]
+                if burst["format"] != "f32le:x,y,vx,vy,size" or len(base64.b64decode(burst["data"])) != burst["count"] * 20:
+                    self.log_test("Crush Simulation", False, f"Malformed burst: {burst['count']} particles")
+                    return False
+            if not hard["simulation"]["deformation"] > soft["simulation"]["deformation"]:
+                self.log_test("Crush Simulation", False, "Harder crush did not deform the object more")
+                return False
+            if not hard["simulation"]["burst"]["count"] > soft["simulation"]["burst"]["count"]:
+                self.log_test("Crush Simulation", False, "Harder crush did not burst into more particles")
+                return False
+                
+            self.log_test("Crush Simulation", True, f"Glass bottle: {soft['simulation']['stage']} at 0.2, {hard['simulation']['stage']} at 3.0 with {hard['simulation']['burst']['count']} particles")
+            return True
+        except Exception as e:
+            self.log_test("Crush Simulation", False, f"Error: {str(e)}")
+            return False
+            
+    def test_wire_formats(self) -> bool:
+        """Test slim JSON and packed struct responses negotiated with Accept"""
+        if not self.session_id:
+            self.log_test("Wire Formats", False, "No active session")
+            return False
+            
+        try:
+            objects = requests.get(f"{self.base_url}/api/objects").json()["objects"]
+            codes = {obj["id"]: obj["code"] for obj in objects}
+            url = f"{self.base_url}/api/session/{self.session_id}"
+            slim_headers = {"Accept": "application/vnd.crush.slim+json"}
+            struct_headers = {"Accept": "application/vnd.crush.struct"}
+            crush = {"object_id": "phone_old", "force": 2.0, "position": {"x": 5, "y": 5}}
+            
+            full = requests.post(f"{url}/crush", json=crush)
+            slim = requests.post(f"{url}/crush", json=crush, headers=slim_headers)
+            packed = requests.post(f"{url}/crush", json=crush, headers=struct_headers)
+            slim_data = slim.json()
+            if slim.headers["content-type"] != slim_headers["Accept"] or "object" in slim_data or slim_data["object_id"] != "phone_old":
+                self.log_test("Wire Formats", False, f"Unexpected slim crush: {slim_data}")
+                return False
+            body = packed.content
+            # Frame (2 bytes), then an 18 byte result ending in its particle count, then the burst
+            particles = int.from_bytes(body[18:20], "little")
+            if packed.headers["content-type"] != struct_headers["Accept"] or body[:2] != b"C\x01" \
+                    or int.from_bytes(body[2:4], "little") != codes["phone_old"] or len(body) != 20 + particles * 20:
+                self.log_test("Wire Formats", False, f"Unexpected packed crush of {len(body)} bytes")
+                return False
+                
+            batch = [crush] * 10
+            slim_batch = requests.post(f"{url}/crush/batch", json=batch, headers=slim_headers).json()
+            packed_batch = requests.post(f"{url}/crush/batch", json=batch, headers=struct_headers).content
+            if len(slim_batch["results"]) != 10 or packed_batch[:2] != b"B\x01" \
+                    or int.from_bytes(packed_batch[2:6], "little") != 10:
+                self.log_test("Wire Formats", False, "Unexpected slim or packed batch")
+                return False
+                
+            stats = requests.get(f"{url}/stats").json()
+            packed_stats = requests.get(f"{url}/stats", headers=struct_headers).content
+            if packed_stats[:2] != b"S\x01" or int.from_bytes(packed_stats[2:10], "little") != stats["total_crushed"]:
+                self.log_test("Wire Formats", False, "Packed stats disagree with JSON stats")
+                return False
+                
+            self.log_test("Wire Formats", True, f"Crush result: {len(full.content)} bytes full, {len(slim.content)} slim, {len(body)} packed")
+            return True
+        except Exception as e:
+            self.log_test("Wire Formats", False, f"Error: {str(e)}")
+            return False
+            
+    def test_websocket_crush(self) -> bool:
+        """Test /api/session/{id}/ws - streamed crush actions"""
+        if not self.session_id:
+            self.log_test("WebSocket Crush", False, "No active session")
+            return False
+            
+        try:
+            before = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            with ws_connect(f"{WS_URL}/api/session/{self.session_id}/ws") as ws:
+                for seq in range(1, 4):
+                    ws.send(json.dumps({"type": "crush", "seq": seq, "object_id": "can_aluminum", "force": 2.0}))
+                replies = [json.loads(ws.recv(timeout=5)) for _ in range(3)]
+                
+                ws.send(json.dumps({"type": "crush", "seq": 4, "object_id": "invalid-object"}))
+                error = json.loads(ws.recv(timeout=5))
+                
+            after = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            if [reply.get("seq") for reply in replies] != [1, 2, 3] or any(r["type"] != "crush_result" for r in replies):
+                self.log_test("WebSocket Crush", False, f"Unexpected replies: {replies}")
+                return False
+            if error["type"] != "error" or error["status"] != 404:
+                self.log_test("WebSocket Crush", False, f"Expected 404 error, got {error}")
+                return False
+            if after["total_crushed"] != before["total_crushed"] + 3 or after["total_satisfaction"] != replies[-1]["total_satisfaction"]:
+                self.log_test("WebSocket Crush", False, "Stats do not match streamed results")
+                return False
+                
+            self.log_test("WebSocket Crush", True, f"3 crushes streamed, total satisfaction {after['total_satisfaction']}")
+            return True
+        except Exception as e:
+            self.log_test("WebSocket Crush", False, f"Error: {str(e)}")
+            return False
+            
+    def test_auto_crush(self) -> bool:
+        """Test POST /api/session/{id}/auto/start and /auto/stop - server-side auto mode"""
+        if not self.session_id:
+            self.log_test("Auto Crush", False, "No active session")
+            return False
+            
+        try:
+            before = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            response = requests.post(f"{self.base_url}/api/session/{self.session_id}/auto/start", params={"speed": 50})
+            if response.status_code != 200:
+                self.log_test("Auto Crush", False, f"HTTP {response.status_code}")
+                return False
+                
+            time.sleep(0.5)
+            requests.post(f"{self.base_url}/api/session/{self.session_id}/auto/stop")
+            stopped = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            time.sleep(0.3)
+            after = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            
+            crushed = stopped["total_crushed"] - before["total_crushed"]
+            if crushed <= 0:
+                self.log_test("Auto Crush", False, "No objects were crushed automatically")
+                return False
+            if after["total_crushed"] != stopped["total_crushed"]:
+                self.log_test("Auto Crush", False, "Crushing continued after stop")
+                return False
+                
+            self.log_test("Auto Crush", True, f"{crushed} objects crushed by the server scheduler")
+            return True
+        except Exception as e:
+            self.log_test("Auto Crush", False, f"Error: {str(e)}")
+            return False
+            
+    def test_leaderboards(self) -> bool:
+        """Test GET /api/leaderboard/{metric} and /api/session/{id}/rank - ranked sessions"""
+        try:
+            sessions = []
+            for crushes in (3, 1, 2):
+                session_id = requests.post(f"{self.base_url}/api/session/start", json={"mode": "interactive"}).json()["session_id"]
+                body = [{"object_id": "phone_old"}] * crushes
+                requests.post(f"{self.base_url}/api/session/{session_id}/crush/batch", json=body)
+                sessions.append(session_id)
+                
+            ranks = []
+            for session_id in sessions:
+                response = requests.get(f"{self.base_url}/api/session/{session_id}/rank",
+                                        params={"metric": "crushed", "window": "daily", "type": "electronics"})
+                ranks.append(response.json()["rank"])
+            if not (ranks[0] < ranks[2] < ranks[1]):
+                self.log_test("Leaderboards", False, f"Ranks out of order: {ranks}")
+                return False
+                
+            response = requests.get(f"{self.base_url}/api/leaderboard/crushed",
+                                    params={"window": "weekly", "type": "electronics", "offset": ranks[0] - 1, "limit": 2})
+            board = response.json()
+            if response.status_code != 200 or [entry["rank"] for entry in board["entries"]] != [ranks[0], ranks[0] + 1]:
+                self.log_test("Leaderboards", False, f"Bad page: {board}")
+                return False
+            scores = [entry["score"] for entry in board["entries"]]
+            if scores != sorted(scores, reverse=True):
+                self.log_test("Leaderboards", False, f"Page not sorted: {scores}")
+                return False
+                
+            unknown = requests.get(f"{self.base_url}/api/leaderboard/crushed", params={"type": "no_such_type"})
+            bad_window = requests.get(f"{self.base_url}/api/leaderboard/crushed", params={"window": "monthly"})
+            if unknown.status_code != 404 or bad_window.status_code != 422:
+                self.log_test("Leaderboards", False, f"Unknown type {unknown.status_code}, bad window {bad_window.status_code}")
+                return False
+                
+            self.log_test("Leaderboards", True, f"Ranks {ranks} of {board['total']} sessions in {board['period']}")
+            return True
+        except Exception as e:
+            self.log_test("Leaderboards", False, f"Error: {str(e)}")
+            return False
+            
+    def test_analytics(self) -> bool:
+        """Test GET /api/analytics - aggregates rolled up from crush events"""
+        try:
+            before = requests.get(f"{self.base_url}/api/analytics", params={"object_id": "glass_bottle"}).json()
+            before_count = before["objects"].get("glass_bottle", {}).get("count", 0)
+            session_id = requests.post(f"{self.base_url}/api/session/start", json={"mode": "interactive"}).json()["session_id"]
+            body = [{"object_id": "glass_bottle", "force": 2.5, "position": {"x": -490, "y": 490}}] * 4
+            requests.post(f"{self.base_url}/api/session/{session_id}/crush/batch", json=body)
+            
+            # Events are aggregated asynchronously
+            for _ in range(20):
+                report = requests.get(f"{self.base_url}/api/analytics", params={"object_id": "glass_bottle"}).json()
+                glass = report["objects"].get("glass_bottle")
+                if glass and glass["count"] >= before_count + 4:
+                    break
+                time.sleep(0.05)
+            else:
+                self.log_test("Analytics", False, "Crush events were not aggregated")
+                return False
+                
+            heatmap = glass["heatmap"]
+            corner = heatmap["cells"][heatmap["size"] - 1][0]
+            if corner < 4 or len(glass["force_histogram"]["counts"]) != len(glass["force_histogram"]["buckets"]):
+                self.log_test("Analytics", False, f"Unexpected aggregates: {glass}")
+                return False
+            if requests.get(f"{self.base_url}/api/analytics", params={"object_id": "nope"}).status_code != 404:
+                self.log_test("Analytics", False, "Unknown object did not return 404")
+                return False
+                
+            self.log_test("Analytics", True, f"{glass['count']} glass crushes, mean force {glass['mean_force']:.2f}")
+            return True
+        except Exception as e:
+            self.log_test("Analytics", False, f"Error: {str(e)}")
+            return False
+            
     def test_get_session_stats(self) -> bool:
         """Test GET /api/session/{id}/stats - get session statistics"""
         if not self.session_id:
@@ -203,6 +520,86 @@ class CrushSimulatorTester:
             self.log_test("Get Session Stats", False, f"Error: {str(e)}")
             return False
             
+    def test_session_history(self) -> bool:
+        """Test GET /api/session/{id}/history - paginated raw crush sequence"""
+        if not self.session_id:
+            self.log_test("Session History", False, "No active session")
+            return False
+            
+        try:
+            stats = requests.get(f"{self.base_url}/api/session/{self.session_id}/stats").json()
+            response = requests.get(
+                f"{self.base_url}/api/session/{self.session_id}/history",
+                params={"offset": 0, "limit": 100}
+            )
+            if response.status_code != 200:
+                self.log_test("Session History", False, f"HTTP {response.status_code}")
+                return False
+                
+            data = response.json()
+            if data["total"] != stats["total_crushed"] or len(data["objects_crushed"]) != stats["total_crushed"]:
+                self.log_test("Session History", False, f"History length {data['total']} != {stats['total_crushed']}")
+                return False
+                
+            # Alternating objects, as auto mode crushes them, then one object over and over
+            sequence = ["can_aluminum", "phone_old"] * 15 + ["glass_bottle"] * 20
+            session_id = requests.post(f"{self.base_url}/api/session/start", json={"mode": "interactive"}).json()["session_id"]
+            for start in range(0, len(sequence), 10):
+                requests.post(f"{self.base_url}/api/session/{session_id}/crush/batch",
+                              json=[{"object_id": object_id} for object_id in sequence[start:start + 10]])
+            page = requests.get(f"{self.base_url}/api/session/{session_id}/history",
+                                params={"offset": 25, "limit": 10}).json()
+            streamed = requests.get(f"{self.base_url}/api/session/{session_id}/history", params={"stream": "true"})
+            runs = [json.loads(line) for line in streamed.text.splitlines()]
+            expected_runs = [{"object_id": object_id, "count": 1} for object_id in sequence[:30]]
+            expected_runs.append({"object_id": "glass_bottle", "count": 20})
+            if page["total"] != len(sequence) or page["objects_crushed"] != sequence[25:35] or runs != expected_runs:
+                self.log_test("Session History", False, f"Alternating history read back as {page}, {runs}")
+                return False
+                
+            self.log_test("Session History", True, f"{data['total']} crushes in history")
+            return True
+        except Exception as e:
+            self.log_test("Session History", False, f"Error: {str(e)}")
+            return False
+            
+    def test_next_objects(self) -> bool:
+        """Test GET /api/session/{id}/next - recommendations learned from crush sequences"""
+        try:
+            def start():
+                return requests.post(f"{self.base_url}/api/session/start", json={"mode": "mixed"}).json()["session_id"]
+            
+            def glass_after_can():
+                session_id = start()
+                requests.post(f"{self.base_url}/api/session/{session_id}/crush", json={"object_id": "can_aluminum"})
+                data = requests.get(f"{self.base_url}/api/session/{session_id}/next", params={"limit": 100}).json()
+                return {item["object_id"]: item["score"] for item in data["recommendations"]}, data
+            
+            before, _ = glass_after_can()
+            trainer = start()
+            requests.post(f"{self.base_url}/api/session/{trainer}/crush/batch",
+                          json=[{"object_id": object_id} for object_id in ["can_aluminum", "glass_bottle"] * 50])
+            after, full = glass_after_can()
+            
+            top = requests.get(f"{self.base_url}/api/session/{full['session_id']}/next", params={"limit": 2}).json()
+            missing = requests.get(f"{self.base_url}/api/session/no-such-session/next")
+            scores = [item["score"] for item in full["recommendations"]]
+            if len(top["recommendations"]) != 2 or scores != sorted(scores, reverse=True) or abs(sum(scores) - 1) > 0.01:
+                self.log_test("Next Objects", False, f"Unexpected recommendations: {full}")
+                return False
+            if not after["glass_bottle"] > before["glass_bottle"]:
+                self.log_test("Next Objects", False, f"Glass bottle after a can went from {before['glass_bottle']} to {after['glass_bottle']}")
+                return False
+            if missing.status_code != 404:
+                self.log_test("Next Objects", False, f"Unknown session gave HTTP {missing.status_code}")
+                return False
+                
+            self.log_test("Next Objects", True, f"Glass bottle after a can: {before['glass_bottle']} -> {after['glass_bottle']} once learned")
+            return True
+        except Exception as e:
+            self.log_test("Next Objects", False, f"Error: {str(e)}")
+            return False
+            
     def test_end_session(self) -> bool:
         """Test POST /api/session/{id}/end - end session"""
         if not self.session_id:
@@ -289,6 +686,59 @@ class CrushSimulatorTester:
             self.log_test("Object Details", False, f"Error: {str(e)}")
             return False
             
+    def test_filter_objects(self) -> bool:
+        """Test GET /api/objects?type=&difficulty= - filtered object queries"""
+        try:
+            objects = requests.get(f"{self.base_url}/api/objects").json()["objects"]
+            sample = objects[0]
+            
+            response = requests.get(
+                f"{self.base_url}/api/objects",
+                params={"type": sample["type"], "difficulty": sample["difficulty"]}
+            )
+            if response.status_code != 200:
+                self.log_test("Filter Objects", False, f"HTTP {response.status_code}")
+                return False
+                
+            filtered = response.json()["objects"]
+            expected = [obj["id"] for obj in objects
+                        if obj["type"] == sample["type"] and obj["difficulty"] == sample["difficulty"]]
+            if [obj["id"] for obj in filtered] != expected:
+                self.log_test("Filter Objects", False, f"Expected {expected}, got {[obj['id'] for obj in filtered]}")
+                return False
+                
+            empty = requests.get(f"{self.base_url}/api/objects", params={"type": "no-such-type"}).json()["objects"]
+            if empty:
+                self.log_test("Filter Objects", False, "Unknown type should match nothing")
+                return False
+                
+            self.log_test("Filter Objects", True, f"{len(filtered)} objects matched type={sample['type']}")
+            return True
+        except Exception as e:
+            self.log_test("Filter Objects", False, f"Error: {str(e)}")
+            return False
+            
+    def test_cached_responses(self) -> bool:
+        """Test ETag / If-None-Match handling on static endpoints"""
+        try:
+            for path in ["/api/objects", "/api/modes", "/api/objects/can_aluminum"]:
+                response = requests.get(f"{self.base_url}{path}")
+                etag = response.headers.get("ETag")
+                if response.status_code != 200 or not etag:
+                    self.log_test("Cached Responses", False, f"{path}: missing ETag")
+                    return False
+                    
+                revalidated = requests.get(f"{self.base_url}{path}", headers={"If-None-Match": etag})
+                if revalidated.status_code != 304:
+                    self.log_test("Cached Responses", False, f"{path}: expected 304, got {revalidated.status_code}")
+                    return False
+                    
+            self.log_test("Cached Responses", True, "ETags issued and revalidated with 304")
+            return True
+        except Exception as e:
+            self.log_test("Cached Responses", False, f"Error: {str(e)}")
+            return False
+            
     def run_all_tests(self):
         """Run all backend API tests"""
         print("🧪 Starting Crush Simulator Backend API Tests")
@@ -297,12 +747,25 @@ class CrushSimulatorTester:
         # Test sequence
         tests = [
             self.test_api_health,
+            self.test_readiness,
             self.test_get_objects,
             self.test_object_details,
+            self.test_filter_objects,
+            self.test_cached_responses,
             self.test_get_modes,
+            self.test_asset_manifest,
             self.test_start_session,
             self.test_crush_object,
+            self.test_crush_batch,
+            self.test_crush_simulation,
+            self.test_wire_formats,
+            self.test_websocket_crush,
+            self.test_auto_crush,
             self.test_get_session_stats,
+            self.test_session_history,
+            self.test_next_objects,
+            self.test_leaderboards,
+            self.test_analytics,
             self.test_end_session,
             self.test_multiple_game_modes
         ]
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+API Load and Latency Benchmark for Crush Simulator
+Drives every route either in process (ASGI transport) or through a real
+uvicorn server, at a configurable concurrency, and reports p50/p95/p99
+latency, requests per second and memory growth per scenario.
+
+Results are written as JSON so runs can be compared across commits:
+
+    python benchmarks/api_bench.py --output bench.json
+    python benchmarks/api_bench.py --baseline bench.json --max-regression 0.2
+
+Rate limiting stays on with every limit scaled out of reach, so its cost is
+part of every run without refusing the benchmark's traffic; compare with
+--rate-limits off to see that cost.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+OBJECT_IDS = ["can_aluminum", "cardboard_box", "phone_old", "glass_bottle", "plastic_bottle"]
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Current resident set size of a process (Linux), or peak RSS as a fallback"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Context:
+    """Sessions shared by the scenarios of one run"""
+
+    def __init__(self):
+        self.sessions: List[str] = []
+        self.spare_sessions: List[str] = []
+        self.asset_urls: List[str] = []
+        self.bundle_urls: List[str] = []
+        self._round_robin = None
+
+    def next_session(self) -> str:
+        if self._round_robin is None:
+            self._round_robin = itertools.cycle(self.sessions)
+        return next(self._round_robin)
+
+
+async def start_session(client: httpx.AsyncClient) -> str:
+    response = await client.post("/api/session/start", json={"mode": "auto"})
+    return response.json()["session_id"]
+
+
+def crush_body(i: int) -> dict:
+    return {"object_id": OBJECT_IDS[i % len(OBJECT_IDS)], "force": 1.0, "position": {"x": i % 300, "y": i % 200}}
+
+
+def sample_assets(directory: str) -> str:
+    """Stand-in files for every catalog sound, 20-60 KB like short sound effects, unless present"""
+    with open(os.path.join(BACKEND_DIR, "crush_objects.json")) as f:
+        names = sorted({obj["sound"] for obj in json.load(f)["objects"]})
+    os.makedirs(directory, exist_ok=True)
+    for i, name in enumerate(names):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            with open(path, "wb") as sound:
+                sound.write(os.urandom(20_000 + 10_000 * (i % 5)))
+    return directory
+
+
+# --rate-limits choice -> server environment
+RATE_LIMIT_ENV = {
+    "scaled": {"RATE_LIMIT_SCALE": "1e9"},
+    "off": {"RATE_LIMITS": "off"},
+    "default": {},
+}
+
+# name -> (route template, request function)
+SCENARIOS: Dict[str, tuple] = {
+    "health": ("/api/", lambda c, ctx, i: c.get("/api/")),
+    "ready": ("/api/ready", lambda c, ctx, i: c.get("/api/ready")),
+    "objects": ("/api/objects", lambda c, ctx, i: c.get("/api/objects")),
+    "objects_filtered": ("/api/objects", lambda c, ctx, i: c.get("/api/objects", params={"difficulty": 1})),
+    "object_details": ("/api/objects/{object_id}",
+                       lambda c, ctx, i: c.get(f"/api/objects/{OBJECT_IDS[i % len(OBJECT_IDS)]}")),
+    "modes": ("/api/modes", lambda c, ctx, i: c.get("/api/modes")),
+    "asset_manifest": ("/api/assets/manifest", lambda c, ctx, i: c.get("/api/assets/manifest")),
+    "asset": ("/api/assets/{digest}/{name}",
+              lambda c, ctx, i: c.get(ctx.asset_urls[i % len(ctx.asset_urls)])),
+    "asset_range": ("/api/assets/{digest}/{name}",
+                    lambda c, ctx, i: c.get(ctx.asset_urls[i % len(ctx.asset_urls)], headers={"Range": "bytes=0-4095"})),
+    "asset_bundle": ("/api/assets/bundle/{digest}",
+                     lambda c, ctx, i: c.get(ctx.bundle_urls[i % len(ctx.bundle_urls)])),
+    "session_start": ("/api/session/start",
+                      lambda c, ctx, i: c.post("/api/session/start", json={"mode": "interactive"})),
+    "crush": ("/api/session/{session_id}/crush",
+              lambda c, ctx, i: c.post(f"/api/session/{ctx.next_session()}/crush", json=crush_body(i))),
+    "crush_batch": ("/api/session/{session_id}/crush/batch",
+                    lambda c, ctx, i: c.post(f"/api/session/{ctx.next_session()}/crush/batch",
+                                             json=[crush_body(i + j) for j in range(50)])),
+    "stats": ("/api/session/{session_id}/stats",
+              lambda c, ctx, i: c.get(f"/api/session/{ctx.next_session()}/stats")),
+    "history": ("/api/session/{session_id}/history",
+                lambda c, ctx, i: c.get(f"/api/session/{ctx.next_session()}/history", params={"limit": 100})),
+    "auto_start": ("/api/session/{session_id}/auto/start",
+                   lambda c, ctx, i: c.post(f"/api/session/{ctx.next_session()}/auto/start", params={"speed": 0.01})),
+    "auto_stop": ("/api/session/{session_id}/auto/stop",
+                  lambda c, ctx, i: c.post(f"/api/session/{ctx.next_session()}/auto/stop")),
+    "next": ("/api/session/{session_id}/next",
+             lambda c, ctx, i: c.get(f"/api/session/{ctx.next_session()}/next")),
+    "leaderboard": ("/api/leaderboard/{metric}",
+                    lambda c, ctx, i: c.get("/api/leaderboard/satisfaction", params={"window": "daily", "offset": i % 50})),
+    "rank": ("/api/session/{session_id}/rank",
+             lambda c, ctx, i: c.get(f"/api/session/{ctx.next_session()}/rank", params={"metric": "crushed"})),
+    "analytics": ("/api/analytics", lambda c, ctx, i: c.get("/api/analytics")),
+    "session_metrics": ("/api/sessions/metrics", lambda c, ctx, i: c.get("/api/sessions/metrics")),
+    "metrics": ("/metrics", lambda c, ctx, i: c.get("/metrics")),
+    "end": ("/api/session/{session_id}/end",
+            lambda c, ctx, i: c.post(f"/api/session/{ctx.spare_sessions.pop()}/end")),
+}
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, request: Callable,
+                       requests_total: int, concurrency: int, memory: Callable[[], int]) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= requests_total:
+                return
+            started = time.perf_counter()
+            response = await request(client, ctx, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    memory_before = memory()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "memory_growth_kb": round((memory() - memory_before) / 1024, 1),
+    }
+
+
+async def run_websocket(base_url: str, ctx: Context, requests_total: int, concurrency: int) -> dict:
+    """Per-message round trip on the crush WebSocket (uvicorn mode only)"""
+    try:
+        from websockets.asyncio.client import connect
+    except ImportError:  # websockets < 13
+        from websockets.client import connect
+
+    latencies: List[float] = []
+    per_socket = max(requests_total // concurrency, 1)
+    ws_url = base_url.replace("http", "ws", 1)
+
+    async def worker(n: int):
+        async with connect(f"{ws_url}/api/session/{ctx.next_session()}/ws") as ws:
+            for seq in range(per_socket):
+                started = time.perf_counter()
+                await ws.send(json.dumps({"type": "crush", "seq": seq, **crush_body(n + seq)}))
+                while json.loads(await ws.recv()).get("seq") != seq:
+                    pass
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": 0,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "memory_growth_kb": None,
+    }
+
+
+def uncovered_routes(app) -> List[str]:
+    covered = {route for route, _ in SCENARIOS.values()} | {"/api/session/{session_id}/ws"}
+    paths = {getattr(route, "path", None) for route in app.routes}
+    return sorted(path for path in paths if path and path.startswith("/api") and path not in covered)
+
+
+async def run_benchmark(mode: str, scenarios: List[str], requests_total: int, concurrency: int,
+                        port: int) -> dict:
+    server_process = None
+    if mode == "asgi":
+        import server
+
+        transport = httpx.ASGITransport(app=server.app)
+        base_url = "http://bench"
+        memory = rss_bytes
+        missing = uncovered_routes(server.app)
+    else:
+        server_process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+        )
+        transport = None
+        base_url = f"http://127.0.0.1:{port}"
+        memory = lambda: rss_bytes(server_process.pid)
+        missing = []
+
+    results = {}
+    try:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits) as client:
+            if server_process is not None:
+                await wait_until_ready(client)
+
+            ctx = Context()
+            ctx.sessions = [await start_session(client) for _ in range(max(concurrency, 16))]
+            manifest = (await client.get("/api/assets/manifest")).json()
+            ctx.asset_urls = [sound["url"] for sound in manifest["sounds"].values()]
+            ctx.bundle_urls = [tier["bundle"]["url"] for tier in manifest["tiers"] if "bundle" in tier]
+            if "end" in scenarios:
+                ctx.spare_sessions = [await start_session(client) for _ in range(requests_total)]
+
+            for name in scenarios:
+                if name == "websocket":
+                    if mode == "asgi":
+                        continue
+                    results[name] = await run_websocket(base_url, ctx, requests_total, concurrency)
+                else:
+                    _, request = SCENARIOS[name]
+                    results[name] = await run_scenario(client, ctx, request, requests_total, concurrency, memory)
+                print(f"{name:18s} {results[name]['rps']:>10.1f} rps   p50 {results[name]['p50_ms']:.3f} ms   "
+                      f"p95 {results[name]['p95_ms']:.3f} ms   p99 {results[name]['p99_ms']:.3f} ms")
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "mode": mode,
+        "requests_per_scenario": requests_total,
+        "concurrency": concurrency,
+        "rate_limits": os.environ.get("RATE_LIMITS", "on"),
+        "rate_limit_scale": os.environ.get("RATE_LIMIT_SCALE", "1"),
+        "uncovered_routes": missing,
+        "scenarios": results,
+    }
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/api/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> List[str]:
+    """List scenarios whose p95 latency or throughput regressed beyond the threshold"""
+    regressions = []
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    all_scenarios = list(SCENARIOS) + ["websocket"]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenarios", default=",".join(all_scenarios),
+                        help=f"comma separated subset of: {', '.join(all_scenarios)}")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--rate-limits", choices=list(RATE_LIMIT_ENV), default="scaled",
+                        help="scaled: limiter on but out of reach; off: no limiter; default: production limits")
+    args = parser.parse_args()
+    # Set before the server is imported or started, both read it at import
+    os.environ.update(RATE_LIMIT_ENV[args.rate_limits])
+    if "ASSETS_DIR" not in os.environ:
+        os.environ["ASSETS_DIR"] = sample_assets(os.path.join(tempfile.gettempdir(), "crush-bench-assets"))
+
+    selected = [name for name in args.scenarios.split(",") if name]
+    unknown = set(selected) - set(all_scenarios)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    result = asyncio.run(run_benchmark(args.mode, selected, args.requests, args.concurrency, args.port))
+    if result["uncovered_routes"]:
+        print(f"⚠️  Routes without a scenario: {', '.join(result['uncovered_routes'])}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.max_regression)
+        if regressions:
+            print("❌ Regressions:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
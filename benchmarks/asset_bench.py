@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Asset Loading Benchmark for Crush Simulator
+Compares what a cold client waits for before the easiest objects' sounds
+are playable: fetching every sound on its own, as the frontend used to,
+against the manifest followed by the easiest tier's bundle. Requests go to
+the app in process; network time is modelled from each profile's round
+trip and bandwidth, with parallel downloads sharing the bandwidth fairly.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from api_bench import sample_assets
+
+# name -> (round trip seconds, bandwidth bytes per second)
+PROFILES = {
+    "3g": (0.3, 1.6e6 / 8),
+    "4g": (0.1, 9e6 / 8),
+    "wifi": (0.02, 50e6 / 8),
+}
+
+
+def shared_finish(sizes, size) -> float:
+    """Bytes sent by the time a download of size ends, when all of sizes start together and share the link"""
+    return sum(min(other, size) for other in sizes)
+
+
+async def timed(client: httpx.AsyncClient, url: str, **kwargs):
+    started = time.perf_counter()
+    response = await client.get(url, **kwargs)
+    return response, time.perf_counter() - started
+
+
+async def measure(rounds: int) -> dict:
+    import server
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench") as client:
+        response, _ = await timed(client, "/api/assets/manifest")
+        manifest = response.json()
+        first_tier = next(tier for tier in manifest["tiers"] if "bundle" in tier)
+        sounds = list(manifest["sounds"].values())
+        first_tier_sounds = [manifest["sounds"][name] for name in first_tier["bundle"]["members"]]
+
+        manifest_s = bundle_s = separate_s = revalidate_s = 0.0
+        for _ in range(rounds):
+            response, elapsed = await timed(client, "/api/assets/manifest", headers={"Accept-Encoding": "gzip"})
+            manifest_s += elapsed
+            manifest_bytes = len(response.content) + 300
+            _, elapsed = await timed(client, first_tier["bundle"]["url"])
+            bundle_s += elapsed
+            # Parallel on the wire, so the slowest one counts
+            separate_s += max([(await timed(client, sound["url"]))[1] for sound in sounds])
+            etag = response.headers["etag"]
+            _, elapsed = await timed(client, "/api/assets/manifest", headers={"If-None-Match": etag})
+            revalidate_s += elapsed
+
+    return {
+        "sounds": len(sounds),
+        "sound_bytes": sum(sound["size"] for sound in sounds),
+        "first_tier_sounds": len(first_tier_sounds),
+        "first_tier_bundle_bytes": first_tier["bundle"]["size"],
+        "largest_first_tier_sound": max(sound["size"] for sound in first_tier_sounds),
+        "sizes": [sound["size"] for sound in sounds],
+        "manifest_bytes": manifest_bytes,
+        "server_ms": {
+            "manifest": round(manifest_s / rounds * 1000, 3),
+            "first_tier_bundle": round(bundle_s / rounds * 1000, 3),
+            "every_sound": round(separate_s / rounds * 1000, 3),
+            "manifest_revalidation": round(revalidate_s / rounds * 1000, 3),
+        },
+    }
+
+
+def model(measured: dict, rtt: float, bandwidth: float) -> dict:
+    server_s = {name: ms / 1000 for name, ms in measured["server_ms"].items()}
+    # Before: every sound requested at once, the easiest tier's playable when its largest one arrives
+    separate = rtt + server_s["every_sound"] + shared_finish(
+        measured["sizes"], measured["largest_first_tier_sound"]) / bandwidth
+    # After: the manifest, then the easiest tier's bundle, which its Link header lets a browser start early
+    bundled = (2 * rtt + server_s["manifest"] + server_s["first_tier_bundle"] +
+               (measured["manifest_bytes"] + measured["first_tier_bundle_bytes"]) / bandwidth)
+    # Returning client: sounds come from the HTTP cache, the manifest answers 304
+    warm = rtt + server_s["manifest_revalidation"]
+    return {
+        "separate_ms": round(separate * 1000, 1),
+        "bundled_ms": round(bundled * 1000, 1),
+        "warm_ms": round(warm * 1000, 1),
+        "separate_requests": measured["sounds"],
+        "bundled_requests": 2,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    if "ASSETS_DIR" not in os.environ:
+        os.environ["ASSETS_DIR"] = sample_assets(os.path.join(tempfile.gettempdir(), "crush-bench-assets"))
+
+    measured = asyncio.run(measure(args.rounds))
+    print(f"{measured['sounds']} sounds, {measured['sound_bytes']} bytes; easiest tier "
+          f"{measured['first_tier_sounds']} sounds in a {measured['first_tier_bundle_bytes']} byte bundle")
+    for name, ms in measured["server_ms"].items():
+        print(f"server {name:22s} {ms:8.3f} ms")
+    results = {"measured": measured, "profiles": {}}
+    print(f"{'profile':8s} {'separate':>10s} {'bundled':>10s} {'warm':>10s}   easiest tier playable after")
+    for name, (rtt, bandwidth) in PROFILES.items():
+        modelled = results["profiles"][name] = model(measured, rtt, bandwidth)
+        print(f"{name:8s} {modelled['separate_ms']:>8.1f}ms {modelled['bundled_ms']:>8.1f}ms {modelled['warm_ms']:>8.1f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
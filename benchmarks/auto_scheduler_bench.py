@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Auto-Mode Scheduler Benchmark for Crush Simulator
+Runs many auto sessions on one event loop through the real crush path and
+reports throughput, scheduling lag and CPU use.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import server
+from auto_scheduler import AutoScheduler
+
+
+async def run_benchmark(sessions: int, speed: float, duration: float, seed: int) -> dict:
+    scheduler = AutoScheduler(server.auto_crush, lambda: server.catalog.objects, seed=seed, weigh=server.auto_preferences)
+    runner = asyncio.create_task(scheduler.run())
+    flusher = asyncio.create_task(server.leaderboards.run_flusher(server.LEADERBOARD_FLUSH_INTERVAL))
+
+    session_ids = []
+    for _ in range(sessions):
+        response = await server.start_session(server.CrushSession(mode="auto"))
+        session_ids.append(response["session_id"])
+
+    # Spread the first crushes over one average crush interval
+    loop = asyncio.get_running_loop()
+    spread = 2.5 / speed
+    for i, session_id in enumerate(session_ids):
+        scheduler.start_session(session_id, speed=speed, delay=spread * i / sessions)
+
+    # Measure loop responsiveness alongside the scheduler
+    probe_lags = []
+
+    async def probe():
+        while True:
+            started = loop.time()
+            await asyncio.sleep(0.01)
+            probe_lags.append(loop.time() - started - 0.01)
+
+    prober = asyncio.create_task(probe())
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    await asyncio.sleep(duration)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    prober.cancel()
+    runner.cancel()
+    flusher.cancel()
+
+    metrics = scheduler.metrics()
+    probe_lags.sort()
+    return {
+        "sessions": sessions,
+        "speed": speed,
+        "duration_s": round(wall, 3),
+        "crushes": metrics["crushes"],
+        "crushes_per_s": round(metrics["crushes"] / wall, 1),
+        "cpu_utilization": round(cpu / wall, 3),
+        "cpu_us_per_crush": round(cpu / metrics["crushes"] * 1e6, 2) if metrics["crushes"] else None,
+        "mean_schedule_lag_ms": round(metrics["mean_lag_ms"], 3),
+        "loop_lag_p99_ms": round(probe_lags[int(len(probe_lags) * 0.99)] * 1000, 3) if probe_lags else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--speed", type=float, default=1.0, help="auto-mode speed multiplier")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-cpu", type=float, default=None,
+                        help="fail if CPU utilization exceeds this fraction of one core")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args.sessions, args.speed, args.duration, args.seed))
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.max_cpu is not None and result["cpu_utilization"] > args.max_cpu:
+        print(f"❌ CPU utilization {result['cpu_utilization']} exceeds budget {args.max_cpu}")
+        sys.exit(1)
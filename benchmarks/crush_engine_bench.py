@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Crush Engine Benchmark for Crush Simulator
+Times CrushEngine.simulate for crushes one at a time, as the crush endpoint
+and WebSocket make them, and in batches, as the batch endpoint does.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from crush_engine import CrushEngine
+from server import catalog
+
+
+def make_crushes(count: int, seed: int):
+    rng = random.Random(seed)
+    objs = [rng.choice(catalog.objects) for _ in range(count)]
+    forces = [rng.uniform(0.1, 5.0) for _ in range(count)]
+    positions = [{"x": rng.uniform(-500, 500), "y": rng.uniform(-500, 500)} for _ in range(count)]
+    return objs, forces, positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--crushes", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=1000, help="crushes per simulate() call in the batched run")
+    parser.add_argument("--target", type=float, default=10_000, help="crushes per second to reach one at a time")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    engine = CrushEngine(seed=args.seed)
+    objs, forces, positions = make_crushes(args.crushes, args.seed)
+
+    started = time.perf_counter()
+    particles = 0
+    for obj, force, position in zip(objs, forces, positions):
+        particles += engine.simulate_one(obj, force, position)["burst"]["count"]
+    single_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for start in range(0, args.crushes, args.batch):
+        end = start + args.batch
+        engine.simulate(objs[start:end], forces[start:end], positions[start:end])
+    batch_s = time.perf_counter() - started
+
+    results = {
+        "crushes": args.crushes,
+        "particles_per_crush": round(particles / args.crushes, 1),
+        "single_crushes_per_s": round(args.crushes / single_s),
+        "single_us_per_crush": round(single_s / args.crushes * 1e6, 1),
+        "batch_size": args.batch,
+        "batch_crushes_per_s": round(args.crushes / batch_s),
+        "target_crushes_per_s": args.target,
+        "meets_target": args.crushes / single_s >= args.target,
+    }
+
+    for key, value in results.items():
+        print(f"{key:22} {value}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Columnar Event Log Benchmark for Crush Simulator
+Writes synthetic crush events through ColumnarEventLog in consumer-sized
+batches, then times opening the memory-mapped columns and the NumPy reports.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from event_columns import ColumnarEventLog, ColumnarEventReader
+from event_reports import report
+from server import catalog
+
+MODES = ("interactive", "auto", "mixed")
+
+
+def write_events(directory: str, events: int, sessions: int, batch: int, seed: int) -> float:
+    rng = random.Random(seed)
+    objects = catalog.objects
+    session_ids = [f"session-{i}" for i in range(sessions)]
+    log = ColumnarEventLog(directory, lambda: catalog)
+    elapsed = 0.0
+    ts = time.time()
+    for start in range(0, events, batch):
+        chunk = []
+        for i in range(start, min(start + batch, events)):
+            obj = objects[i % len(objects)]
+            chunk.append((ts + i * 0.001, session_ids[rng.randrange(sessions)], obj["id"], obj["type"],
+                          rng.random() * 3, {"x": rng.uniform(-500, 500), "y": rng.uniform(-500, 500)},
+                          MODES[i % len(MODES)]))
+        started = time.perf_counter()
+        log.write(chunk)
+        elapsed += time.perf_counter() - started
+    started = time.perf_counter()
+    log.close()
+    return elapsed + time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--sessions", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=1000, help="events per write, as the analytics consumer does")
+    parser.add_argument("--directory", help="reuse or keep an event log here instead of a temporary one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = args.directory or temporary
+        write_s = write_events(directory, args.events, args.sessions, args.batch, args.seed)
+
+        started = time.perf_counter()
+        reader = ColumnarEventReader(directory)
+        open_s = time.perf_counter() - started
+        started = time.perf_counter()
+        result = report(reader)
+        report_s = time.perf_counter() - started
+
+        size = sum(os.path.getsize(os.path.join(directory, name))
+                   for name in os.listdir(directory) if name.endswith(".col"))
+        results = {
+            "events": len(reader),
+            "write_s": round(write_s, 3),
+            "write_events_per_s": round(args.events / write_s),
+            "open_ms": round(open_s * 1000, 3),
+            "report_s": round(report_s, 3),
+            "report_events_per_s": round(len(reader) / report_s),
+            "bytes_per_event": round(size / max(len(reader), 1), 1),
+            "objects": len(result["objects"]),
+            "modes": len(result["modes"]),
+        }
+
+    for key, value in results.items():
+        print(f"{key:22} {value}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Session Journal Benchmark for Crush Simulator
+Drives the journal session backend with many concurrent sessions and times
+journal writes with group commit, a snapshot of every session and the
+event loop stall it causes, and recovery at startup both from the journal
+alone and from a snapshot plus the journal written after it.
+
+    python benchmarks/journal_bench.py --sessions 1000000 --output journal.json
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from catalog import Catalog
+from catalog_source import load_objects
+from crush_history import CrushHistory
+from session_journal import JournalSessionBackend
+from session_store import SessionStore
+
+CATALOG = Catalog(load_objects(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend",
+                                            "crush_objects.json")))
+OBJECTS = [(obj["id"], CATALOG.codes[obj["id"]], obj["satisfaction_score"]) for obj in CATALOG.objects]
+
+
+def make_backend(directory: str, sessions: int, sync: str) -> JournalSessionBackend:
+    store = SessionStore(max_size=sessions, archive_size=sessions)
+    # Snapshots only when the benchmark takes them
+    return JournalSessionBackend(directory, store, lambda: CATALOG, sync=sync,
+                                 snapshot_interval=0, snapshot_bytes=1 << 62)
+
+
+def new_session(session_id: str) -> dict:
+    return {"user_id": session_id, "mode": "interactive", "total_satisfaction": 0, "session_duration": 0,
+            "history": CrushHistory(), "seed": 1234567890123, "catalog_version": CATALOG.version,
+            "created_at": "2026-01-01T00:00:00", "active": True}
+
+
+async def crush(backend: JournalSessionBackend, session_id: str, i: int):
+    object_id, code, satisfaction = OBJECTS[i % len(OBJECTS)]
+    async with backend.session(session_id) as session:
+        session["history"].append(code)
+        session["total_satisfaction"] += satisfaction
+        await backend.record_crush(session_id, object_id, satisfaction)
+
+
+async def drive(operations: int, concurrency: int, operation) -> float:
+    """Run operation(i) for every i in range(operations) on concurrency workers; returns seconds"""
+    started = time.perf_counter()
+
+    async def worker(first: int):
+        for i in range(first, operations, concurrency):
+            await operation(i)
+
+    await asyncio.gather(*(worker(first) for first in range(concurrency)))
+    return time.perf_counter() - started
+
+
+def write_stats(backend: JournalSessionBackend, elapsed: float, operations: int, commits_before: int) -> dict:
+    commits = backend.stats["commits"] - commits_before
+    return {
+        "operations": operations,
+        "seconds": round(elapsed, 2),
+        "per_second": round(operations / elapsed),
+        "commits": commits,
+        "operations_per_commit": round(operations / commits, 1) if commits else None,
+    }
+
+
+async def recover(directory: str, sessions: int) -> dict:
+    backend = make_backend(directory, sessions, "commit")
+    await backend.start()
+    result = {
+        "sessions": backend.stats["recovered_sessions"],
+        "crushes": sum(len(session["history"]) for session in backend.store.iter_sessions()),
+        "seconds": backend.stats["recovery_seconds"],
+    }
+    await backend.close()
+    return result
+
+
+async def stall_during(coroutine) -> tuple:
+    """Result of coroutine and the longest the event loop went without running a 1 ms ticker meanwhile"""
+    longest = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal longest
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            longest = max(longest, now - last)
+            last = now
+
+    task = asyncio.create_task(ticker())
+    try:
+        result = await coroutine
+    finally:
+        done = True
+        await task
+    return result, longest
+
+
+async def run(directory: str, sessions: int, crushes: int, tail: int, concurrency: int, sync: str) -> dict:
+    results = {"sessions": sessions, "crushes": crushes, "tail_crushes": tail, "concurrency": concurrency, "sync": sync}
+    session_ids = [str(uuid.uuid4()) for _ in range(sessions)]
+
+    backend = make_backend(directory, sessions, sync)
+    await backend.start()
+    elapsed = await drive(sessions, concurrency, lambda i: backend.create(session_ids[i], new_session(session_ids[i])))
+    results["create"] = write_stats(backend, elapsed, sessions, 0)
+    commits = backend.stats["commits"]
+    elapsed = await drive(crushes, concurrency, lambda i: crush(backend, session_ids[(i * 7919) % sessions], i))
+    results["crush"] = write_stats(backend, elapsed, crushes, commits)
+    await backend.close()
+    results["journal_bytes"] = backend.stats["bytes"]
+    print(f"create   {results['create']}")
+    print(f"crush    {results['crush']}")
+    del backend
+    gc.collect()
+
+    results["recover_journal"] = await recover(directory, sessions)
+    print(f"recover from the journal            {results['recover_journal']}")
+    gc.collect()
+
+    backend = make_backend(directory, sessions, sync)
+    await backend.start()
+    started = time.perf_counter()
+    # Crushes keep arriving while the snapshot is written
+    tail_task = asyncio.create_task(drive(tail, concurrency, lambda i: crush(backend, session_ids[(i * 104729) % sessions], i)))
+    written, stall = await stall_during(backend.snapshot())
+    results["snapshot"] = {
+        "sessions": written,
+        "seconds": round(time.perf_counter() - started, 2),
+        "bytes": os.path.getsize(os.path.join(directory, sorted(
+            name for name in os.listdir(directory) if name.endswith(".ndjson"))[-1])),
+        "longest_loop_stall_ms": round(stall * 1000, 1),
+    }
+    await tail_task
+    await backend.close()
+    print(f"snapshot {results['snapshot']}")
+    del backend
+    gc.collect()
+
+    results["recover_snapshot"] = await recover(directory, sessions)
+    print(f"recover from snapshot + journal     {results['recover_snapshot']}")
+    expected = crushes + tail
+    if results["recover_snapshot"]["crushes"] != expected or results["recover_snapshot"]["sessions"] != sessions:
+        raise SystemExit(f"Recovered {results['recover_snapshot']}, expected {sessions} sessions, {expected} crushes")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--crushes", type=int, default=1_000_000, help="crushes before the snapshot")
+    parser.add_argument("--tail", type=int, default=200_000, help="crushes while and after the snapshot is taken")
+    parser.add_argument("--concurrency", type=int, default=1000, help="requests in flight at once")
+    parser.add_argument("--sync", choices=["commit", "interval"], default="commit")
+    parser.add_argument("--directory", help="journal directory, a temporary one by default")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        results = asyncio.run(run(directory, args.sessions, args.crushes, args.tail, args.concurrency, args.sync))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
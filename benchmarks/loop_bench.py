@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Event Loop Offloading Benchmark for Crush Simulator
+Sends large crush batches alongside single crushes to a uvicorn server and
+reports single crush latency, event loop lag and how long batch handlers
+held the loop at a stretch, with batch simulation inline, in offload
+threads and in offload processes. Lag and loop holding times come from the
+server's own /metrics; lag percentiles are histogram bucket bounds.
+
+    python benchmarks/loop_bench.py --output loop.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+MODES = {
+    "inline": {"OFFLOAD_MIN_CRUSHES": str(10 ** 9)},
+    "threads": {},
+    "processes": {"OFFLOAD_PROCESSES": "2"},
+}
+OBJECT_IDS = ["can_aluminum", "cardboard_box", "phone_old", "glass_bottle", "plastic_bottle"]
+BATCH_ROUTE = "/api/session/{session_id}/crush/batch"
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def histogram(metrics: str, name: str, labels: str = "") -> Tuple[List[Tuple[float, float]], float, float]:
+    """Cumulative (bound, count) buckets, sum and count of one histogram series in Prometheus text"""
+    buckets = []
+    for bound, count in re.findall(rf'^{name}_bucket{{{labels}{"," if labels else ""}le="([^"]+)"}} (\S+)$',
+                                   metrics, re.M):
+        buckets.append((float(bound), float(count)))
+    total = re.search(rf"^{name}_sum{{{labels}}} (\S+)$" if labels else rf"^{name}_sum (\S+)$", metrics, re.M)
+    count = re.search(rf"^{name}_count{{{labels}}} (\S+)$" if labels else rf"^{name}_count (\S+)$", metrics, re.M)
+    return buckets, float(total.group(1)) if total else 0.0, float(count.group(1)) if count else 0.0
+
+
+def bucket_percentile(buckets: List[Tuple[float, float]], fraction: float) -> float:
+    """Upper bound of the bucket holding the percentile"""
+    if not buckets or not buckets[-1][1]:
+        return 0.0
+    for bound, count in buckets:
+        if count >= buckets[-1][1] * fraction:
+            return bound
+    return buckets[-1][0]
+
+
+async def run_mode(mode: str, port: int, seconds: float, batch_size: int, batch_clients: int,
+                   crush_clients: int) -> Dict[str, float]:
+    env = dict(os.environ, RATE_LIMITS="off", CATALOG_WATCH_INTERVAL="0", LOOP_MONITOR_INTERVAL="0.01",
+               ADMISSION_MAX_LAG="0", **MODES[mode])
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "error"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/api/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            session_ids = [(await client.post("/api/session/start", json={})).json()["session_id"]
+                           for _ in range(batch_clients + crush_clients)]
+            batch = [{"object_id": OBJECT_IDS[i % len(OBJECT_IDS)], "force": 1.5} for i in range(batch_size)]
+            await client.post(f"/api/session/{session_ids[0]}/crush/batch", json=batch)
+            before = (await client.get("/metrics")).text
+            stop = time.perf_counter() + seconds
+            latencies = []
+            batches = 0
+
+            async def batcher(session_id: str):
+                nonlocal batches
+                while time.perf_counter() < stop:
+                    await client.post(f"/api/session/{session_id}/crush/batch", json=batch)
+                    batches += 1
+
+            async def crusher(session_id: str, i: int):
+                while time.perf_counter() < stop:
+                    started = time.perf_counter()
+                    await client.post(f"/api/session/{session_id}/crush", json={"object_id": OBJECT_IDS[i % 5]})
+                    latencies.append(time.perf_counter() - started)
+                    i += 1
+
+            await asyncio.gather(
+                *(batcher(session_id) for session_id in session_ids[:batch_clients]),
+                *(crusher(session_id, i) for i, session_id in enumerate(session_ids[batch_clients:])),
+            )
+            after = (await client.get("/metrics")).text
+    finally:
+        server.terminate()
+        server.wait()
+
+    # Only what the timed run added to the histograms
+    lag_before, _, _ = histogram(before, "crush_event_loop_lag_sampled_seconds")
+    lag_after, _, _ = histogram(after, "crush_event_loop_lag_sampled_seconds")
+    lag = [(bound, count - dict(lag_before).get(bound, 0.0)) for bound, count in lag_after]
+    route = f'route="{BATCH_ROUTE}"'
+    block_before, sum_before, count_before = histogram(before, "crush_handler_loop_block_seconds", route)
+    block_after, sum_after, count_after = histogram(after, "crush_handler_loop_block_seconds", route)
+    block = [(bound, count - dict(block_before).get(bound, 0.0)) for bound, count in block_after]
+    latencies.sort()
+    return {
+        "batches_per_second": round(batches / seconds, 1),
+        "crushes_per_second": round(len(latencies) / seconds, 1),
+        "crush_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "crush_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "lag_p50_ms": bucket_percentile(lag, 0.5) * 1000,
+        "lag_p99_ms": bucket_percentile(lag, 0.99) * 1000,
+        "batch_block_mean_ms": round((sum_after - sum_before) / max(count_after - count_before, 1) * 1000, 2),
+        "batch_block_p99_ms": bucket_percentile(block, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of each run")
+    parser.add_argument("--batch-size", type=int, default=1000, help="crushes per batch request")
+    parser.add_argument("--batch-clients", type=int, default=2, help="clients sending batches back to back")
+    parser.add_argument("--crush-clients", type=int, default=8, help="clients sending single crushes back to back")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--port", type=int, default=8021)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        results[mode] = asyncio.run(run_mode(
+            mode, args.port, args.seconds, args.batch_size, args.batch_clients, args.crush_clients
+        ))
+        print(f"{mode:10s} {results[mode]}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter Benchmark for Crush Simulator
+Times token bucket checks for a few hot keys and for a stream of distinct
+keys, and measures memory per live key and how many keys stay live.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from rate_limit import RateLimiter, RouteLimit
+
+
+def time_calls(call, keys) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        call(key)
+    return (time.perf_counter() - started) / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--keys", type=int, default=200_000, help="distinct keys for the memory measurement")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    hot = RateLimiter(rate=1e9, burst=1e9)
+    hot_keys = [f"session-{i % 16}" for i in range(args.calls)]
+    hot_us = time_calls(hot.acquire, hot_keys)
+
+    # One-off clients arriving faster than buckets go idle
+    churn = RateLimiter(rate=10, burst=20)
+    churn_keys = [f"10.0.{i // 256 % 256}.{i % 256}-{i}" for i in range(args.calls)]
+    churn_us = time_calls(churn.acquire, churn_keys)
+
+    route = RouteLimit("crush", session=(1e9, 1e9), ip=(1e9, 1e9))
+    route_us = time_calls(lambda key: route.check(key, "127.0.0.1"), hot_keys)
+
+    # Memory per key with nothing expiring
+    tracemalloc.start()
+    held = RateLimiter(rate=1e-9, burst=1)
+    keys = [f"session-{i}" for i in range(args.keys)]
+    baseline = tracemalloc.get_traced_memory()[0]
+    for key in keys:
+        held.acquire(key)
+    bytes_per_key = (tracemalloc.get_traced_memory()[0] - baseline) / args.keys
+    tracemalloc.stop()
+
+    results = {
+        "hot_key_us": round(hot_us, 3),
+        "distinct_key_us": round(churn_us, 3),
+        "route_check_us": round(route_us, 3),
+        "live_keys_after_churn": len(churn),
+        "bytes_per_key": round(bytes_per_key, 1),
+    }
+    for key, value in results.items():
+        print(f"{key:22} {value}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
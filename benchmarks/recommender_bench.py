@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Recommender Benchmark for Crush Simulator
+Times recording crushes and recommending the next objects for catalogs of
+several sizes, and building the arrays from an event log's columns.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from recommender import Recommender, build
+
+
+def make_catalog(size: int):
+    objects = tuple({"id": f"object_{code}", "satisfaction_score": 1 + code % 10} for code in range(size))
+    return objects, {obj["id"]: code for code, obj in enumerate(objects)}
+
+
+def time_per_call(call, calls: int) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        call(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="5,100,1000", help="catalog sizes to time")
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--events", type=int, default=1_000_000, help="events for the build from columns")
+    parser.add_argument("--budget-us", type=float, default=1000, help="most a recommendation may take")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    results = {"catalogs": {}}
+    for size in map(int, args.sizes.split(",")):
+        objects, codes = make_catalog(size)
+        recommender = Recommender()
+        picks = rng.integers(0, size, args.calls + 3).tolist()
+        record_us = time_per_call(lambda i: recommender.record(picks[i:i + 3], picks[i + 3], 5), args.calls)
+        recommend_us = time_per_call(lambda i: recommender.recommend(picks[i:i + 3], objects, codes), args.calls)
+        results["catalogs"][size] = {"record_us": round(record_us, 2), "recommend_us": round(recommend_us, 2)}
+
+    sessions = np.sort(rng.integers(0, args.events // 50, args.events)).astype("<u4")
+    reader = SimpleNamespace(
+        columns={"code": rng.integers(0, 100, args.events).astype("<u2"), "session": sessions,
+                 "ts": np.arange(args.events, dtype="<f8")},
+        objects={code: {"satisfaction_score": 5} for code in range(100)},
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        build(reader, os.path.join(directory, "recommender.npz"))
+        results["build_events_per_s"] = round(args.events / (time.perf_counter() - started))
+
+    slowest = max(catalog["recommend_us"] for catalog in results["catalogs"].values())
+    results["budget_us"] = args.budget_us
+    results["within_budget"] = slowest <= args.budget_us
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if not results["within_budget"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
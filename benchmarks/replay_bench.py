@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Session Replay Benchmark for Crush Simulator
+Records synthetic sessions the way the server does, then times reading them
+back and replaying them in one process and in a process pool, against the
+time the sessions took to play.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from catalog import Catalog
+from catalog_source import load_objects
+from session_recording import SessionRecorder, read_recordings
+from session_replay import DEFAULT_CATALOG, replay
+
+
+class PlayClock:
+    """Wall time that advances as a player would between crushes"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+def record_sessions(directory: str, catalog: Catalog, sessions: int, crushes: int, seed: int) -> str:
+    rng = random.Random(seed)
+    clock = PlayClock()
+    recorder = SessionRecorder(directory, clock=clock)
+    codes = list(catalog.codes.values())
+    for _ in range(sessions):
+        session_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        recorder.start(session_id, rng.getrandbits(63), catalog.version)
+        index = 0
+        while index < crushes:
+            # Mostly single crushes about half a second apart, now and then a batch
+            size = rng.randint(5, 20) if rng.random() < 0.05 else 1
+            clock.now += rng.uniform(0.2, 0.8)
+            recorder.call(session_id, index, [
+                (rng.choice(codes), rng.uniform(0.1, 5.0), rng.uniform(0, 800), rng.uniform(0, 600))
+                for _ in range(size)
+            ])
+            index += size
+        recorder.end(session_id)
+    recorder.close()
+    return recorder.path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--crushes", type=int, default=50, help="crushes per session")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="pool size for the parallel run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    objects = load_objects(DEFAULT_CATALOG)
+    with tempfile.TemporaryDirectory() as directory:
+        path = record_sessions(directory, Catalog(objects), args.sessions, args.crushes, args.seed)
+        size = os.path.getsize(path)
+        started = time.perf_counter()
+        recordings = list(read_recordings([path]).values())
+        read_s = time.perf_counter() - started
+
+    crushes = sum(len(recording) for recording in recordings)
+    played_s = sum(recording.duration for recording in recordings)
+    timings = {}
+    for processes in dict.fromkeys((1, args.processes)):
+        started = time.perf_counter()
+        replay(recordings, objects, processes)
+        timings[processes] = time.perf_counter() - started
+
+    results = {
+        "sessions": len(recordings),
+        "crushes": crushes,
+        "recording_bytes_per_crush": round(size / crushes, 1),
+        "read_crushes_per_s": round(crushes / read_s),
+        "played_s": round(played_s, 1),
+    }
+    for processes, elapsed in timings.items():
+        results[f"replay_{processes}p_crushes_per_s"] = round(crushes / elapsed)
+        results[f"replay_{processes}p_x_real_time"] = round(played_s / elapsed)
+
+    for key, value in results.items():
+        print(f"{key:28} {value}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark for Crush Simulator
+Starts the API process repeatedly and measures time to the first answered
+request and to readiness, failing when the median goes over the budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+from startup import profile
+
+
+def wait_for(url: str, started: float, deadline: float, process: subprocess.Popen) -> float:
+    """Seconds from started until url answers 200"""
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with {process.returncode}")
+        try:
+            if requests.get(url, timeout=0.5).status_code == 200:
+                return time.perf_counter() - started
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError(f"{url} did not answer in time")
+
+
+def start_once(port: int, timeout: float) -> dict:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env={**os.environ, "CATALOG_WATCH_INTERVAL": "0"},
+    )
+    try:
+        deadline = started + timeout
+        first_request = wait_for(f"http://127.0.0.1:{port}/api/", started, deadline, process)
+        ready = wait_for(f"http://127.0.0.1:{port}/api/ready", started, deadline, process)
+    finally:
+        process.terminate()
+        process.wait()
+    return {"first_request_ms": first_request * 1000, "ready_ms": ready * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8021)
+    parser.add_argument("--budget-ms", type=float, default=2500, help="largest acceptable median time to first request")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    runs = [start_once(args.port, args.timeout) for _ in range(args.runs)]
+    first_request = statistics.median(run["first_request_ms"] for run in runs)
+    ready = statistics.median(run["ready_ms"] for run in runs)
+    imported = profile()
+    slowest = sorted(imported["imports"].items(), key=lambda item: item[1]["cumulative_ms"], reverse=True)[:5]
+
+    results = {
+        "runs": args.runs,
+        "first_request_ms": round(first_request, 1),
+        "ready_ms": round(ready, 1),
+        "import_ms": imported["import_ms"],
+        "slowest_imports_ms": {name: times["cumulative_ms"] for name, times in slowest},
+        "startup_phases_ms": imported["status"]["startup_ms"],
+        "budget_ms": args.budget_ms,
+        "within_budget": first_request <= args.budget_ms,
+    }
+    for key, value in results.items():
+        print(f"{key:20} {value}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if not results["within_budget"]:
+        raise SystemExit(f"Median time to first request {first_request:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+
+
+if __name__ == "__main__":
+    main()
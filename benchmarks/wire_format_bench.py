@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Wire Format Benchmark for Crush Simulator
+Compares bytes on the wire and serialization CPU for crush results, batch
+results and session stats in full JSON, slim JSON and the packed struct
+layout, encoding each the way the server does.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi.encoders import jsonable_encoder
+
+import wire_format
+from crush_engine import CrushEngine
+from response_cache import encode_json
+from server import catalog
+
+FORMATS = {
+    "json": lambda kind, payload: encode_json(jsonable_encoder(payload)),
+    "slim_json": lambda kind, payload: encode_json(wire_format.ENCODERS[kind][0](payload)),
+    "struct": lambda kind, payload: wire_format.ENCODERS[kind][1](catalog.codes, payload),
+}
+
+
+def crush_result(obj: dict, force: float, simulation: dict) -> dict:
+    """A crush result shaped like the one apply_crush returns"""
+    return {
+        "object": obj,
+        "success": True,
+        "satisfaction_gained": obj["satisfaction_score"],
+        "particles": obj["particles"],
+        "sound": obj["sound"],
+        "vibration": obj["vibration_pattern"],
+        "animation_duration": obj["crush_time"],
+        "force_applied": force,
+        "simulation": simulation,
+    }
+
+
+def make_payloads(batch_size: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    engine = CrushEngine(seed=seed)
+    objs = [rng.choice(catalog.objects) for _ in range(batch_size)]
+    forces = [round(rng.uniform(0.5, 3.0), 2) for _ in range(batch_size)]
+    positions = [{"x": rng.uniform(-400, 400), "y": rng.uniform(-300, 300)} for _ in range(batch_size)]
+    results = [crush_result(obj, force, simulation)
+               for obj, force, simulation in zip(objs, forces, engine.simulate(objs, forces, positions))]
+    counts = {}
+    for obj in objs:
+        counts[obj["id"]] = counts.get(obj["id"], 0) + 1
+    return {
+        "crush": results[0],
+        "batch": {
+            "results": results,
+            "crushed": len(results),
+            "satisfaction_gained": sum(result["satisfaction_gained"] for result in results),
+            "total_satisfaction": 12345,
+        },
+        "stats": {
+            "total_crushed": batch_size,
+            "total_satisfaction": 12345,
+            "objects_crushed": counts,
+            "recent_objects": [obj["id"] for obj in objs[-5:]],
+            "session_duration": 600,
+        },
+    }
+
+
+def measure(encode, kind: str, payload: dict, repeat: int) -> dict:
+    body = encode(kind, payload)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        encode(kind, payload)
+    elapsed = time.perf_counter() - started
+    return {
+        "bytes": len(body),
+        "gzip_bytes": len(gzip.compress(body, compresslevel=6, mtime=0)),
+        "encode_us": round(elapsed / repeat * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=100, help="crushes in the batch payload")
+    parser.add_argument("--repeat", type=int, default=2000, help="encodings timed per payload and format")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.batch, args.seed)
+    results = {}
+    for kind, payload in payloads.items():
+        repeat = max(args.repeat // (args.batch if kind == "batch" else 1), 10)
+        results[kind] = {name: measure(encode, kind, payload, repeat) for name, encode in FORMATS.items()}
+
+    print(f"{'payload':8} {'format':10} {'bytes':>9} {'gzip':>9} {'vs json':>8} {'encode us':>10}")
+    for kind, formats in results.items():
+        for name, row in formats.items():
+            ratio = row["bytes"] / formats["json"]["bytes"]
+            print(f"{kind:8} {name:10} {row['bytes']:9} {row['gzip_bytes']:9} {ratio:8.2f} {row['encode_us']:10}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
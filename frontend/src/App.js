@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import GameModeSelector from './components/GameModeSelector';
 import CrushArena from './components/CrushArena';
@@ -15,6 +15,7 @@ function App() {
   const [sessionId, setSessionId] = useState(null);
   const [selectedObject, setSelectedObject] = useState(null);
   const [availableObjects, setAvailableObjects] = useState([]);
+  const [recommendedIds, setRecommendedIds] = useState([]);
   const [sessionStats, setSessionStats] = useState({
     totalCrushed: 0,
     totalSatisfaction: 0,
@@ -22,6 +23,9 @@ function App() {
   });
   const [isLoading, setIsLoading] = useState(true);
   const [particles, setParticles] = useState([]);
+  const socketRef = useRef(null);
+  const pendingCrushes = useRef(new Map());
+  const nextSeq = useRef(1);
 
   // Fetch available objects on load
   useEffect(() => {
@@ -56,14 +60,85 @@ function App() {
       setSessionId(data.session_id);
       setCurrentMode(mode);
       setGameState('playing');
+      fetchRecommendations(data.session_id);
     } catch (error) {
       console.error('Failed to start session:', error);
     }
   };
 
+  // Stream crushes over a WebSocket while a session is running
+  useEffect(() => {
+    if (!sessionId) return;
+
+    const wsUrl = process.env.REACT_APP_BACKEND_URL.replace(/^http/, 'ws');
+    const socket = new WebSocket(`${wsUrl}/api/session/${sessionId}/ws`);
+    socketRef.current = socket;
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      const pending = pendingCrushes.current.get(message.seq);
+      if (!pending) return;
+      pendingCrushes.current.delete(message.seq);
+
+      if (message.type === 'crush_result') {
+        setSessionStats(prev => ({
+          ...prev,
+          total_crushed: (prev.total_crushed || 0) + message.delta.total_crushed,
+          total_satisfaction: message.total_satisfaction,
+          recent_objects: [...(prev.recent_objects || []), message.result.object.id].slice(-5)
+        }));
+        pending.resolve(message.result);
+      } else {
+        pending.reject(new Error(message.detail));
+      }
+    };
+
+    socket.onclose = () => {
+      pendingCrushes.current.forEach(pending => pending.reject(new Error('Connection closed')));
+      pendingCrushes.current.clear();
+      if (socketRef.current === socket) {
+        socketRef.current = null;
+      }
+    };
+
+    return () => socket.close();
+  }, [sessionId]);
+
+  const sendCrush = (socket, action) => new Promise((resolve, reject) => {
+    const seq = nextSeq.current++;
+    pendingCrushes.current.set(seq, { resolve, reject });
+    socket.send(JSON.stringify({ type: 'crush', seq, ...action }));
+  });
+
+  // Objects the server recommends crushing next, best first
+  const fetchRecommendations = async (id = sessionId) => {
+    if (!id) return;
+
+    try {
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/session/${id}/next?limit=3`);
+      const data = await response.json();
+      setRecommendedIds(data.recommendations.map(item => item.object_id));
+    } catch (error) {
+      console.error('Failed to fetch recommendations:', error);
+    }
+  };
+
   const crushObject = async (objectId, force = 1.0, position = { x: 0, y: 0 }) => {
     if (!sessionId) return;
 
+    const socket = socketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      try {
+        const crushResult = await sendCrush(socket, { object_id: objectId, force, position });
+        triggerCrushEffects(crushResult, position);
+        fetchRecommendations();
+        return crushResult;
+      } catch (error) {
+        console.error('Failed to crush object:', error);
+        return;
+      }
+    }
+
     try {
       const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/session/${sessionId}/crush`, {
         method: 'POST',
@@ -80,6 +155,7 @@ function App() {
       
       // Update stats
       updateSessionStats();
+      fetchRecommendations();
       
       // Trigger effects
       triggerCrushEffects(crushResult, position);
@@ -90,17 +166,38 @@ function App() {
     }
   };
 
+  // Server bursts are packed little-endian float32 rows of x, y, vx, vy, size
+  const unpackBurst = (burst) => {
+    const bytes = Uint8Array.from(atob(burst.data), c => c.charCodeAt(0));
+    const view = new DataView(bytes.buffer);
+    return Array.from({ length: burst.count }, (_, i) => {
+      const row = i * 20;
+      return {
+        x: view.getFloat32(row, true),
+        y: view.getFloat32(row + 4, true),
+        vx: view.getFloat32(row + 8, true),
+        vy: view.getFloat32(row + 12, true),
+        size: view.getFloat32(row + 16, true)
+      };
+    });
+  };
+
   const triggerCrushEffects = (crushResult, position) => {
-    // Add particles
-    const newParticles = Array.from({ length: 20 }, (_, i) => ({
+    // Add particles, from the server's simulated burst when there is one
+    const burst = crushResult.simulation
+      ? unpackBurst(crushResult.simulation.burst)
+      : Array.from({ length: 20 }, () => ({
+          x: position.x + (Math.random() - 0.5) * 100,
+          y: position.y + (Math.random() - 0.5) * 100,
+          vx: (Math.random() - 0.5) * 200,
+          vy: (Math.random() - 0.5) * 200,
+          size: Math.random() * 5 + 2
+        }));
+    const newParticles = burst.map((particle, i) => ({
+      ...particle,
       id: `particle-${Date.now()}-${i}`,
       type: crushResult.particles,
-      x: position.x + (Math.random() - 0.5) * 100,
-      y: position.y + (Math.random() - 0.5) * 100,
-      vx: (Math.random() - 0.5) * 200,
-      vy: (Math.random() - 0.5) * 200,
-      life: 1.0,
-      size: Math.random() * 5 + 2
+      life: 1.0
     }));
     
     setParticles(prev => [...prev, ...newParticles]);
@@ -131,6 +228,7 @@ function App() {
         method: 'POST'
       });
       setSessionId(null);
+      setRecommendedIds([]);
       setGameState('menu');
       setSessionStats({ totalCrushed: 0, totalSatisfaction: 0, sessionDuration: 0 });
     } catch (error) {
@@ -237,6 +335,7 @@ function App() {
               <div className="w-80 bg-black/10 backdrop-blur-md p-6">
                 <ObjectSelector
                   objects={availableObjects}
+                  recommendedIds={recommendedIds}
                   selectedObject={selectedObject}
                   onObjectSelect={setSelectedObject}
                 />
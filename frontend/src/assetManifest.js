@@ -0,0 +1,33 @@
+// Sounds and vibration patterns per object, from /api/assets/manifest.
+// Fetched once and shared by SoundManager and VibrationManager.
+let manifestPromise = null;
+
+export const loadAssetManifest = () => {
+  if (!manifestPromise) {
+    manifestPromise = fetch(`${process.env.REACT_APP_BACKEND_URL}/api/assets/manifest`)
+      .then(response => {
+        if (!response.ok) throw new Error(`Asset manifest: HTTP ${response.status}`);
+        return response.json();
+      })
+      .catch(error => {
+        manifestPromise = null;
+        throw error;
+      });
+  }
+  return manifestPromise;
+};
+
+// Fetch each difficulty tier's bundle, easiest first, and hand every
+// sound in it to onSound(name, blob) as soon as its tier arrives
+export const loadSoundBundles = async (manifest, onSound, isCancelled = () => false) => {
+  for (const tier of manifest.tiers) {
+    if (isCancelled()) return;
+    if (!tier.bundle) continue;
+    const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}${tier.bundle.url}`);
+    if (!response.ok) continue;
+    const bundle = await response.arrayBuffer();
+    Object.entries(tier.bundle.members).forEach(([name, [offset, length]]) => {
+      onSound(name, new Blob([bundle.slice(offset, offset + length)], { type: manifest.sounds[name].type }));
+    });
+  }
+};
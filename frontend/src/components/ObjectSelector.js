@@ -1,9 +1,15 @@
 import React, { useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 
-const ObjectSelector = ({ objects, selectedObject, onObjectSelect }) => {
+const ObjectSelector = ({ objects, recommendedIds = [], selectedObject, onObjectSelect }) => {
   const [filter, setFilter] = useState('all');
-  const [sortBy, setSortBy] = useState('satisfaction');
+  const [sortBy, setSortBy] = useState('recommended');
+
+  // Position among the server's recommendations, or past the end for the rest
+  const recommendedRank = (obj) => {
+    const rank = recommendedIds.indexOf(obj.id);
+    return rank === -1 ? recommendedIds.length : rank;
+  };
 
   const getObjectEmoji = (type) => {
     switch (type) {
@@ -37,6 +43,8 @@ const ObjectSelector = ({ objects, selectedObject, onObjectSelect }) => {
     .filter(obj => filter === 'all' || obj.type === filter)
     .sort((a, b) => {
       switch (sortBy) {
+        case 'recommended':
+          return recommendedRank(a) - recommendedRank(b) || b.satisfaction_score - a.satisfaction_score;
         case 'satisfaction':
           return b.satisfaction_score - a.satisfaction_score;
         case 'difficulty':
@@ -85,6 +93,7 @@ const ObjectSelector = ({ objects, selectedObject, onObjectSelect }) => {
               onChange={(e) => setSortBy(e.target.value)}
               className="w-full bg-gray-800 border border-gray-600 text-white text-sm rounded-lg px-3 py-2 focus:border-purple-500"
             >
+              <option value="recommended">Рекомендуемые</option>
               <option value="satisfaction">По удовлетворению</option>
               <option value="difficulty">По сложности</option>
               <option value="name">По названию</option>
@@ -125,6 +134,9 @@ const ObjectSelector = ({ objects, selectedObject, onObjectSelect }) => {
                   <div>
                     <h3 className="font-semibold text-white text-sm">{object.name}</h3>
                     <p className="text-xs text-gray-400 capitalize">{object.type}</p>
+                    {recommendedIds.includes(object.id) && (
+                      <p className="text-xs text-purple-300">★ Рекомендуем</p>
+                    )}
                   </div>
                 </div>
                 
@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { Howl } from 'howler';
+import { loadAssetManifest, loadSoundBundles } from '../assetManifest';
 
 const SoundManager = () => {
   const [soundEnabled, setSoundEnabled] = useState(true);
@@ -7,14 +8,10 @@ const SoundManager = () => {
   const [currentlyPlaying, setCurrentlyPlaying] = useState(null);
   const soundCache = useRef({});
   const ambientLoop = useRef(null);
+  const objectUrls = useRef([]);
 
-  // Sound files mapping
+  // Crush sounds come from the asset manifest; only ambience is a static file
   const soundFiles = {
-    'can_crush.mp3': '/sounds/can_crush.mp3',
-    'cardboard_crush.mp3': '/sounds/cardboard_crush.mp3',
-    'electronics_crush.mp3': '/sounds/electronics_crush.mp3',
-    'glass_shatter.mp3': '/sounds/glass_shatter.mp3',
-    'plastic_crush.mp3': '/sounds/plastic_crush.mp3',
     'ambient_background.mp3': '/sounds/ambient_background.mp3'
   };
 
@@ -40,28 +37,33 @@ const SoundManager = () => {
       createSyntheticAmbient();
     }
 
-    // Preload crush sounds
-    Object.keys(soundFiles).forEach(soundKey => {
-      if (soundKey !== 'ambient_background.mp3') {
-        try {
-          soundCache.current[soundKey] = new Howl({
-            src: [soundFiles[soundKey]],
+    // Preload crush sounds a difficulty tier at a time, easiest first, so
+    // the objects a new player starts with are playable soonest. Sounds the
+    // server does not have, or that have not arrived yet, are synthesized.
+    let cancelled = false;
+    loadAssetManifest()
+      .then(manifest => {
+        manifest.missing.forEach(name => {
+          soundCache.current[name] = createSyntheticSound(name);
+        });
+        return loadSoundBundles(manifest, (name, blob) => {
+          const url = URL.createObjectURL(blob);
+          objectUrls.current.push(url);
+          soundCache.current[name] = new Howl({
+            src: [url],
             volume: volume,
-            html5: true,
-            format: ['mp3'],
+            format: [name.split('.').pop()],
             onloaderror: () => {
-              // Create synthetic sound as fallback
-              soundCache.current[soundKey] = createSyntheticSound(soundKey);
+              soundCache.current[name] = createSyntheticSound(name);
             }
           });
-        } catch (error) {
-          soundCache.current[soundKey] = createSyntheticSound(soundKey);
-        }
-      }
-    });
+        }, () => cancelled);
+      })
+      .catch(error => console.log('Crush sounds not available, using synthetic sounds', error));
 
     return () => {
       // Cleanup
+      cancelled = true;
       if (ambientLoop.current) {
         ambientLoop.current.stop();
         ambientLoop.current.unload();
@@ -72,6 +74,8 @@ const SoundManager = () => {
           sound.unload();
         }
       });
+      objectUrls.current.forEach(url => URL.revokeObjectURL(url));
+      objectUrls.current = [];
     };
   }, []);
 
@@ -192,6 +196,9 @@ const SoundManager = () => {
   const playCrushSound = (soundFile) => {
     if (!soundEnabled || !soundFile) return;
 
+    if (!soundCache.current[soundFile]) {
+      soundCache.current[soundFile] = createSyntheticSound(soundFile);
+    }
     const sound = soundCache.current[soundFile];
     if (sound && sound.play) {
       sound.volume(volume);
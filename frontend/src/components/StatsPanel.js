@@ -186,8 +186,8 @@ const StatsPanel = ({ stats }) => {
                     <div>
                       <div className="text-gray-400">Лучший объект</div>
                       <div className="text-purple-300 font-semibold text-xs">
-                        {stats.objects_crushed?.length > 0 
-                          ? stats.objects_crushed[stats.objects_crushed.length - 1]?.replace(/_/g, ' ')
+                        {stats.recent_objects?.length > 0 
+                          ? stats.recent_objects[stats.recent_objects.length - 1]?.replace(/_/g, ' ')
                           : 'Пока нет'
                         }
                       </div>
@@ -219,11 +219,11 @@ const StatsPanel = ({ stats }) => {
                   </div>
 
                   {/* Recent objects */}
-                  {stats.objects_crushed?.length > 0 && (
+                  {stats.recent_objects?.length > 0 && (
                     <div className="mt-4">
                       <div className="text-gray-400 text-xs mb-2">Последние разрушения:</div>
                       <div className="flex flex-wrap gap-1">
-                        {stats.objects_crushed.slice(-5).map((objectId, i) => (
+                        {stats.recent_objects.map((objectId, i) => (
                           <motion.span
                             key={`${objectId}-${i}`}
                             initial={{ opacity: 0, scale: 0.8 }}
@@ -1,10 +1,13 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
+import { loadAssetManifest } from '../assetManifest';
 
 const VibrationManager = () => {
   const [vibrationEnabled, setVibrationEnabled] = useState(true);
   const [vibrationStrength, setVibrationStrength] = useState(1.0);
   const [isVibrating, setIsVibrating] = useState(false);
   const [supportedVibration, setSupportedVibration] = useState(false);
+  // Object id -> vibration pattern, from the asset manifest
+  const objectPatterns = useRef({});
 
   // Check vibration API support
   useEffect(() => {
@@ -26,6 +29,17 @@ const VibrationManager = () => {
     checkVibrationSupport();
   }, []);
 
+  // Each object's own pattern from the catalog, used over the per-type ones below
+  useEffect(() => {
+    loadAssetManifest()
+      .then(manifest => {
+        Object.entries(manifest.objects).forEach(([objectId, assets]) => {
+          objectPatterns.current[objectId] = assets.vibration_pattern;
+        });
+      })
+      .catch(() => {});
+  }, []);
+
   // Vibrate function with pattern
   const vibrate = (pattern, strength = 1.0) => {
     if (!vibrationEnabled || !supportedVibration || !navigator.vibrate) return;
@@ -85,11 +99,11 @@ const VibrationManager = () => {
   };
 
   // Crush vibration based on object properties
-  const playObjectVibration = (objectType, satisfaction, force = 1.0) => {
+  const playObjectVibration = (objectType, satisfaction, force = 1.0, objectId = null) => {
     if (!vibrationEnabled) return;
 
-    // Base pattern from object type
-    let basePattern = asmrPatterns[`${objectType}_crush`] || asmrPatterns.tap;
+    // Base pattern from the object itself, else from its type
+    let basePattern = objectPatterns.current[objectId] || asmrPatterns[`${objectType}_crush`] || asmrPatterns.tap;
     
     // Adjust intensity based on satisfaction and force
     const intensityMultiplier = Math.max(0.3, (satisfaction / 10) * force);